@@ -5,27 +5,43 @@ read_structure_step
 A SEAMM plugin to read common formats in computational chemistry
 """
 
+import importlib
+
 # Bring up the classes so that they appear to be directly in
 # the read_structure_step package.
 
-from read_structure_step.read_structure import ReadStructure  # noqa: F401
-from read_structure_step.read_structure_parameters import (  # noqa: F401
-    ReadStructureParameters,
-)
-from read_structure_step.read_structure_step import ReadStructureStep  # noqa: F401
-from read_structure_step.tk_read_structure import TkReadStructure  # noqa: F401
 from .read import read  # noqa: F401
-
-from read_structure_step.write_structure import WriteStructure  # noqa: F401
-from read_structure_step.write_structure_parameters import (  # noqa: F401
-    WriteStructureParameters,
-)
-from read_structure_step.write_structure_step import WriteStructureStep  # noqa: F401
-from read_structure_step.tk_write_structure import TkWriteStructure  # noqa: F401
+from .read import iter_structures  # noqa: F401
 from .write import write  # noqa: F401
+from .formats.structure_record import ensure_coordinates  # noqa: F401
+
+# The classes for the steps in flowcharts and their GUIs pull in SEAMM and Tk, which
+# are not needed just to read and write files, so are only imported when used.
+_lazy_classes = {
+    "ReadStructure": "read_structure_step.read_structure",
+    "ReadStructureParameters": "read_structure_step.read_structure_parameters",
+    "ReadStructureStep": "read_structure_step.read_structure_step",
+    "TkReadStructure": "read_structure_step.tk_read_structure",
+    "WriteStructure": "read_structure_step.write_structure",
+    "WriteStructureParameters": "read_structure_step.write_structure_parameters",
+    "WriteStructureStep": "read_structure_step.write_structure_step",
+    "TkWriteStructure": "read_structure_step.tk_write_structure",
+}
+
+
+def __getattr__(name):
+    """Import the classes for the steps when first used."""
+    if name in _lazy_classes:
+        return getattr(importlib.import_module(_lazy_classes[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_classes))
+
 
 # Handle versioneer
-from ._version import get_versions
+from ._version import get_versions  # noqa: E402
 
 __author__ = """Eliseo Marin-R-Rimoldi"""
 __email__ = "meliseo@vt.edu"
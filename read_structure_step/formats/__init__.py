@@ -1,36 +1,98 @@
-import os
-import pkgutil
-import sys
+"""
+The file formats that can be read and written.
+
+Each format is declared here with the module implementing it, which is only
+imported, along with Open Babel, when the format is first used. Any other format
+that Open Babel can handle is read and written with it as a last resort.
+"""
+
 import importlib
 
+from .registries import declare_format
+from .registries import defer
 from .registries import last_resort_reader
 from .registries import last_resort_writer
-from .openbabel_io.checkers import add_format_checkers
-from .openbabel_io.obabel import known_input_formats
-from .openbabel_io.obabel import load_file
-from .openbabel_io.obabel import known_output_formats
-from .openbabel_io.obabel import write_file
 
-path = os.path.join(os.path.dirname(__file__))
-modules = pkgutil.iter_modules(path=[path])
+_subpackages = ("cif", "mol2", "mop", "openbabel_io", "sdf", "smi")
+
+declare_format(
+    [".sd", ".sdf"],
+    "read_structure_step.formats.sdf.sdf",
+    reader="load_sdf",
+    streaming_reader="iter_sdf",
+    writer="write_sdf",
+    description="MDL structure-data file",
+)
+declare_format(
+    ".sdf", "read_structure_step.formats.sdf.sdf", checker="check_format", priority=90
+)
+declare_format(
+    ".smi",
+    "read_structure_step.formats.smi.smi",
+    reader="load_mol2",
+    streaming_reader="iter_smi",
+    writer="write_smi",
+    checker="check_format",
+    priority=10,
+    description="SMILES file",
+)
+declare_format(
+    ".mol2",
+    "read_structure_step.formats.mol2.mol2",
+    reader="load_mol2",
+    checker="check_format",
+    priority=100,
+    description="Tripos MOL2 file",
+)
+declare_format(
+    ".cif",
+    "read_structure_step.formats.cif.cif",
+    reader="load_cif",
+    checker="check_format",
+    priority=80,
+    description="Crystallographic Information File",
+)
+declare_format(
+    ".mmcif",
+    "read_structure_step.formats.cif.mmcif",
+    reader="load_mmcif",
+    checker="check_format",
+    priority=80,
+    description="Macromolecular Crystallographic Information File",
+)
+declare_format(".mop", "read_structure_step.formats.mop.obabel", reader="load_mop")
+declare_format(
+    ".mop", "read_structure_step.formats.mop", checker="check_format", priority=30
+)
+
+# Checkers for formats read by Open Babel
+declare_format(
+    ".pdb",
+    "read_structure_step.formats.openbabel_io.checkers",
+    checker="check_for_pdb",
+    priority=70,
+)
+declare_format(
+    ".xyz",
+    "read_structure_step.formats.openbabel_io.checkers",
+    checker="check_for_xyz",
+    priority=60,
+)
+
 
-for loader, mod_name, ispkg in modules:
-    # Ensure that module isn't already loaded
+def _add_openbabel_formats():
+    """Register the Open Babel reader and writer as the last resort."""
+    from .openbabel_io import obabel
 
-    if mod_name == "pdb":
-        # the name 'pdb' my also refer to the python debugger pdb
-        importlib.import_module("read_structure_step.formats.pdb")
+    last_resort_reader(obabel.known_input_formats, obabel.load_file)
+    last_resort_writer(obabel.known_output_formats, obabel.write_file)
 
-    else:
-        if mod_name not in sys.modules and ispkg is True:
-            # Import module
-            importlib.import_module("read_structure_step.formats." + mod_name)
 
-del os, pkgutil, sys, importlib
+defer(_add_openbabel_formats)
 
-# Finally register the Open Babel reader and writer as the last resort
-last_resort_reader(known_input_formats, load_file)
-last_resort_writer(known_output_formats, write_file)
 
-# And the file format checkers
-add_format_checkers()
+def __getattr__(name):
+    """Import the packages for the formats when first accessed."""
+    if name in _subpackages:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
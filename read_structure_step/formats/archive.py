@@ -0,0 +1,374 @@
+"""
+Reading many structure files at once: tar and zip archives, directory trees, and
+glob patterns such as "data/**/*.sdf".
+
+The members are enumerated lazily, so reading can start at once even for archives
+or directories with hundreds of thousands of files. Members of archives are handed
+to the readers as streams (see sources.py) rather than extracted to temporary files,
+and files in directories are read directly. For many small files, the members can
+also be parsed in a pool of worker processes: a background thread reads the archive
+or lists the directory, the workers work out the format of each member and parse it
+into structure records (see structure_record.py), and the main process creates the
+configurations in the original order. Only a limited number of members are in
+flight at once, so large archives are read in bounded memory.
+"""
+
+import contextlib
+import functools
+import glob
+import os
+from pathlib import Path
+from pathlib import PurePath
+import tarfile
+import zipfile
+
+from .compression import detect_compression
+from .compression import open_file
+from .compression import split_suffix
+from .parallel import ordered_map
+from .parallel import prefetch
+from .registries import get_reader
+from .registries import get_streaming_reader
+from .sniff import sniff_format
+from .sources import as_source
+from .sources import Stream
+
+# The characters that make a file name a glob pattern
+_glob_characters = "*?["
+
+
+def _is_pattern(path):
+    """Whether a path is a glob pattern rather than the name of an existing file."""
+    return any(c in str(path) for c in _glob_characters) and not Path(path).exists()
+
+
+def is_archive(path):
+    """Whether a path is an archive, directory or glob pattern of structure files.
+
+    Parameters
+    ----------
+    path : str or Path
+        The path or pattern.
+
+    Returns
+    -------
+    bool
+    """
+    if _is_pattern(path):
+        return True
+    path = Path(path)
+    if path.is_dir():
+        return True
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    return ".tar" in suffixes or ".tgz" in suffixes or ".zip" in suffixes
+
+
+def _wanted(name, extensions):
+    """The extension of a member, or False if it is hidden or not wanted.
+
+    Parameters
+    ----------
+    name : str
+        The name of the member.
+    extensions : [str] or None
+        The extensions wanted, or None for all.
+
+    Returns
+    -------
+    str or None or False
+        The extension without any compression suffix, None if there is none, or
+        False if the member should be skipped.
+    """
+    path = PurePath(name)
+    if any(part[0] == "." for part in path.parts if part not in (".", "..")):
+        return False
+    extension = split_suffix(path)[0].suffix.lower()
+    if extensions is not None and extension not in extensions:
+        return False
+    return extension or None
+
+
+def archive_members(path, extensions=None, in_memory=False):
+    """The structure files in an archive, directory tree, or glob pattern.
+
+    Directories, links and hidden files are skipped.
+
+    Parameters
+    ----------
+    path : str or Path
+        The path to the tar or zip file or directory, or a glob pattern, which may
+        use "**" for any number of directories.
+    extensions : [str] = None
+        Only members with these extensions are wanted. None for all.
+    in_memory : bool = False
+        Whether to give the contents of the members of archives in memory rather
+        than as streams. Files in directories are always given as paths.
+
+    Yields
+    ------
+    (str, str or None, str or Stream)
+        The name of each member, its extension without any compression suffix or
+        None if it has none, and the path to the file or a Stream. A Stream that is
+        not in memory is only valid until the next member is requested.
+    """
+    if _is_pattern(path):
+        yield from glob_members(path, extensions)
+        return
+
+    path = Path(path)
+    if path.is_dir():
+        yield from directory_members(path, extensions)
+    elif path.suffix.lower() == ".zip" or zipfile.is_zipfile(path):
+        yield from zip_members(path, extensions, in_memory=in_memory)
+    else:
+        yield from tar_members(path, extensions, in_memory=in_memory)
+
+
+def tar_members(path, extensions=None, in_memory=False):
+    """The structure files in a tar archive, which may be compressed.
+
+    Seeking backwards in a compressed archive means decompressing it again from the
+    beginning, so compressed archives are read sequentially and the members are
+    always given in memory.
+
+    Parameters
+    ----------
+    path : str or Path
+        The path to the tar file.
+    extensions : [str] = None
+        Only members with these extensions are wanted. None for all.
+    in_memory : bool = False
+        Whether to give the contents of the members in memory rather than as
+        streams.
+
+    Yields
+    ------
+    (str, str or None, Stream)
+        The name, extension and contents of each member, as in archive_members.
+    """
+    compressed = detect_compression(path) is not None
+    with contextlib.ExitStack() as stack:
+        if compressed:
+            fd = stack.enter_context(open_file(path, "rb"))
+            tar = stack.enter_context(tarfile.open(fileobj=fd, mode="r|"))
+        else:
+            tar = stack.enter_context(tarfile.open(path, "r"))
+
+        for member in tar:
+            if not member.isfile():
+                continue
+            extension = _wanted(member.name, extensions)
+            if extension is False:
+                continue
+
+            fd = tar.extractfile(member)
+            if fd is None:
+                continue
+
+            with fd:
+                if compressed or in_memory:
+                    yield member.name, extension, Stream(fd.read(), name=member.name)
+                else:
+                    yield member.name, extension, Stream(fd, name=member.name)
+
+
+def zip_members(path, extensions=None, in_memory=False):
+    """The structure files in a zip archive.
+
+    Parameters
+    ----------
+    path : str or Path
+        The path to the zip file.
+    extensions : [str] = None
+        Only members with these extensions are wanted. None for all.
+    in_memory : bool = False
+        Whether to give the contents of the members in memory rather than as
+        streams.
+
+    Yields
+    ------
+    (str, str or None, Stream)
+        The name, extension and contents of each member, as in archive_members.
+    """
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            extension = _wanted(info.filename, extensions)
+            if extension is False:
+                continue
+
+            if in_memory:
+                data = archive.read(info)
+                yield info.filename, extension, Stream(data, name=info.filename)
+            else:
+                with archive.open(info) as fd:
+                    yield info.filename, extension, Stream(fd, name=info.filename)
+
+
+def directory_members(path, extensions=None):
+    """The structure files in a directory and its subdirectories.
+
+    The directories are listed as they are reached, in alphabetical order.
+
+    Parameters
+    ----------
+    path : str or Path
+        The path to the directory.
+    extensions : [str] = None
+        Only files with these extensions are wanted. None for all.
+
+    Yields
+    ------
+    (str, str or None, str)
+        The path of each file relative to the directory, its extension, and the
+        full path, as in archive_members.
+    """
+    path = Path(path)
+    for root, dirnames, filenames in os.walk(path):
+        dirnames[:] = sorted(d for d in dirnames if d[0] != ".")
+        for filename in sorted(filenames):
+            full_path = os.path.join(root, filename)
+            name = os.path.relpath(full_path, path)
+            extension = _wanted(name, extensions)
+            if extension is False or not os.path.isfile(full_path):
+                continue
+            yield name, extension, full_path
+
+
+def glob_members(pattern, extensions=None):
+    """The structure files matching a glob pattern.
+
+    Parameters
+    ----------
+    pattern : str or Path
+        The pattern, which may use "**" for any number of directories.
+    extensions : [str] = None
+        Only files with these extensions are wanted. None for all.
+
+    Yields
+    ------
+    (str, str or None, str)
+        The path of each file, its extension, and the path again, as in
+        archive_members.
+    """
+    pattern = os.path.expanduser(str(pattern))
+    for name in glob.iglob(pattern, recursive=True):
+        extension = _wanted(name, extensions)
+        if extension is False or not os.path.isfile(name):
+            continue
+        yield name, extension, name
+
+
+@functools.lru_cache(maxsize=None)
+def _streaming_reader(extension):
+    """The function to parse files with an extension in the workers, or None.
+
+    The decision is cached for each extension, since every member is asked.
+    """
+    entry = get_streaming_reader(extension)
+    if entry is not None:
+        return entry["function"]
+
+    # Formats read by Open Babel can still be parsed in the workers.
+    from .openbabel_io import obabel
+
+    entry = get_reader(extension)
+    if entry is not None and entry["function"] is obabel.load_file:
+        return obabel.iter_file
+    return None
+
+
+def _parse_member(item, add_hydrogens=False, indices="1:end", **kwargs):
+    """Work out the format of a member and parse its structures.
+
+    This runs in the worker processes.
+
+    Parameters
+    ----------
+    item : (str, str or None, str or Stream)
+        The name of the member, its extension or None, and its path or contents
+        in memory.
+    add_hydrogens : bool = False
+        Whether to add any missing hydrogen atoms.
+    indices : str = "1:end"
+        The generalized indices selecting the structures in the member.
+    **kwargs
+        Any other options for the readers, e.g. geometry_cache for SMILES.
+
+    Returns
+    -------
+    dict
+        The "extension" of the format and "records", a list of the number of each
+        structure and its structure record. The records are None if the format has
+        no streaming reader, so the member must be read by the main process. If the
+        member could not be read, there is an "error" instead.
+    """
+    name, extension, source = item
+    source = as_source(source)
+    try:
+        if extension is None:
+            extension = sniff_format(source)
+            if extension is None:
+                return {"extension": None, "error": "the format is not recognized"}
+
+        reader = _streaming_reader(extension)
+        if reader is None:
+            return {"extension": extension, "records": None}
+
+        records = list(
+            reader(
+                source,
+                extension=extension,
+                add_hydrogens=add_hydrogens,
+                indices=indices,
+                **kwargs,
+            )
+        )
+    except Exception as e:
+        return {"extension": extension, "error": str(e)}
+    return {"extension": extension, "records": records}
+
+
+def parse_members(
+    members,
+    n_workers,
+    add_hydrogens=False,
+    indices="1:end",
+    chunksize=4,
+    read_ahead=16,
+    **kwargs,
+):
+    """Parse the members of an archive or directory in worker processes.
+
+    Parameters
+    ----------
+    members : iterable of (str, str or None, str or Stream)
+        The name, extension or None, and path or contents in memory of each member,
+        e.g. from archive_members(..., in_memory=True). They are read in a
+        background thread.
+    n_workers : int
+        The number of worker processes.
+    add_hydrogens : bool = False
+        Whether to add any missing hydrogen atoms.
+    indices : str = "1:end"
+        The generalized indices selecting the structures in each member.
+    chunksize : int = 4
+        The number of members sent to a worker at a time.
+    read_ahead : int = 16
+        The number of members read ahead of the workers.
+    **kwargs
+        Any other options for the readers, e.g. geometry_cache for SMILES.
+
+    Yields
+    ------
+    ((str, str or None, str or Stream), dict)
+        Each member and the result of parsing it (see _parse_member), in the order
+        of the members.
+    """
+    parse = functools.partial(
+        _parse_member, add_hydrogens=add_hydrogens, indices=indices, **kwargs
+    )
+    yield from ordered_map(
+        parse, prefetch(members, maxsize=read_ahead), n_workers, chunksize=chunksize
+    )
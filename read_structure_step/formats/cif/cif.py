@@ -2,16 +2,31 @@
 The cif/mmcif reader/writer
 """
 
+import io
 import logging
-from pathlib import Path
-
+import mmap
+
+from ..compression import open_file
+from ..indices import parse_indices
+from ..parallel import n_workers_to_use
+from ..parallel import ordered_map
+from ..progress import open_tracked
+from ..progress import Progress
+from ..record_index import BlockIndex
+from ..record_index import BlockScanner
 from ..registries import register_format_checker
 from ..registries import register_reader
 from ..registries import set_format_metadata
+from ..sources import as_source
+from ..sources import is_path
+from ..sources import source_size
 from seamm_util.printing import FormattedText as __
 
 logger = logging.getLogger(__name__)
 
+# The scratch database for parsing data blocks in worker processes
+_scratch_db = None
+
 set_format_metadata(
     [".cif"],
     single_structure=False,
@@ -24,31 +39,287 @@ set_format_metadata(
 )
 
 
+def get_block_index(path, selection):
+    """The index of the data blocks in a file, if current or needed for the selection.
+
+    The index is built if the selection needs the number of blocks or names blocks,
+    and the names in the selection are resolved into the numbers of the blocks.
+
+    Parameters
+    ----------
+    path : Path or Stream
+        The path to the CIF or mmCIF file, or a stream (see sources.py).
+    selection : Selection
+        The selected blocks, which is given the number of blocks if known.
+
+    Returns
+    -------
+    BlockIndex or None
+        The index, or None if there is no current index.
+    """
+    index = BlockIndex.load(path)
+    if index is None and selection.needs_count:
+        index = BlockIndex.get(path, opener=open_file)
+    if index is not None:
+        selection.resolve_names(index.find)
+        selection.n_structures = len(index)
+    return index
+
+
+def read_blocks(fd, path, selection, index=None, progress=None, spans=None):
+    """Read the selected data blocks in a CIF or mmCIF file.
+
+    Uncompressed files are memory-mapped, and each block is decoded directly from the
+    mapped file, so only the text of the current block is held in memory. Other
+    files are scanned with a buffer holding just the current block.
+
+    With an index, only the selected blocks are read. Otherwise the blocks are split
+    from the file and, if the whole of a large file is read, the index is saved for
+    next time.
+
+    Parameters
+    ----------
+    fd : binary file-like object
+        The stream of the file, positioned at the beginning.
+    path : Path or Stream
+        The path to the file, or a stream (see sources.py).
+    selection : Selection
+        The selected blocks.
+    index : BlockIndex = None
+        The index of the blocks, if available.
+    progress : Progress = None
+        The progress reporter, which is given the position in a memory-mapped file.
+    spans : [(int, int)] = None
+        If given, the offset and length in the file of each block is appended to the
+        list as the block is read.
+
+    Yields
+    ------
+    (int, str)
+        The number of the block, counting from 1, and its text.
+    """
+    mapped = _map(fd, path)
+    blocks = None
+    try:
+        if index is not None:
+            wanted = None
+            if not selection.is_all:
+                wanted = [block_no - 1 for block_no in selection.selected()]
+            if mapped is None:
+                for i, text in index.records(fd, wanted):
+                    if spans is not None:
+                        spans.append(index.span(i))
+                    yield i + 1, _decode(text)
+            else:
+                for i in range(len(index)) if wanted is None else wanted:
+                    start, length = index.span(i)
+                    if spans is not None:
+                        spans.append((start, length))
+                    with memoryview(mapped)[start : start + length] as view:
+                        text = _decode(view)
+                    yield i + 1, text
+            return
+
+        stat = path.stat() if is_path(path) else None
+        offsets = []
+        names = []
+        scanner = BlockScanner(
+            fd if mapped is None else mapped,
+            b"data_",
+            selection,
+            offsets=offsets,
+            names=names,
+        )
+        if progress is not None and mapped is not None:
+            progress.tell = scanner.tell
+        blocks = iter(scanner)
+        for block_no, view in blocks:
+            if spans is not None:
+                spans.append((offsets[-1], len(view)))
+            with view:
+                text = _decode(view)
+            yield block_no, text
+
+        # The offsets are only complete if the end of the file was reached
+        if stat is not None and len(offsets) == len(names) + 1:
+            index = BlockIndex(
+                offsets, names=names, size=stat.st_size, mtime_ns=stat.st_mtime_ns
+            )
+            if index.is_worth_saving():
+                index.save(path)
+    finally:
+        # The scanner must let go of the mapped file before it is closed.
+        if blocks is not None:
+            blocks.close()
+        if mapped is not None:
+            mapped.close()
+
+
+def is_mappable(fd, path):
+    """Whether the stream is an uncompressed file that can be memory-mapped.
+
+    Parameters
+    ----------
+    fd : binary file-like object
+        The stream of the file.
+    path : Path or Stream
+        The path to the file, or a stream (see sources.py).
+
+    Returns
+    -------
+    bool
+        True if the offsets in the stream are those in the file itself.
+    """
+    return is_path(path) and isinstance(fd, io.BufferedReader)
+
+
+def _map(fd, path):
+    """Memory-map an uncompressed file, returning None if it cannot be mapped."""
+    if not is_mappable(fd, path):
+        return None
+    try:
+        return mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # e.g. an empty file
+        return None
+
+
+def _decode(text):
+    """Decode the text of a block, with newlines as when reading text."""
+    text = str(text, "utf-8", errors="replace")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n")
+    return text
+
+
 @register_format_checker(".cif")
-def check_format(path):
+def check_format(sample):
     """Check if a file is a Crystallographic Information File (CIF) file
 
     Check for "data_..." at the beginning of a line and no dots in item keys
 
     Parameters
     ----------
-    path : str or Path
+    sample : Sample
+        The beginning and end of the file.
+
+    Returns
+    -------
+    float
+        The confidence that the file is a CIF file.
     """
-    result = False
     in_data_block = False
-    with open(path, "r") as fd:
-        for line in fd:
-            line = line.strip()
-            if in_data_block:
-                if line[0] == "_":
-                    result = "." not in line.split()[0]
-                    break
-            if line[0:5] == "data_":
-                in_data_block = True
-    return result
-
-
-@register_reader(".cif -- Crystallographic Information File")
+    for line in sample.lines:
+        line = line.strip()
+        if in_data_block:
+            if line[0:1] == "_":
+                key = line.split()[0]
+                return 0.9 if "." not in key else 0.0
+        elif line[0:5] == "data_":
+            in_data_block = True
+    return 0.0
+
+
+def _parse_block(item):
+    """Parse a CIF data block in a worker process.
+
+    The block is parsed by molsystem into a configuration in a scratch, in-memory
+    database, which is then reduced to a picklable dictionary of the cell, symmetry,
+    asymmetric atoms and bonds, so that the main process can create the configuration
+    with _add_block without parsing the text again.
+
+    Parameters
+    ----------
+    item : (int, str)
+        The number of the data block in the file and its text.
+
+    Returns
+    -------
+    dict
+        The data for the configuration.
+    """
+    global _scratch_db
+
+    if _scratch_db is None:
+        from molsystem.system_db import SystemDB
+
+        _scratch_db = SystemDB(filename=":memory:")
+
+    system = _scratch_db.create_system()
+    try:
+        configuration = system.create_configuration()
+        text = configuration.from_cif_text(item[1])
+
+        block = {"text": text, "periodicity": configuration.periodicity}
+        if configuration.periodicity == 3:
+            block["cell"] = configuration.cell.parameters
+            block["symops"] = configuration.symmetry.symops
+            block["group"] = configuration.symmetry.group
+
+        atoms = configuration.atoms.get_as_dict(asymmetric=True)
+        block["atoms"] = {key: atoms[key] for key in ("atno", "x", "y", "z")}
+        if "name" in atoms and None not in atoms["name"]:
+            block["atoms"]["name"] = atoms["name"]
+
+        # The bonds, by the index of their atoms
+        index = {atom_id: i for i, atom_id in enumerate(atoms["id"])}
+        bonds = configuration.bonds.get_as_dict()
+        block["bonds"] = {
+            "i": [index[i] for i in bonds["i"]],
+            "j": [index[j] for j in bonds["j"]],
+            "bondorder": bonds["bondorder"],
+            "symop1": bonds["symop1"],
+            "symop2": bonds["symop2"],
+        }
+    finally:
+        _scratch_db.delete_system(system)
+
+    return block
+
+
+def _add_block(configuration, block):
+    """Create a configuration from a data block parsed by _parse_block.
+
+    Parameters
+    ----------
+    configuration : molsystem.Configuration
+        The configuration to put the structure into.
+    block : dict
+        The data from _parse_block.
+
+    Returns
+    -------
+    str
+        Any warnings from parsing the block, as from_cif_text returns.
+    """
+    configuration.clear()
+    if block["periodicity"] == 3:
+        configuration.periodicity = 3
+        configuration.coordinate_system = "fractional"
+        configuration.cell.parameters = block["cell"]
+        # Keep the operators from the file, since the bonds refer to them.
+        configuration.symmetry.symops = block["symops"]
+        configuration.symmetry.update_group(block["group"])
+
+    atoms = block["atoms"]
+    if "name" in atoms and "name" not in configuration.atoms:
+        configuration.atoms.add_attribute("name")
+    ids = configuration.atoms.append(**atoms)
+
+    bonds = block["bonds"]
+    if len(bonds["i"]) > 0:
+        configuration.bonds.append(
+            i=[ids[i] for i in bonds["i"]],
+            j=[ids[j] for j in bonds["j"]],
+            bondorder=bonds["bondorder"],
+            symop1=bonds["symop1"],
+            symop2=bonds["symop2"],
+        )
+
+    return block["text"]
+
+
+@register_reader(".cif")
 def load_cif(
     path,
     configuration,
@@ -63,6 +334,8 @@ def load_cif(
     printer=None,
     references=None,
     bibliography=None,
+    n_workers=1,
+    bulk=None,
     **kwargs,
 ):
     """Read a Crystallographic Information File
@@ -72,8 +345,9 @@ def load_cif(
 
     Parameters
     ----------
-    file_name : str or Path
-        The path to the file, as either a string or Path.
+    file_name : str or Path or bytes or file-like object
+        The path to the file, as either a string or Path, or its contents or an open
+        stream (see sources.py).
 
     configuration : molsystem.Configuration
         The configuration to put the imported structure into.
@@ -92,7 +366,8 @@ def load_cif(
 
     indices : str = "1:end"
         The generalized indices (slices, SMARTS, etc.) to select structures
-        from a file containing multiple structures.
+        from a file containing multiple structures. Data blocks can also be selected
+        by name, e.g. "data_ACETCR", using an index of the blocks.
 
     subsequent_as_configurations : bool = False
         Normally and subsequent structures are loaded into new systems; however,
@@ -115,80 +390,47 @@ def load_cif(
     bibliography : dict
         The bibliography as a dictionary.
 
+    n_workers : int = 1
+        The number of worker processes parsing the data blocks. The configurations are
+        still created in the order of the file by this process. 0 or None use all the
+        cores.
+
+    bulk : BulkImport = None
+        Commits the structures to the database in batches. See
+        formats/transactions.py.
+
     Returns
     -------
     [Configuration]
         The list of configurations created.
     """
-    if isinstance(path, str):
-        path = Path(path)
+    path = as_source(path)
+
+    n_workers = n_workers_to_use(n_workers)
+
+    selection = parse_indices(indices)
+    index = get_block_index(path, selection)
 
-    path.expanduser().resolve()
+    # Report the progress, estimated from the position in the file
+    fd, raw = open_tracked(path)
+    progress = None
+    if printer is not None:
+        progress = Progress(printer, tell=raw.tell, size=source_size(path))
 
     configurations = []
     structure_no = 0
-    lines = []
-    in_block = False
-    block_name = ""
-    with open(path, "r") as fd:
-        for line in fd:
-            if line[0:5] == "data_":
-                logger.debug(f"Found block {line}")
-                if not in_block:
-                    in_block = True
-                    block_name = line[5:].strip()
-                else:
-                    structure_no += 1
-                    if structure_no > 1:
-                        if subsequent_as_configurations:
-                            configuration = system.create_configuration()
-                        else:
-                            system = system_db.create_system()
-                            configuration = system.create_configuration()
-
-                    text = configuration.from_cif_text("\n".join(lines))
-                    if text != "":
-                        printer("\n")
-                        printer(__(text, indent=4 * " "))
-
-                    configurations.append(configuration)
-
-                    logger.debug(f"   added system {system_db.n_systems}: {block_name}")
-
-                    # Set the system name
-                    if system_name is not None and system_name != "":
-                        lower_name = str(system_name).lower()
-                        if "from file" in lower_name:
-                            system.name = block_name
-                        elif "file name" in lower_name:
-                            system.name = path.stem
-                        elif "formula" in lower_name:
-                            system.name = configuration.formula()[0]
-                        elif "empirical formula" in lower_name:
-                            system.name = configuration.formula()[1]
-                        else:
-                            system.name = str(system_name)
-
-                    # And the configuration name
-                    if configuration_name is not None and configuration_name != "":
-                        lower_name = str(configuration_name).lower()
-                        if "from file" in lower_name:
-                            configuration.name = block_name
-                        elif "file name" in lower_name:
-                            configuration.name = path.stem
-                        elif "formula" in lower_name:
-                            configuration.name = configuration.formula()[0]
-                        elif "empirical formula" in lower_name:
-                            configuration.name = configuration.formula()[1]
-                        else:
-                            configuration.name = str(configuration_name)
-                    logger.debug(f"   added system {system_db.n_systems}: {block_name}")
-                block_name = line[5:].strip()
-                lines = []
-            lines.append(line)
-
-        if len(lines) > 0:
-            # The last block just ends at the end of the file
+    with fd, raw:
+        # Unselected blocks are skipped before doing any real work
+        blocks = read_blocks(fd, path, selection, index=index, progress=progress)
+        if n_workers > 1:
+            parsed = ordered_map(_parse_block, blocks, n_workers, chunksize=8)
+        else:
+            parsed = ((item, None) for item in blocks)
+
+        for (block_no, text), block in parsed:
+            block_name = text[5 : text.find("\n")].strip()
+            logger.debug(f"Found block {block_no}: {block_name}")
+
             structure_no += 1
             if structure_no > 1:
                 if subsequent_as_configurations:
@@ -197,13 +439,17 @@ def load_cif(
                     system = system_db.create_system()
                     configuration = system.create_configuration()
 
-            text = configuration.from_cif_text("\n".join(lines))
-            logger.debug(f"   added system {system_db.n_systems}: {block_name}")
-            if text != "":
+            if block is None:
+                text = configuration.from_cif_text(text)
+            else:
+                text = _add_block(configuration, block)
+            if text != "" and printer is not None:
                 printer("\n")
                 printer(__(text, indent=4 * " "))
 
-                configurations.append(configuration)
+            configurations.append(configuration)
+
+            logger.debug(f"   added system {system_db.n_systems}: {block_name}")
 
             # Set the system name
             if system_name is not None and system_name != "":
@@ -212,10 +458,10 @@ def load_cif(
                     system.name = block_name
                 elif "file name" in lower_name:
                     system.name = path.stem
-                elif "formula" in lower_name:
-                    system.name = configuration.formula()[0]
                 elif "empirical formula" in lower_name:
                     system.name = configuration.formula()[1]
+                elif "formula" in lower_name:
+                    system.name = configuration.formula()[0]
                 else:
                     system.name = str(system_name)
 
@@ -226,11 +472,18 @@ def load_cif(
                     configuration.name = block_name
                 elif "file name" in lower_name:
                     configuration.name = path.stem
-                elif "formula" in lower_name:
-                    configuration.name = configuration.formula()[0]
                 elif "empirical formula" in lower_name:
                     configuration.name = configuration.formula()[1]
+                elif "formula" in lower_name:
+                    configuration.name = configuration.formula()[0]
+                elif lower_name == "sequential":
+                    configuration.name = str(block_no)
                 else:
                     configuration.name = str(configuration_name)
 
-        return configurations
+            if progress is not None:
+                progress.update(structure_no)
+            if bulk is not None:
+                bulk.added()
+
+    return configurations
@@ -1,16 +1,117 @@
 """
 The mmcif reader/writer
+
+Most of the time reading large mmCIF files, e.g. of ribosomes or from cryo-EM, goes
+into tokenizing the _atom_site loop in Python. For blocks holding a single structure,
+parse_atom_site reads the loop directly into NumPy arrays: the coordinates and other
+numbers as arrays of numbers, and the element and residue columns as categories with
+an array of codes. load_atom_site then adds the atoms to the configuration in
+batches, giving the same atoms and attributes as molsystem's from_mmcif_text. Blocks
+that parse_atom_site does not handle, e.g. with values spanning lines, are read with
+from_mmcif_text.
+
+NMR ensembles can hold many models of the same atoms, most of which are never used.
+parse_ensemble reads just the first model, and finds where the rows of the others
+are. load_ensemble stores the atoms once, in the configuration of the first model,
+sharing them with a configuration for each other model. By default the coordinates
+of all the models are read. If only some are selected, the others in uncompressed
+files are left at the origin until ensure_coordinates reads them from the file; they
+are not read automatically when the coordinates are used.
 """
 
 import logging
 from pathlib import Path
+import re
+
+import numpy as np
+
+from molsystem.elements import symbol_to_atno
 
+from .cif import get_block_index
+from .cif import is_mappable
+from .cif import read_blocks
+from ..compression import open_file
+from ..indices import parse_indices
+from ..progress import open_tracked
+from ..progress import Progress
 from ..registries import register_format_checker
 from ..registries import register_reader
 from ..registries import set_format_metadata
+from ..sources import as_source
+from ..sources import source_size
+from ..structure_record import coordinates_property
+from ..structure_record import coordinates_source_property
 
 logger = logging.getLogger(__name__)
 
+# The _atom_site items loaded into the atoms, as in molsystem's from_mmcif_text: the
+# item, the attribute, its type, and the default. An attribute of None is named after
+# the item. The model number is ignored.
+_atom_site_items = (
+    ("_atom_site.group_PDB", None, "str", "HETATOM"),
+    ("_atom_site.id", None, "str", None),
+    ("_atom_site.type_symbol", "symbol", "str", None),
+    ("_atom_site.label_atom_id", None, "str", None),
+    ("_atom_site.label_alt_id", None, "str", ""),
+    ("_atom_site.label_comp_id", None, "str", None),
+    ("_atom_site.label_asym_id", None, "str", None),
+    ("_atom_site.label_entity_id", None, "str", None),
+    ("_atom_site.label_seq_id", None, "int", None),
+    ("_atom_site.pdbx_PDB_ins_code", None, "str", None),
+    ("_atom_site.Cartn_x", "x", "float", 0.0),
+    ("_atom_site.Cartn_y", "y", "float", 0.0),
+    ("_atom_site.Cartn_z", "z", "float", 0.0),
+    ("_atom_site.occupancy", "occupancy", "float", 0.0),
+    ("_atom_site.B_iso_or_equiv", None, "float", 0.0),
+    ("_atom_site.pdbx_formal_charge", "formal_charge", "int", 0),
+)
+_required_items = (
+    "_atom_site.id",
+    "_atom_site.type_symbol",
+    "_atom_site.Cartn_x",
+    "_atom_site.Cartn_y",
+    "_atom_site.Cartn_z",
+)
+
+# Text columns with a different value for each atom, which are not categories
+_unique_items = ("_atom_site.id",)
+
+# Values that mean the value is missing, which from_mmcif_text gives as None
+_missing = (b"", b".", b"?")
+
+# The loop of _atom_site items, the line ending it, the next line that is not a
+# comment, and the name of the entry
+_atom_site_re = re.compile(
+    r"^loop_[ \t]*\r?\n((?:[ \t]*_atom_site\.\S+[ \t]*\r?\n)+)", re.MULTILINE
+)
+_end_re = re.compile(
+    r"^[ \t]*(?:#|_|;|loop_|data_|save_|global_|stop_)", re.MULTILINE | re.IGNORECASE
+)
+_next_re = re.compile(r"^[ \t]*([^#\s]\S*)", re.MULTILINE)
+_keywords = ("_", "loop_", "data_", "save_", "global_", "stop_")
+_entry_re = re.compile(r"^_entry\.id[ \t]+(\S+)[ \t]*\r?$", re.MULTILINE)
+
+# The number of models in an NMR ensemble, and the representative model
+_ensemble_re = re.compile(
+    r"^_pdbx_nmr_ensemble\.conformers_submitted_total_number[ \t]+(\S+)",
+    re.MULTILINE,
+)
+_representative_re = re.compile(
+    r"^_pdbx_nmr_representative\.conformer_id[ \t]+(\S+)", re.MULTILINE
+)
+_model_item = "_atom_site.pdbx_PDB_model_num"
+
+# The items that must be the same for the atoms of each model in an ensemble
+_topology_items = ("_atom_site.type_symbol", "_atom_site.label_atom_id")
+_xyz_items = ("_atom_site.Cartn_x", "_atom_site.Cartn_y", "_atom_site.Cartn_z")
+
+# Lookup table of the whitespace characters separating tokens
+_blank = np.zeros(256, dtype=bool)
+_blank[[ord(" "), ord("\t"), ord("\n"), ord("\r")]] = True
+
+# The size of the pieces of the loop tokenized at once, in characters
+_chunk_size = 1 << 22
+
 set_format_metadata(
     [".mmcif"],
     single_structure=False,
@@ -23,8 +124,590 @@ set_format_metadata(
 )
 
 
+def _chunks(text, start, end, size=_chunk_size):
+    """Split text into pieces of about the given size at the ends of lines.
+
+    Parameters
+    ----------
+    text : str
+        The text.
+    start : int
+        The start of the part of the text to split.
+    end : int
+        The end of the part of the text to split.
+    size : int
+        The approximate size of the pieces, in characters.
+
+    Yields
+    ------
+    (int, bytes)
+        The start of each piece in the text, and the piece encoded as UTF-8.
+    """
+    while start < end:
+        stop = min(start + size, end)
+        if stop < end:
+            newline = text.rfind("\n", start, stop)
+            if newline < 0:
+                newline = text.find("\n", stop, end)
+            stop = end if newline < 0 else newline + 1
+        yield start, text[start:stop].encode("utf-8")
+        start = stop
+
+
+def _tokenize(buffer, n_columns):
+    """Find the tokens in the rows of a loop, one row per line.
+
+    Parameters
+    ----------
+    buffer : numpy.ndarray
+        The text of the rows as an array of bytes.
+    n_columns : int
+        The number of items in the loop.
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray) or None
+        The start and end of each token, with one row per row of the loop, or None if
+        the rows are not simple lines of tokens.
+    """
+    blank = np.concatenate(([True], _blank[buffer], [True])).view(np.int8)
+    edges = np.diff(blank)
+    starts = np.flatnonzero(edges == -1)
+    ends = np.flatnonzero(edges == 1)
+    if len(starts) % n_columns != 0:
+        return None
+    if len(starts) == 0:
+        return starts.reshape(0, n_columns), ends.reshape(0, n_columns)
+
+    # Each row must be on its own line
+    lines = np.cumsum(buffer == ord("\n"), dtype=np.int32)[starts]
+    lines = lines.reshape(-1, n_columns)
+    if not (lines == lines[:, 0:1]).all() or (np.diff(lines[:, 0]) <= 0).any():
+        return None
+
+    # Comments are not handled, nor quoted values containing whitespace
+    first = buffer[starts]
+    if (first == ord("#")).any():
+        return None
+    quoted = (first == ord("'")) | (first == ord('"'))
+    if quoted.any():
+        closed = (buffer[ends - 1] == first) & (ends - starts >= 2)
+        if (quoted & ~closed).any():
+            return None
+        starts[quoted] += 1
+        ends[quoted] -= 1
+
+    return starts.reshape(-1, n_columns), ends.reshape(-1, n_columns)
+
+
+def _column(buffer, starts, ends):
+    """The tokens in a column of a loop as an array of byte strings.
+
+    Parameters
+    ----------
+    buffer : numpy.ndarray
+        The text of the rows as an array of bytes.
+    starts : numpy.ndarray
+        The start of the token in each row.
+    ends : numpy.ndarray
+        The end of the token in each row.
+
+    Returns
+    -------
+    numpy.ndarray
+        The tokens, as fixed-width byte strings.
+    """
+    lengths = ends - starts
+    width = max(int(lengths.max(initial=0)), 1)
+    offsets = np.arange(width)
+    index = np.minimum(starts[:, np.newaxis] + offsets, len(buffer) - 1)
+    table = np.where(offsets < lengths[:, np.newaxis], buffer[index], 0)
+    return table.astype(np.uint8).view(f"S{width}")[:, 0]
+
+
+def _categories(values):
+    """Split text values into the categories and the code of each value.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        The values, as byte strings.
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+        The categories as an array of str or None, if missing, and the index of the
+        category of each value.
+    """
+    categories, codes = np.unique(values, return_inverse=True)
+    categories = np.array(
+        [None if x in _missing else x.decode("utf-8") for x in categories.tolist()],
+        dtype=object,
+    )
+    return categories, codes.astype(np.int32)
+
+
+def _numbers(values, dtype):
+    """Convert text values to numbers, with None for missing values.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        The values, as byte strings.
+    dtype : numpy.dtype
+        The type of the numbers.
+
+    Returns
+    -------
+    numpy.ndarray
+        The numbers, or an array of objects if any are missing.
+    """
+    missing = np.isin(values, _missing)
+    if not missing.any():
+        return values.astype(dtype)
+    numbers = np.where(missing, b"0", values).astype(dtype).astype(object)
+    numbers[missing] = None
+    return numbers
+
+
+def parse_atom_site(text):
+    """Read the _atom_site loop of an mmCIF data block into arrays.
+
+    Parameters
+    ----------
+    text : str
+        The text of the data block.
+
+    Returns
+    -------
+    dict or None
+        The "name" of the entry, the number of atoms "n_atoms", and the "items",
+        a dictionary of the values of each _atom_site item: arrays of numbers, or the
+        categories and codes for text, except that the symbols are given as the
+        atomic numbers. None if the data block should be read by from_mmcif_text.
+    """
+    # Only single structures with Cartesian coordinates are handled
+    if "_pdbx_nmr_ensemble." in text:
+        return None
+    loop = _find_atom_site(text)
+    if loop is None:
+        return None
+    name, items, start, end = loop
+
+    wanted = _wanted(items)
+    pieces = {item: [] for item in wanted}
+    for _, chunk in _chunks(text, start, end):
+        buffer = np.frombuffer(chunk, dtype=np.uint8)
+        tokens = _tokenize(buffer, len(items))
+        if tokens is None:
+            return None
+        starts, ends = tokens
+        for item, column in wanted.items():
+            pieces[item].append(_column(buffer, starts[:, column], ends[:, column]))
+
+    return _atom_site(name, pieces)
+
+
+def _find_atom_site(text):
+    """Find the _atom_site loop of a data block, if parse_atom_site can read it.
+
+    Parameters
+    ----------
+    text : str
+        The text of the data block.
+
+    Returns
+    -------
+    (str, [str], int, int) or None
+        The name of the entry, the items in the loop, and the start and end of its
+        rows in the text, or None if the data block should be read by
+        from_mmcif_text.
+    """
+    if "_chem_comp_atom." in text:
+        return None
+    entry = _entry_re.search(text)
+    loop = _atom_site_re.search(text)
+    if entry is None or loop is None:
+        return None
+    items = loop.group(1).split()
+    if not all(item in items for item in _required_items):
+        return None
+    if "_atom_site.fract_x" in items:
+        return None
+
+    start = loop.end()
+    end = _end_re.search(text, start)
+    if end is None:
+        end = len(text)
+    else:
+        # Comments do not end the loop, so check that the loop does not continue.
+        token = _next_re.search(text, end.start())
+        if token is not None and not token.group(1).lower().startswith(_keywords):
+            return None
+        end = end.start()
+    return entry.group(1), items, start, end
+
+
+def _wanted(items):
+    """The column of each of the _atom_site items that are loaded."""
+    wanted = {}
+    for item, *_ in _atom_site_items:
+        if item in items:
+            wanted[item] = items.index(item)
+    return wanted
+
+
+def _atom_site(name, pieces):
+    """Convert the text of the columns of the _atom_site loop to the values.
+
+    Parameters
+    ----------
+    name : str
+        The name of the entry.
+    pieces : {str: [numpy.ndarray]}
+        The pieces of the text of each column.
+
+    Returns
+    -------
+    dict or None
+        The data as given by parse_atom_site.
+    """
+    n_atoms = 0
+    result = {}
+    for item, _, _type, _ in _atom_site_items:
+        if item not in pieces:
+            continue
+        values = np.concatenate(pieces.pop(item))
+        n_atoms = len(values)
+        if _type == "float":
+            result[item] = _numbers(values, np.float64)
+        elif _type == "int":
+            result[item] = _numbers(values, np.int64)
+        elif item in _unique_items:
+            result[item] = np.array(
+                [None if x in _missing else x.decode("utf-8") for x in values.tolist()],
+                dtype=object,
+            )
+        elif item == "_atom_site.type_symbol":
+            categories, codes = _categories(values)
+            if not all(x in symbol_to_atno for x in categories):
+                # Leave it to from_mmcif_text to complain
+                return None
+            atnos = np.array([symbol_to_atno[x] for x in categories], dtype=object)
+            result[item] = (atnos, codes)
+        else:
+            result[item] = _categories(values)
+
+    return {"name": name, "n_atoms": n_atoms, "items": result}
+
+
+def load_atom_site(configuration, atom_site, batch_size=100000):
+    """Put the atoms from parse_atom_site into a configuration.
+
+    The configuration is set up as from_mmcif_text does, and the atoms are added in
+    batches, which limits the memory used for very large structures.
+
+    Parameters
+    ----------
+    configuration : molsystem.Configuration
+        The configuration to put the structure into.
+    atom_site : dict
+        The data from parse_atom_site.
+    batch_size : int = 100000
+        The number of atoms to add at a time.
+    """
+    configuration.clear()
+    configuration.periodicity = 0
+    configuration.coordinate_system = "Cartesian"
+    configuration.name = atom_site["name"]
+
+    atoms = configuration.atoms
+    columns = {}
+    for item, key, _type, default in _atom_site_items:
+        if item not in atom_site["items"]:
+            continue
+        if key is None:
+            key = item
+        if key == "symbol":
+            key = "atno"
+        elif key not in atoms:
+            atoms.add_attribute(key, _type, default=default)
+        columns[key] = atom_site["items"][item]
+
+    n_atoms = atom_site["n_atoms"]
+    for first in range(0, n_atoms, batch_size):
+        last = min(first + batch_size, n_atoms)
+        data = {}
+        for key, values in columns.items():
+            if isinstance(values, tuple):
+                categories, codes = values
+                data[key] = categories[codes[first:last]].tolist()
+            else:
+                data[key] = values[first:last].tolist()
+        atoms.append(**data)
+
+
+def parse_ensemble(text):
+    """Read the first model of an NMR ensemble, and find the rows of the others.
+
+    All the models must have the same atoms, in the same order. Only the first model
+    is read completely; for the others just the start and end of their rows in the
+    _atom_site loop are found, so that their coordinates can be read when needed
+    with read_coordinates.
+
+    Parameters
+    ----------
+    text : str
+        The text of the data block.
+
+    Returns
+    -------
+    dict or None
+        The data for the first model as given by parse_atom_site, with the number of
+        each of the "models", the start and end in the text of their "rows", the
+        number of "columns" in the loop and the columns of the coordinates, "xyz".
+        Also the number of models claimed, "n_ensemble", and the "representative"
+        model, or None. None if the data block should be read by from_mmcif_text.
+    """
+    ensemble = _ensemble_re.search(text)
+    if ensemble is None or not text.isascii():
+        return None
+    loop = _find_atom_site(text)
+    if loop is None:
+        return None
+    name, items, start, end = loop
+    if _model_item not in items:
+        return None
+
+    wanted = _wanted(items)
+    pieces = {item: [] for item in wanted}
+    checks = {item: [] for item in _topology_items if item in wanted}
+    model_column = items.index(_model_item)
+    models = []
+    row_starts = []
+    first_model = None
+    for offset, chunk in _chunks(text, start, end):
+        buffer = np.frombuffer(chunk, dtype=np.uint8)
+        tokens = _tokenize(buffer, len(items))
+        if tokens is None:
+            return None
+        starts, ends = tokens
+        try:
+            numbers = _column(
+                buffer, starts[:, model_column], ends[:, model_column]
+            ).astype(np.int64)
+        except ValueError:
+            return None
+        models.append(numbers)
+        row_starts.append(starts[:, 0] + offset)
+        for item in checks:
+            column = wanted[item]
+            checks[item].append(_column(buffer, starts[:, column], ends[:, column]))
+
+        # Only the rows of the first model are read completely
+        if first_model is None and len(numbers) > 0:
+            first_model = numbers[0]
+        others = np.flatnonzero(numbers != first_model)
+        n = len(numbers) if len(others) == 0 else others[0]
+        if n > 0:
+            for item, column in wanted.items():
+                pieces[item].append(
+                    _column(buffer, starts[:n, column], ends[:n, column])
+                )
+
+    # Each model is a run of rows, and all the runs must have the same atoms
+    models = np.concatenate(models)
+    if len(models) == 0:
+        return None
+    firsts = np.concatenate(([0], np.flatnonzero(np.diff(models)) + 1))
+    n_atoms = len(models) // len(firsts)
+    if len(models) != n_atoms * len(firsts) or (np.diff(firsts) != n_atoms).any():
+        return None
+    if len(np.unique(models[firsts])) != len(firsts):
+        return None
+    for values in checks.values():
+        values = np.concatenate(values).reshape(len(firsts), n_atoms)
+        if not (values == values[0:1]).all():
+            return None
+
+    atom_site = _atom_site(name, pieces)
+    if atom_site is None:
+        return None
+
+    row_starts = np.concatenate(row_starts)[firsts].tolist()
+    representative = _representative_re.search(text)
+    try:
+        representative = int(representative.group(1))
+    except (AttributeError, ValueError):
+        representative = None
+    try:
+        n_ensemble = int(ensemble.group(1))
+    except ValueError:
+        n_ensemble = None
+
+    atom_site["models"] = models[firsts].tolist()
+    atom_site["rows"] = list(zip(row_starts, row_starts[1:] + [end]))
+    atom_site["columns"] = len(items)
+    atom_site["xyz"] = [items.index(item) for item in _xyz_items]
+    atom_site["n_ensemble"] = n_ensemble
+    atom_site["representative"] = representative
+    return atom_site
+
+
+def read_coordinates(data, n_columns, xyz):
+    """Read the coordinates from rows of the _atom_site loop.
+
+    Parameters
+    ----------
+    data : bytes
+        The text of the rows.
+    n_columns : int
+        The number of items in the loop.
+    xyz : [int]
+        The columns of the x, y and z coordinates.
+
+    Returns
+    -------
+    numpy.ndarray
+        The coordinates, as an n x 3 array.
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    tokens = _tokenize(buffer, n_columns)
+    if tokens is None:
+        raise ValueError("The rows of the _atom_site loop could not be read.")
+    starts, ends = tokens
+    return np.column_stack(
+        [
+            _column(buffer, starts[:, column], ends[:, column]).astype(np.float64)
+            for column in xyz
+        ]
+    )
+
+
+def load_ensemble(configuration, ensemble, text, selection, source=None):
+    """Put the models of an NMR ensemble from parse_ensemble into configurations.
+
+    The first model is put into the configuration, and the other models into new
+    configurations of its system sharing its atoms, so the topology is only stored
+    once. The coordinates of the first model, the representative one and those
+    selected are read at once. If the source of the text is given, the coordinates
+    of the others are left until needed, when ensure_coordinates reads them from the
+    file; until then they are zero.
+
+    Parameters
+    ----------
+    configuration : molsystem.Configuration
+        The configuration for the first model.
+    ensemble : dict
+        The data from parse_ensemble.
+    text : str
+        The text of the data block.
+    selection : Selection
+        The models whose coordinates are read at once, counting from 1.
+    source : dict = None
+        The "path" of the file, its "size" and "mtime_ns", and the "offset" of the
+        data block in the file.
+
+    Returns
+    -------
+    [molsystem.Configuration]
+        The configuration of each model.
+    """
+    models = ensemble["models"]
+    representative = ensemble["representative"]
+    selection.n_structures = len(models)
+
+    load_atom_site(configuration, ensemble)
+    configuration.name = _model_name(models[0], representative)
+    system = configuration.system
+    atomset = configuration.atomset
+    bondset = configuration.bondset
+
+    if source is not None:
+        properties = configuration.properties
+        if not properties.exists(coordinates_property):
+            properties.add(coordinates_property, _type="str")
+        if not properties.exists(coordinates_source_property):
+            properties.add(coordinates_source_property, _type="json")
+
+    configurations = [configuration]
+    rows = ensemble["rows"]
+    for model_no in range(2, len(models) + 1):
+        model = models[model_no - 1]
+        first, last = rows[model_no - 1]
+        other = system.create_configuration(
+            _model_name(model, representative), atomset=atomset, bondset=bondset
+        )
+        configurations.append(other)
+        if source is None or model == representative or model_no in selection:
+            xyz = read_coordinates(
+                text[first:last].encode("ascii"), ensemble["columns"], ensemble["xyz"]
+            )
+            other.atoms.set_coordinates(xyz, fractionals=False)
+        else:
+            other.properties.put(coordinates_property, "lazy")
+            other.properties.put(
+                coordinates_source_property,
+                {
+                    "path": source["path"],
+                    "size": source["size"],
+                    "mtime_ns": source["mtime_ns"],
+                    "offset": source["offset"] + first,
+                    "length": last - first,
+                    "columns": ensemble["columns"],
+                    "xyz": ensemble["xyz"],
+                },
+            )
+
+    if ensemble["n_ensemble"] is not None and len(models) != ensemble["n_ensemble"]:
+        logger.warning(
+            f"The actual number of models ({len(models)}) does not match the claimed "
+            f"number ({ensemble['n_ensemble']})."
+        )
+
+    # As in from_mmcif_text, the representative model is the current configuration
+    for model, other in zip(models, configurations):
+        if model == representative:
+            system.configuration = other.id
+    return configurations
+
+
+def load_model_coordinates(configuration, source):
+    """Read the coordinates of a model of an NMR ensemble that were left until needed.
+
+    Parameters
+    ----------
+    configuration : molsystem.Configuration
+        The configuration of the model.
+    source : dict
+        Where the coordinates are in the file, as recorded by load_ensemble.
+
+    Raises
+    ------
+    RuntimeError
+        If the file has changed since it was read.
+    """
+    path = Path(source["path"])
+    stat = path.stat()
+    if (stat.st_size, stat.st_mtime_ns) != (source["size"], source["mtime_ns"]):
+        raise RuntimeError(
+            f"Cannot read the coordinates of {configuration.name}: the file {path} "
+            "has changed."
+        )
+    with open_file(path) as fd:
+        fd.seek(source["offset"])
+        data = fd.read(source["length"])
+    xyz = read_coordinates(data, source["columns"], source["xyz"])
+    configuration.atoms.set_coordinates(xyz, fractionals=False)
+
+
+def _model_name(model, representative):
+    """The name of the configuration of a model, as in from_mmcif_text."""
+    return "representative" if model == representative else f"model_{model}"
+
+
 @register_format_checker(".mmcif")
-def check_format(path):
+def check_format(sample):
     """Check if a file is a Macromolecular Crystallographic Information File (mmCIF)
     file
 
@@ -32,23 +715,27 @@ def check_format(path):
 
     Parameters
     ----------
-    path : str or Path
+    sample : Sample
+        The beginning and end of the file.
+
+    Returns
+    -------
+    float
+        The confidence that the file is an mmCIF file.
     """
-    result = False
     in_data_block = False
-    with open(path, "r") as fd:
-        for line in fd:
-            line = line.strip()
-            if in_data_block:
-                if line[0] == "_":
-                    result = "." in line.split()[0]
-                    break
-            if line[0:5] == "data_":
-                in_data_block = True
-    return result
-
-
-@register_reader(".mmcif -- Macromolecular Crystallographic Information File")
+    for line in sample.lines:
+        line = line.strip()
+        if in_data_block:
+            if line[0:1] == "_":
+                key = line.split()[0]
+                return 0.9 if "." in key else 0.0
+        elif line[0:5] == "data_":
+            in_data_block = True
+    return 0.0
+
+
+@register_reader(".mmcif")
 def load_mmcif(
     path,
     configuration,
@@ -63,6 +750,9 @@ def load_mmcif(
     printer=None,
     references=None,
     bibliography=None,
+    native=True,
+    model_indices="1:end",
+    bulk=None,
     **kwargs,
 ):
     """Read a Macromolecular Crystallographic Information File
@@ -72,8 +762,9 @@ def load_mmcif(
 
     Parameters
     ----------
-    file_name : str or Path
-        The path to the file, as either a string or Path.
+    file_name : str or Path or bytes or file-like object
+        The path to the file, as either a string or Path, or its contents or an open
+        stream (see sources.py).
 
     configuration : molsystem.Configuration
         The configuration to put the imported structure into.
@@ -92,7 +783,8 @@ def load_mmcif(
 
     indices : str = "1:end"
         The generalized indices (slices, SMARTS, etc.) to select structures
-        from a file containing multiple structures.
+        from a file containing multiple structures. Data blocks can also be selected
+        by name, e.g. "data_1ABC", using an index of the blocks.
 
     subsequent_as_configurations : bool = False
         Normally and subsequent structures are loaded into new systems; however,
@@ -115,87 +807,84 @@ def load_mmcif(
     bibliography : dict
         The bibliography as a dictionary.
 
+    native : bool = True
+        Whether to read the _atom_site loop of single structures with the native
+        parser, parse_atom_site, rather than molsystem's from_mmcif_text. NMR
+        ensembles are read natively by parse_ensemble.
+
+    model_indices : str = "1:end"
+        The models of NMR ensembles whose coordinates are read at once, as
+        generalized indices, e.g. "1" for just the first. The first and
+        representative models are always read. The coordinates of the other models
+        in uncompressed files are all zero until read by ensure_coordinates; those in
+        compressed files are read at once anyway.
+
+    bulk : BulkImport = None
+        Commits the structures to the database in batches. See
+        formats/transactions.py.
+
     Returns
     -------
     [Configuration]
         The list of configurations created.
     """
-    if isinstance(path, str):
-        path = Path(path)
+    path = as_source(path)
 
-    path.expanduser().resolve()
+    selection = parse_indices(indices)
+    index = get_block_index(path, selection)
+    model_selection = parse_indices(model_indices)
+    if len(model_selection.names) > 0:
+        raise ValueError(f"The models cannot be selected by name: '{model_indices}'")
+
+    # Report the progress, estimated from the position in the file
+    fd, raw = open_tracked(path)
+    progress = None
+    if printer is not None:
+        progress = Progress(printer, tell=raw.tell, size=source_size(path))
 
     configurations = []
     structure_no = 0
-    lines = []
-    in_block = False
-    block_name = ""
-    with open(path, "r") as fd:
-        for line in fd:
-            if line[0:5] == "data_":
-                logger.debug(f"Found block {line}")
-                if not in_block:
-                    in_block = True
-                    block_name = line[5:].strip()
-                else:
-                    structure_no += 1
-                    # Check for NMR ensemble
-                    text = "\n".join(lines)
-                    if "_pdbx_nmr_ensemble.conformers_submitted_total_number" in text:
-                        system = system_db.create_system()
-                        system.from_mmcif_text(text)
-                    else:
-                        if structure_no > 1:
-                            if subsequent_as_configurations:
-                                configuration = system.create_configuration()
-                            else:
-                                system = system_db.create_system()
-                                configuration = system.create_configuration()
-
-                        configuration.from_mmcif_text(text)
-
-                        configurations.append(configuration)
-
-                    logger.debug(f"   added system {system_db.n_systems}: {block_name}")
-
-                    # Set the system name
-                    if system_name is not None and system_name != "":
-                        lower_name = str(system_name).lower()
-                        if "from file" in lower_name:
-                            system.name = block_name
-                        elif "file name" in lower_name:
-                            system.name = path.stem
-                        elif "formula" in lower_name:
-                            system.name = configuration.formula()[0]
-                        elif "empirical formula" in lower_name:
-                            system.name = configuration.formula()[1]
-                        else:
-                            system.name = str(system_name)
-
-                    # And the configuration name
-                    if configuration_name is not None and configuration_name != "":
-                        lower_name = str(configuration_name).lower()
-                        if "from file" in lower_name:
-                            configuration.name = block_name
-                        elif "file name" in lower_name:
-                            configuration.name = path.stem
-                        elif "formula" in lower_name:
-                            configuration.name = configuration.formula()[0]
-                        elif "empirical formula" in lower_name:
-                            configuration.name = configuration.formula()[1]
-                        else:
-                            configuration.name = str(configuration_name)
-                    logger.debug(f"   added system {system_db.n_systems}: {block_name}")
-                block_name = line[5:].strip()
-                lines = []
-            lines.append(line)
-
-        if len(lines) > 0:
-            # The last block just ends at the end of the file
+    with fd, raw:
+        # Unselected blocks are skipped before doing any real work
+        spans = []
+        blocks = read_blocks(
+            fd, path, selection, index=index, progress=progress, spans=spans
+        )
+        for block_no, text in blocks:
+            block_name = text[5 : text.find("\n")].strip()
+            logger.debug(f"Found block {block_no}: {block_name}")
+
             structure_no += 1
             # Check for NMR ensemble
-            text = "\n".join(lines)
-            if "_pdbx_nmr_ensemble.conformers_submitted_total_number" in text:
+            is_ensemble = "_pdbx_nmr_ensemble.conformers_submitted_total_number" in text
+            ensemble = parse_ensemble(text) if is_ensemble and native else None
+            if ensemble is not None:
+                if structure_no > 1:
+                    if subsequent_as_configurations:
+                        configuration = system.create_configuration()
+                    else:
+                        system = system_db.create_system()
+                        configuration = system.create_configuration()
+
+                # The coordinates can only be read later from an uncompressed file,
+                # if the text is exactly as in the file. Otherwise every model would
+                # decompress the file again, so they are all read now.
+                source = None
+                offset, length = spans[-1]
+                if is_mappable(fd, path) and length == len(text):
+                    stat = path.stat()
+                    source = {
+                        "path": str(path.resolve()),
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                        "offset": offset,
+                    }
+                models = load_ensemble(
+                    configuration, ensemble, text, model_selection, source=source
+                )
+                configurations.extend(models)
+                configuration = models[0]
+            elif is_ensemble:
                 system = system_db.create_system()
                 system.from_mmcif_text(text)
             else:
@@ -206,7 +895,11 @@ def load_mmcif(
                         system = system_db.create_system()
                         configuration = system.create_configuration()
 
-                configuration.from_mmcif_text(text)
+                atom_site = parse_atom_site(text) if native else None
+                if atom_site is None:
+                    configuration.from_mmcif_text(text)
+                else:
+                    load_atom_site(configuration, atom_site)
 
                 configurations.append(configuration)
 
@@ -219,25 +912,34 @@ def load_mmcif(
                     system.name = block_name
                 elif "file name" in lower_name:
                     system.name = path.stem
-                elif "formula" in lower_name:
-                    system.name = configuration.formula()[0]
                 elif "empirical formula" in lower_name:
                     system.name = configuration.formula()[1]
+                elif "formula" in lower_name:
+                    system.name = configuration.formula()[0]
                 else:
                     system.name = str(system_name)
 
-            # And the configuration name
-            if configuration_name is not None and configuration_name != "":
+            # And the configuration name. The models of ensembles keep their names.
+            if is_ensemble:
+                pass
+            elif configuration_name is not None and configuration_name != "":
                 lower_name = str(configuration_name).lower()
                 if "from file" in lower_name:
                     configuration.name = block_name
                 elif "file name" in lower_name:
                     configuration.name = path.stem
-                elif "formula" in lower_name:
-                    configuration.name = configuration.formula()[0]
                 elif "empirical formula" in lower_name:
                     configuration.name = configuration.formula()[1]
+                elif "formula" in lower_name:
+                    configuration.name = configuration.formula()[0]
+                elif lower_name == "sequential":
+                    configuration.name = str(block_no)
                 else:
                     configuration.name = str(configuration_name)
 
-        return configurations
+            if progress is not None:
+                progress.update(structure_no)
+            if bulk is not None:
+                bulk.added()
+
+    return configurations
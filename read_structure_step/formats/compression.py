@@ -0,0 +1,376 @@
+"""
+Transparent compression and decompression of structure files.
+
+Compressed files are recognized by the magic bytes at the start of the file rather
+than the name, so e.g. a gzipped SDF file is read correctly whether it is called
+"library.sdf.gz" or just "library.sdf". When writing, the compression is given by the
+suffix of the file name. gzip, bzip2, xz and zstd are supported.
+
+Given more than one thread, the work is handed to the external multi-threaded tools
+when they are installed -- pigz, lbzip2 or pbzip2, xz and zstd -- which run in
+parallel with the parsing even when the codec itself can only be decompressed
+serially. Otherwise the standard library modules are used, and the zstandard package
+or the zstd command for zstd. Streams from the external tools can only be read
+sequentially.
+"""
+
+import bz2
+import gzip
+import io
+import logging
+import lzma
+from pathlib import Path
+import shutil
+import subprocess
+
+from .sources import open_raw
+from .sources import Stream
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# The magic bytes at the start of compressed files
+magic_bytes = {
+    "gzip": b"\x1f\x8b",
+    "bzip2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+
+# The suffixes of compressed files
+suffixes = {
+    ".gz": "gzip",
+    ".tgz": "gzip",
+    ".bz2": "bzip2",
+    ".xz": "xz",
+    ".zst": "zstd",
+}
+
+# The multi-threaded tools to decompress to stdout, in order of preference. The
+# number of threads is appended to the last argument.
+_decompressors = {
+    "gzip": [["pigz", "-dc", "-p"]],
+    "bzip2": [["lbzip2", "-dc", "-n"], ["pbzip2", "-dc", "-p"]],
+    "xz": [["xz", "-dc", "-T"]],
+    "zstd": [["zstd", "-dcq", "-T"]],
+}
+
+# And to compress stdin to stdout.
+_compressors = {
+    "gzip": [["pigz", "-c", "-p"]],
+    "bzip2": [["lbzip2", "-c", "-n"], ["pbzip2", "-c", "-p"]],
+    "xz": [["xz", "-c", "-T"]],
+    "zstd": [["zstd", "-cq", "-T"]],
+}
+
+
+def detect_compression(fd):
+    """The compression of a file, from the magic bytes at its beginning.
+
+    Parameters
+    ----------
+    fd : str or Path or Stream or binary file-like object
+        The file, which is left at the same position. A file that cannot seek must
+        be buffered so that the beginning can be peeked at.
+
+    Returns
+    -------
+    str or None
+        The compression, e.g. "gzip", or None if the file is not compressed.
+    """
+    if isinstance(fd, (str, Path, Stream)):
+        with open_raw(fd) as _fd:
+            return detect_compression(_fd)
+
+    if fd.seekable():
+        position = fd.tell()
+        head = fd.read(6)
+        fd.seek(position)
+    else:
+        head = fd.peek(6)[:6]
+    for compression, magic in magic_bytes.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def split_suffix(path):
+    """Split off the suffix for any compression from a file name.
+
+    Parameters
+    ----------
+    path : str or Path
+        The file name.
+
+    Returns
+    -------
+    (Path, str or None)
+        The path without the compression suffix, and the compression. A ".tgz"
+        suffix is replaced by ".tar".
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix not in suffixes:
+        return path, None
+    if suffix == ".tgz":
+        return path.with_suffix(".tar"), suffixes[suffix]
+    return path.with_suffix(""), suffixes[suffix]
+
+
+def _tool(tools, threads):
+    """The command line for the first available tool, or None."""
+    if threads <= 1:
+        return None
+    for command in tools:
+        if shutil.which(command[0]) is not None:
+            return command[:-1] + [command[-1] + str(threads)]
+    return None
+
+
+class _ProcessReader(io.RawIOBase):
+    """The output of a decompressing process as a readable stream."""
+
+    def __init__(self, process):
+        self._process = process
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self._process.stdout.readinto(buffer)
+        if n == 0 and self._process.wait() != 0:
+            raise OSError(f"Decompressing with {self._process.args[0]} failed.")
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._process.stdout.close()
+            self._process.wait()
+        super().close()
+
+
+class _ProcessWriter(io.RawIOBase):
+    """The input of a compressing process as a writable stream."""
+
+    def __init__(self, process):
+        self._process = process
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._process.stdin.write(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._process.stdin.close()
+            returncode = self._process.wait()
+            if returncode != 0:
+                raise OSError(f"Compressing with {self._process.args[0]} failed.")
+        super().close()
+
+
+def decompressing_stream(fd, compression, threads=1):
+    """A binary stream decompressing the given binary file.
+
+    Parameters
+    ----------
+    fd : binary file-like object
+        The compressed file, positioned at the beginning.
+    compression : str
+        The compression, e.g. "gzip".
+    threads : int = 1
+        The number of threads to use. More than one uses an external tool if
+        available and the file is unbuffered, which gives a stream that cannot
+        seek.
+
+    Returns
+    -------
+    binary file-like object
+        The decompressed stream. Closing it does not close the underlying file.
+    """
+    # The external tools read the file directly, so it must not be buffered.
+    if not isinstance(fd, io.FileIO):
+        threads = 1
+    command = _tool(_decompressors[compression], threads)
+    if command is None and compression == "zstd" and zstandard is None:
+        if isinstance(fd, io.FileIO):
+            command = _tool(_decompressors[compression], 2)
+        if command is None:
+            raise RuntimeError("Reading zstd files requires zstandard or zstd.")
+    if command is not None:
+        process = subprocess.Popen(command, stdin=fd, stdout=subprocess.PIPE)
+        return io.BufferedReader(_ProcessReader(process), buffer_size=1 << 16)
+
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fd, mode="rb")
+    if compression == "bzip2":
+        return bz2.BZ2File(fd, "rb")
+    if compression == "xz":
+        return lzma.LZMAFile(fd, "rb")
+    return io.BufferedReader(
+        zstandard.ZstdDecompressor().stream_reader(fd, closefd=False)
+    )
+
+
+def compressing_stream(fd, compression, threads=1):
+    """A binary stream compressing into the given binary file.
+
+    Parameters
+    ----------
+    fd : binary file-like object
+        The file to write the compressed data to.
+    compression : str
+        The compression, e.g. "gzip".
+    threads : int = 1
+        The number of threads to use. More than one uses an external tool if
+        available.
+
+    Returns
+    -------
+    binary file-like object
+        The stream to write to. Closing it does not close the underlying file.
+    """
+    if compression == "zstd" and zstandard is not None:
+        compressor = zstandard.ZstdCompressor(threads=threads if threads > 1 else 0)
+        return compressor.stream_writer(fd, closefd=False)
+
+    command = _tool(_compressors[compression], threads)
+    if command is None and compression == "zstd":
+        command = _tool(_compressors[compression], 2)
+        if command is None:
+            raise RuntimeError("Writing zstd files requires zstandard or zstd.")
+    if command is not None:
+        fd.flush()
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=fd)
+        return io.BufferedWriter(_ProcessWriter(process), buffer_size=1 << 16)
+
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fd, mode="wb")
+    if compression == "bzip2":
+        return bz2.BZ2File(fd, "wb")
+    return lzma.LZMAFile(fd, "wb")
+
+
+def open_file(path, mode="rb", threads=1, compression="detect"):
+    """Open a file, transparently handling any compression.
+
+    Parameters
+    ----------
+    path : str or Path or Stream
+        The path to the file, or for reading, a stream (see sources.py).
+    mode : str = "rb"
+        The mode: "r" or "rt" to read text, "rb" to read bytes, and "w", "wt" or "wb"
+        to write.
+    threads : int = 1
+        The number of threads for compressing or decompressing.
+    compression : str = "detect"
+        The compression, "detect" to detect it when reading and to use the suffix of
+        the file name when writing, or None for no compression.
+
+    Returns
+    -------
+    file-like object
+        The open file.
+    """
+    if mode[0] == "r":
+        raw = open_raw(path)
+        return wrap_file(raw, mode, threads=threads, compression=compression)
+
+    path = Path(path)
+    if compression == "detect":
+        compression = split_suffix(path)[1]
+    raw = open(path, "wb")
+    if compression is None:
+        fd = raw
+    else:
+        fd = _Closing(compressing_stream(raw, compression, threads), raw)
+    return fd if "b" in mode else io.TextIOWrapper(fd)
+
+
+def wrap_file(raw, mode="rb", threads=1, compression="detect"):
+    """Decompress an open binary file if needed.
+
+    Parameters
+    ----------
+    raw : binary file-like object
+        The open file, positioned at the beginning. It is closed with the stream
+        returned. An unbuffered file, opened with buffering=0, is buffered here
+        if it is not compressed, and is needed to decompress with external tools.
+    mode : str = "rb"
+        The mode: "r" or "rt" to read text or "rb" to read bytes.
+    threads : int = 1
+        The number of threads for decompressing.
+    compression : str = "detect"
+        The compression, "detect" to detect it, or None for no compression.
+
+    Returns
+    -------
+    file-like object
+        The stream to read.
+    """
+    if compression == "detect":
+        compression = detect_compression(raw)
+    if compression is None:
+        fd = io.BufferedReader(raw) if isinstance(raw, io.RawIOBase) else raw
+    else:
+        fd = _Closing(decompressing_stream(raw, compression, threads), raw)
+    return fd if "b" in mode else io.TextIOWrapper(fd)
+
+
+class _Closing(io.BufferedIOBase):
+    """A compressed stream that also closes the underlying file when closed."""
+
+    def __init__(self, stream, fd):
+        self._stream = stream
+        self._fd = fd
+
+    def __iter__(self):
+        return iter(self._stream)
+
+    def readable(self):
+        return self._stream.readable()
+
+    def writable(self):
+        return self._stream.writable()
+
+    def seekable(self):
+        return self._stream.seekable()
+
+    def read(self, size=-1):
+        return self._stream.read(size)
+
+    def read1(self, size=-1):
+        return self._stream.read1(size)
+
+    def readinto(self, buffer):
+        return self._stream.readinto(buffer)
+
+    def readline(self, size=-1):
+        return self._stream.readline(size)
+
+    def write(self, data):
+        return self._stream.write(data)
+
+    def flush(self):
+        if not self._stream.closed:
+            self._stream.flush()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._stream.seek(offset, whence)
+
+    def tell(self):
+        return self._stream.tell()
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._stream.close()
+            finally:
+                self._fd.close()
+        super().close()
@@ -0,0 +1,307 @@
+"""
+Parsing of the generalized indices used to select structures from a file.
+
+The indices are a comma-separated list of items, each of which is either a single
+structure number or a slice "start:stop" or "start:stop:step". Structures are numbered
+from 1, and the stop is included, so "1:10" is the first ten structures. A negative
+number counts from the end of the file, with -1 being the last structure, and "end"
+is the last structure. The start and stop of a slice may be omitted, defaulting to the
+first and last structure, respectively. Examples::
+
+    1:end              all the structures
+    1:100              the first 100 structures
+    5,17,200:300:10    structures 5, 17, 200, 210, ..., 300
+    -50:end            the last 50 structures
+
+Files of named blocks, such as CIF files, can also be selected by the names of the
+blocks, given as the first line of each block, e.g. "data_ACETCR,data_1ABC". The
+names are found using an index of the blocks (see record_index.py).
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def parse_indices(indices):
+    """Parse generalized indices into a Selection.
+
+    Parameters
+    ----------
+    indices : str or None
+        The indices, e.g. "1:10,20". None or an empty string selects all structures.
+
+    Returns
+    -------
+    Selection
+        The selection of structures.
+
+    Raises
+    ------
+    ValueError
+        If the indices cannot be parsed.
+    """
+    return Selection(indices)
+
+
+def _parse_number(text, indices):
+    """Parse a single structure number, which may be "end" or negative."""
+    text = text.strip()
+    if text.lower() == "end":
+        return -1
+    try:
+        value = int(text)
+    except ValueError:
+        raise ValueError(
+            f"Could not understand '{text}' in the structure indices '{indices}'."
+        )
+    if value == 0:
+        raise ValueError(
+            f"Structures are numbered from 1, so 0 is not valid in '{indices}'."
+        )
+    return value
+
+
+class Selection(object):
+    """The structures selected by generalized indices.
+
+    Structure numbers count from 1, as do the numbers in the indices.
+
+    Attributes
+    ----------
+    items : [(int, int, int)]
+        The (start, stop, step) of each item, with the stop included. Negative values
+        count from the end, with -1 being the last structure.
+    names : [str]
+        The names of blocks selected by "data_NAME" that have not yet been resolved
+        into structure numbers with resolve_names.
+    """
+
+    def __init__(self, indices="1:end"):
+        self.text = indices
+        self.items = []
+        self.names = []
+        self._n_structures = None
+        self._selected = None
+        self._selected_set = None
+
+        if indices is None or indices.strip() == "":
+            indices = "1:end"
+
+        for item in indices.split(","):
+            item = item.strip()
+            if item == "":
+                continue
+            if item[0:5].lower() == "data_":
+                if item[5:].strip() == "":
+                    raise ValueError(
+                        f"The block name is missing in '{item}' in the structure "
+                        f"indices '{indices}'."
+                    )
+                self.names.append(item[5:].strip())
+                continue
+            parts = item.split(":")
+            if len(parts) == 1:
+                value = _parse_number(parts[0], indices)
+                self.items.append((value, value, 1))
+            elif len(parts) <= 3:
+                start = (
+                    1 if parts[0].strip() == "" else _parse_number(parts[0], indices)
+                )
+                stop = (
+                    -1 if parts[1].strip() == "" else _parse_number(parts[1], indices)
+                )
+                step = 1
+                if len(parts) == 3 and parts[2].strip() != "":
+                    try:
+                        step = int(parts[2])
+                    except ValueError:
+                        step = 0
+                    if step <= 0:
+                        raise ValueError(
+                            f"The step in '{item}' in the structure indices "
+                            f"'{indices}' must be a positive integer."
+                        )
+                self.items.append((start, stop, step))
+            else:
+                raise ValueError(
+                    f"Could not understand '{item}' in the structure indices "
+                    f"'{indices}'."
+                )
+
+    def __repr__(self):
+        return f"Selection({self.text!r})"
+
+    @property
+    def is_all(self):
+        """Whether every structure is selected."""
+        return (1, -1, 1) in self.items
+
+    @property
+    def needs_count(self):
+        """Whether the number of structures must be known to resolve the selection.
+
+        This is the case if any of the indices count from the end of the file,
+        except for the stop of an open-ended slice such as "10:end", or if there are
+        names to resolve.
+        """
+        if len(self.names) > 0:
+            return True
+        if self.is_all:
+            return False
+        for start, stop, step in self.items:
+            if start < 0 or stop < -1:
+                return True
+        return False
+
+    @property
+    def last(self):
+        """The last structure selected, or None if it depends on the file's length."""
+        if self._selected is not None:
+            return self._selected[-1] if len(self._selected) > 0 else 0
+        if self.needs_count:
+            return None
+        last = 0
+        for start, stop, step in self.items:
+            if stop < 0:
+                return None
+            if stop >= start:
+                last = max(last, start + step * ((stop - start) // step))
+        return last
+
+    @property
+    def n_structures(self):
+        """The number of structures in the file, if known."""
+        return self._n_structures
+
+    @n_structures.setter
+    def n_structures(self, value):
+        self._n_structures = value
+        if value is None:
+            self._selected = None
+            self._selected_set = None
+        else:
+            self._selected = self.resolve(value)
+            self._selected_set = set(self._selected)
+
+    def resolve(self, n_structures):
+        """The sorted list of structures selected from a file.
+
+        Parameters
+        ----------
+        n_structures : int
+            The number of structures in the file.
+
+        Returns
+        -------
+        [int]
+            The selected structure numbers, counting from 1.
+
+        Raises
+        ------
+        RuntimeError
+            If there are names of blocks that have not been resolved.
+        """
+        self._check_names()
+        if self.is_all:
+            return list(range(1, n_structures + 1))
+        selected = set()
+        for start, stop, step in self.items:
+            if start < 0:
+                start += n_structures + 1
+            if stop < 0:
+                stop += n_structures + 1
+            start = max(start, 1)
+            stop = min(stop, n_structures)
+            selected.update(range(start, stop + 1, step))
+        return sorted(selected)
+
+    def selected(self):
+        """The sorted list of structures selected, once the count is known.
+
+        Returns
+        -------
+        [int]
+            The selected structure numbers, counting from 1.
+        """
+        if self._selected is None:
+            raise RuntimeError("The number of structures in the file is not known.")
+        return self._selected
+
+    def __contains__(self, structure_no):
+        """Whether a structure is selected.
+
+        Parameters
+        ----------
+        structure_no : int
+            The number of the structure, counting from 1.
+        """
+        self._check_names()
+        if self.is_all:
+            return True
+        if self._selected is not None:
+            return structure_no in self._selected_set
+        if self.needs_count:
+            raise RuntimeError(
+                f"The number of structures is needed to use the indices '{self.text}'."
+            )
+        for start, stop, step in self.items:
+            if structure_no < start:
+                continue
+            if stop >= 0 and structure_no > stop:
+                continue
+            if (structure_no - start) % step == 0:
+                return True
+        return False
+
+    def done(self, structure_no):
+        """Whether no structures after this one are selected.
+
+        Parameters
+        ----------
+        structure_no : int
+            The number of the structure, counting from 1.
+        """
+        last = self.last
+        return last is not None and structure_no >= last
+
+    def resolve_names(self, find):
+        """Turn the names of blocks into the numbers of the structures.
+
+        Names that are not found are reported as a warning and ignored.
+
+        Parameters
+        ----------
+        find : function
+            A function returning the number of a block given its name, counting from
+            0, or None if there is no such block, e.g. BlockIndex.find.
+
+        Returns
+        -------
+        [str]
+            The names that were not found.
+        """
+        missing = []
+        for name in self.names:
+            number = find(name)
+            if number is None:
+                missing.append(name)
+            else:
+                self.items.append((number + 1, number + 1, 1))
+        self.names = []
+        if len(missing) > 0:
+            logger.warning(
+                f"Could not find the blocks {', '.join(missing)} given in the "
+                f"structure indices '{self.text}'."
+            )
+        if self._n_structures is not None:
+            self.n_structures = self._n_structures
+        return missing
+
+    def _check_names(self):
+        """Raise an error if the names of blocks have not been resolved."""
+        if len(self.names) > 0:
+            raise RuntimeError(
+                f"The named blocks in the indices '{self.text}' can only be found "
+                "in files with an index of the blocks, such as CIF files."
+            )
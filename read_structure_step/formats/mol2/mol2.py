@@ -2,20 +2,23 @@
 Implementation of the reader for Tripos MOL2 files using OpenBabel
 """
 
-from pathlib import Path
-import shutil
-import string
-import subprocess
-import time
+import logging
 
 from openbabel import openbabel
 
+from ..compression import open_file
+from ..indices import parse_indices
+from ..openbabel_io.citations import cite_openbabel
+from ..progress import open_tracked
+from ..progress import Progress
+from ..record_index import split_blocks
 from ..registries import register_format_checker
 from ..registries import register_reader
 from ..registries import set_format_metadata
+from ..sources import as_source
+from ..sources import source_size
 
-if "OpenBabel_version" not in globals():
-    OpenBabel_version = None
+logger = logging.getLogger(__name__)
 
 set_format_metadata(
     [".mol2"],
@@ -30,27 +33,31 @@ set_format_metadata(
 
 
 @register_format_checker(".mol2")
-def check_format(path):
+def check_format(sample):
     """Check if a file is an Tripos MOL2.
 
     Check for "@<TRIPOS>"
 
     Parameters
     ----------
-    path : str or Path
-    """
-    result = True
-    with open(path, "r") as fd:
-        for line in fd:
-            line = line.strip()
-            if "@<TRIPOS>" in line:
-                result = True
-                break
+    sample : Sample
+        The beginning and end of the file.
 
-    return result
+    Returns
+    -------
+    float
+        The confidence that the file is a MOL2 file.
+    """
+    for line in sample.lines:
+        line = line.strip()
+        if line.startswith("@<TRIPOS>MOLECULE"):
+            return 1.0
+        if line.startswith("@<TRIPOS>"):
+            return 0.9
+    return 0.0
 
 
-@register_reader(".mol2 -- Tripos MOL2 file")
+@register_reader(".mol2")
 def load_mol2(
     path,
     configuration,
@@ -65,6 +72,7 @@ def load_mol2(
     printer=None,
     references=None,
     bibliography=None,
+    bulk=None,
     **kwargs,
 ):
     """Read a Tripos MOL2 file.
@@ -75,8 +83,9 @@ def load_mol2(
 
     Parameters
     ----------
-    file_name : str or Path
-        The path to the file, as either a string or Path.
+    file_name : str or Path or bytes or file-like object
+        The path to the file, as either a string or Path, or its contents or an open
+        stream (see sources.py).
 
     configuration : molsystem.Configuration
         The configuration to put the imported structure into.
@@ -118,165 +127,112 @@ def load_mol2(
     bibliography : dict
         The bibliography as a dictionary.
 
+    bulk : BulkImport = None
+        Commits the structures to the database in batches. See
+        formats/transactions.py.
+
     Returns
     -------
     [Configuration]
         The list of configurations created.
     """
-    global OpenBabel_version
 
-    if isinstance(path, str):
-        path = Path(path)
+    path = as_source(path)
 
-    path.expanduser().resolve()
+    selection = parse_indices(indices)
 
-    # Get the information for progress output, if requested.
-    if printer is not None:
+    # The structures are only counted if needed for the indices. Otherwise the
+    # progress is estimated from the position in the file.
+    n_structures = None
+    if selection.needs_count:
         n_structures = 0
-        with path.open() as fd:
+        with open_file(path, "r") as fd:
             for line in fd:
                 if line[0:17] == "@<TRIPOS>MOLECULE":
                     n_structures += 1
-        printer(f"The Tripos MOL2 file contains {n_structures} structures.")
-        last_percent = 0
-        t0 = time.time()
-        last_t = t0
+        selection.n_structures = n_structures
+        n_structures = len(selection.selected())
+
+    fd, raw = open_tracked(path, "r")
+    progress = None
+    if printer is not None:
+        if n_structures is None:
+            printer(f"Reading the Tripos MOL2 file {path.name}.")
+        else:
+            printer(
+                f"The Tripos MOL2 file contains {n_structures} selected structures."
+            )
+        progress = Progress(
+            printer, tell=raw.tell, size=source_size(path), n_structures=n_structures
+        )
 
     obConversion = openbabel.OBConversion()
     obConversion.SetInAndOutFormats("mol2", "smi")
 
     configurations = []
     structure_no = 1
-    while True:
-        if structure_no == 1:
+    with fd, raw:
+        # Unselected structures are skipped before doing any real work
+        for record_no, text in split_blocks(fd, "@<TRIPOS>MOLECULE", selection):
             obMol = openbabel.OBMol()
-            not_done = obConversion.ReadFile(obMol, str(path))
-        else:
-            obMol = openbabel.OBMol()
-            not_done = obConversion.Read(obMol)
-
-        if not not_done:
-            break
-
-        if add_hydrogens:
-            obMol.AddHydrogens()
-
-        if structure_no > 1:
-            if subsequent_as_configurations:
-                configuration = system.create_configuration()
-            else:
-                system = system_db.create_system()
-                configuration = system.create_configuration()
-
-        configuration.from_OBMol(obMol)
-        configurations.append(configuration)
-
-        # Set the system name
-        if system_name is not None and system_name != "":
-            lower_name = system_name.lower()
-            if "from file" in lower_name:
-                system.name = obMol.GetTitle()
-            elif "canonical smiles" in lower_name:
-                system.name = configuration.canonical_smiles
-            elif "smiles" in lower_name:
-                system.name = configuration.smiles
-            else:
-                system.name = system_name
-
-        # And the configuration name
-        if configuration_name is not None and configuration_name != "":
-            lower_name = configuration_name.lower()
-            if "from file" in lower_name:
-                configuration.name = obMol.GetTitle()
-            elif "canonical smiles" in lower_name:
-                configuration.name = configuration.canonical_smiles
-            elif "smiles" in lower_name:
-                configuration.name = configuration.smiles
-            elif lower_name == "sequential":
-                configuration.name = str(structure_no)
-            else:
-                configuration.name = configuration_name
-
-        structure_no += 1
-        if printer:
-            percent = int(100 * structure_no / n_structures)
-            if percent > last_percent:
-                t1 = time.time()
-                if t1 - last_t >= 60:
-                    t = int(t1 - t0)
-                    rate = structure_no / (t1 - t0)
-                    t_left = int((n_structures - structure_no) / rate)
-                    printer(
-                        f"\t{structure_no:6} ({percent}%) structures read in {t} "
-                        f"seconds. About {t_left} seconds remaining."
-                    )
-                    last_t = t1
-                    last_percent = percent
+            if not obConversion.ReadString(obMol, text):
+                logger.warning(f"Could not read structure {record_no} in {path}")
+                continue
+
+            if add_hydrogens:
+                obMol.AddHydrogens()
+
+            if structure_no > 1:
+                if subsequent_as_configurations:
+                    configuration = system.create_configuration()
+                else:
+                    system = system_db.create_system()
+                    configuration = system.create_configuration()
+
+            configuration.from_OBMol(obMol)
+            configurations.append(configuration)
+
+            # Set the system name
+            if system_name is not None and system_name != "":
+                lower_name = system_name.lower()
+                if "from file" in lower_name:
+                    system.name = obMol.GetTitle()
+                elif "canonical smiles" in lower_name:
+                    system.name = configuration.canonical_smiles
+                elif "smiles" in lower_name:
+                    system.name = configuration.smiles
+                else:
+                    system.name = system_name
+
+            # And the configuration name
+            if configuration_name is not None and configuration_name != "":
+                lower_name = configuration_name.lower()
+                if "from file" in lower_name:
+                    configuration.name = obMol.GetTitle()
+                elif "canonical smiles" in lower_name:
+                    configuration.name = configuration.canonical_smiles
+                elif "smiles" in lower_name:
+                    configuration.name = configuration.smiles
+                elif lower_name == "sequential":
+                    configuration.name = str(record_no)
+                else:
+                    configuration.name = configuration_name
+
+            structure_no += 1
+            if progress is not None:
+                progress.update(structure_no - 1)
+            if bulk is not None:
+                bulk.added()
 
     if printer:
-        t1 = time.time()
-        rate = structure_no / (t1 - t0)
+        t = progress.elapsed
+        rate = structure_no / t
         printer(
-            f"Read {structure_no} structures in {t1 - t0:.1f} seconds = {rate:.2f} "
+            f"Read {structure_no - 1} structures in {t:.1f} seconds = {rate:.2f} "
             "per second"
         )
 
     if references:
-        # Add the citations for Open Babel
-        references.cite(
-            raw=bibliography["openbabel"],
-            alias="openbabel_jcinf",
-            module="read_structure_step",
-            level=1,
-            note="The principle Open Babel citation.",
-        )
-
-        # See if we can get the version of obabel
-        if OpenBabel_version is None:
-            path = shutil.which("obabel")
-            if path is not None:
-                path = Path(path).expanduser().resolve()
-                try:
-                    result = subprocess.run(
-                        [str(path), "--version"],
-                        stdin=subprocess.DEVNULL,
-                        capture_output=True,
-                        text=True,
-                    )
-                except Exception:
-                    OpenBabel_version = "unknown"
-                else:
-                    OpenBabel_version = "unknown"
-                    lines = result.stdout.splitlines()
-                    for line in lines:
-                        line = line.strip()
-                        tmp = line.split()
-                        if len(tmp) == 9 and tmp[0] == "Open":
-                            OpenBabel_version = {
-                                "version": tmp[2],
-                                "month": tmp[4],
-                                "year": tmp[6],
-                            }
-                        break
-
-        if isinstance(OpenBabel_version, dict):
-            try:
-                template = string.Template(bibliography["obabel"])
-
-                citation = template.substitute(
-                    month=OpenBabel_version["month"],
-                    version=OpenBabel_version["version"],
-                    year=OpenBabel_version["year"],
-                )
-
-                references.cite(
-                    raw=citation,
-                    alias="obabel-exe",
-                    module="read_structure_step",
-                    level=1,
-                    note="The principle citation for the Open Babel executables.",
-                )
-            except Exception:
-                pass
+        cite_openbabel(references, bibliography)
 
     return configurations
@@ -271,13 +271,26 @@ keywords = [
 
 
 @register_format_checker(".mop")
-def check_format(file_name):
+def check_format(sample):
+    """Check if a file is a MOPAC input file.
 
-    with open(file_name, "r") as f:
+    Check for MOPAC keywords on the keyword line, allowing for continuation lines,
+    after any comments at the beginning of the file.
 
-        data = f.read()
+    Parameters
+    ----------
+    sample : Sample
+        The beginning and end of the file.
 
-        if any(keyword in data for keyword in keywords):
-            return True
-        else:
-            return False
+    Returns
+    -------
+    float
+        The confidence that the file is a MOPAC input file.
+    """
+    lines = [line for line in sample.lines if line[0:1] != "*"][0:3]
+    data = "\n".join(lines)
+
+    if any(keyword in data for keyword in keywords):
+        return 0.6
+    else:
+        return 0.0
@@ -8,20 +8,16 @@ import threading
 import time
 
 import logging
-from pathlib import Path
 import re
-import shutil
-import string
-import subprocess
 
 from openbabel import openbabel
+from read_structure_step.formats.compression import open_file
+from read_structure_step.formats.openbabel_io.citations import cite_openbabel
 from read_structure_step.formats.registries import register_reader
+from read_structure_step.formats.sources import as_source
 import seamm
 from .find_mopac import find_mopac
 
-if "OpenBabel_version" not in globals():
-    OpenBabel_version = None
-
 logger = logging.getLogger("read_structure_step.read_structure")
 
 metadata = {
@@ -201,8 +197,9 @@ def load_mop(
 
     Parameters
     ----------
-    file_name : str or Path
-        The path to the file, as either a string or Path.
+    file_name : str or Path or bytes or file-like object
+        The path to the file, as either a string or Path, or its contents or an open
+        stream (see sources.py).
 
     configuration : molsystem.Configuration
         The configuration to put the imported structure into.
@@ -211,15 +208,11 @@ def load_mop(
     we'll first preprocess the file to extract extra data and also to fit it to the
     format that OpenBabel can handle.
     """
-    global OpenBabel_version
 
     # Get the text in the file
-    if isinstance(file_name, str):
-        path = Path(file_name)
-    else:
-        path = file_name
-    path.expanduser().resolve()
-    lines = iter(path.read_text().splitlines())
+    path = as_source(file_name)
+    with open_file(path, "r") as fd:
+        lines = iter(fd.read().splitlines())
 
     # Work through the file capturing data and also reformatting as needed.
     text = []
@@ -376,9 +369,9 @@ def load_mop(
     text.append(" ")
 
     if internals:
-        logger.info(f"Using internal coordinates for {file_name}")
+        logger.info(f"Using internal coordinates for {path}")
     else:
-        logger.info(f"Using Cartesians coordinates for {file_name}")
+        logger.info(f"Using Cartesians coordinates for {path}")
 
     input_data = "\n".join(text)
     logger.info(f"Input data:\n\n{input_data}\n")
@@ -523,62 +516,7 @@ def load_mop(
             configuration.name = configuration_name
 
     if references:
-        # Add the citations for Open Babel
-        references.cite(
-            raw=bibliography["openbabel"],
-            alias="openbabel_jcinf",
-            module="read_structure_step",
-            level=1,
-            note="The principle Open Babel citation.",
-        )
-
-        # See if we can get the version of obabel
-        if OpenBabel_version is None:
-            path = shutil.which("obabel")
-            if path is not None:
-                path = Path(path).expanduser().resolve()
-                try:
-                    result = subprocess.run(
-                        [str(path), "--version"],
-                        stdin=subprocess.DEVNULL,
-                        capture_output=True,
-                        text=True,
-                    )
-                except Exception:
-                    OpenBabel_version = "unknown"
-                else:
-                    OpenBabel_version = "unknown"
-                    lines = result.stdout.splitlines()
-                    for line in lines:
-                        line = line.strip()
-                        tmp = line.split()
-                        if len(tmp) == 9 and tmp[0] == "Open":
-                            OpenBabel_version = {
-                                "version": tmp[2],
-                                "month": tmp[4],
-                                "year": tmp[6],
-                            }
-                        break
-
-        if isinstance(OpenBabel_version, dict):
-            try:
-                template = string.Template(bibliography["obabel"])
-
-                citation = template.substitute(
-                    month=OpenBabel_version["month"],
-                    version=OpenBabel_version["version"],
-                    year=OpenBabel_version["year"],
-                )
-
-                references.cite(
-                    raw=citation,
-                    alias="obabel-exe",
-                    module="read_structure_step",
-                    level=1,
-                    note="The principle citation for the Open Babel executables.",
-                )
-            except Exception:
-                pass
+        cite_openbabel(references, bibliography)
 
     # Save keywords, description and any data encoded in the file to the database
     if save_data:
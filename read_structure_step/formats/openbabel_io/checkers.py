@@ -1,24 +1,23 @@
 import re
 
-from read_structure_step.formats.registries import last_resort_checker
 
-
-def check_for_pdb(file_name):
+def check_for_pdb(sample):
     """Check if a file appears to be a PDB file.
 
     The PDB files have a number of required keywords; however, some, like "AUTHOR"
     are common words, so this routine checks for the simultaneous presence of a
-    number of the strangely spelled keywords.
+    number of the strangely spelled keywords. Files with just coordinates are
+    recognized by the ATOM and HETATM records.
 
     Parameters
     ----------
-    file_name : str
-        The path to the file.
+    sample : Sample
+        The beginning and end of the file.
 
     Returns
     -------
-    bool
-        True if the file appears to be a PDB file.
+    float
+        The confidence that the file is a PDB file.
     """
     keywords = (
         "COMPND",
@@ -31,27 +30,38 @@ def check_for_pdb(file_name):
         "CRYST1",
     )
 
-    with open(file_name, "r") as f:
-        data = f.read()
+    data = sample.head
 
     if all(keyword in data for keyword in keywords):
-        return True
-    else:
-        return False
-
-
-def check_for_xyz(file_name):
+        return 1.0
+
+    n_atoms = 0
+    for line in sample.lines:
+        if line[0:6] in ("ATOM  ", "HETATM"):
+            try:
+                float(line[30:38])
+                float(line[38:46])
+                float(line[46:54])
+            except ValueError:
+                return 0.0
+            n_atoms += 1
+    if n_atoms == 0:
+        return 0.0
+    return 0.8
+
+
+def check_for_xyz(sample):
     """Check if a file appears to be an XYZ file.
 
     Parameters
     ----------
-    file_name : str
-        The path to the file.
+    sample : Sample
+        The beginning and end of the file.
 
     Returns
     -------
-    bool
-        True if the file appears to be a PDB file.
+    float
+        The confidence that the file is an XYZ file.
     """
     element_coords_regex = r"""^\s*(A[cglmrstu]|B[aehikr]?|C[adeflmnorsu] \
             ?|D[bsy]|E[rsu]|F[elmr]?|G[ade]|H[efgos]?|I[nr]?|Kr?|L[airuv] \
@@ -59,21 +69,14 @@ def check_for_xyz(file_name):
             T[abcehilm]|U(u[opst])?|V|W|Xe|Yb?|Z[nr \
             ])\s*(\s*-?\d+(\.\d+([-+]e\d+)?)?\s*){3}$"""
 
-    with open(file_name, "r") as f:
-        for line_nbr, line in enumerate(f):
-            if line_nbr > 2:
-                break
-
-            if line_nbr == 0 and re.search(r"^\s*[0-9]+\s*$", line) is None:
-                return False
-
-            if line_nbr == 2 and re.search(element_coords_regex, line) is not None:
-                return True
+    for line_nbr, line in enumerate(sample.lines):
+        if line_nbr > 2:
+            break
 
-    return False
+        if line_nbr == 0 and re.search(r"^\s*[0-9]+\s*$", line) is None:
+            return 0.0
 
+        if line_nbr == 2 and re.search(element_coords_regex, line) is not None:
+            return 0.9
 
-def add_format_checkers():
-    """Add any missing format checkers."""
-    last_resort_checker(".pdb", check_for_pdb)
-    last_resort_checker(".xyz", check_for_xyz)
+    return 0.0
@@ -0,0 +1,159 @@
+"""
+The citations for Open Babel, with the version of the library in use.
+
+The version comes from the Open Babel Python API, once per process. The citation
+for the executables also needs the release date, which only "obabel --version"
+gives, so that is run at most once per installation of Open Babel: the result is
+kept in a small cache file, keyed by the path and modification time of the
+library.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+import string
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+# The file caching the version of Open Babel, or None not to cache it.
+cache_path = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    / "read_structure_step"
+    / "openbabel_version.json"
+)
+
+# The version, once known for this process
+_version = None
+
+
+def _library_key():
+    """The key for the Open Babel library in the cache: its path and mtime."""
+    from openbabel import openbabel
+
+    path = Path(openbabel.__file__).resolve()
+    return f"{path}:{path.stat().st_mtime_ns}"
+
+
+def _read_cache():
+    """The contents of the cache file, or an empty dictionary."""
+    if cache_path is None:
+        return {}
+    try:
+        with open(cache_path, "r") as fd:
+            return json.load(fd)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(key, version):
+    """Save the version of a library in the cache file, if possible."""
+    if cache_path is None:
+        return
+    cache = _read_cache()
+    cache[key] = version
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(cache_path.name + f".{os.getpid()}")
+        with open(tmp_path, "w") as fd:
+            json.dump(cache, fd, indent=4)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.debug(f"Could not cache the Open Babel version: {e}")
+
+
+def _release_date(version):
+    """The month and year of the release from the obabel executable.
+
+    Parameters
+    ----------
+    version : str
+        The version of the library, which the executable must match.
+
+    Returns
+    -------
+    (str, str)
+        The month and year, or empty strings if they are not known.
+    """
+    path = shutil.which("obabel")
+    if path is None:
+        return "", ""
+    try:
+        result = subprocess.run(
+            [str(Path(path).expanduser().resolve()), "--version"],
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+        )
+    except Exception:
+        return "", ""
+
+    # e.g. "Open Babel 3.1.1 -- Oct  1 2020 -- 12:34:56"
+    for line in result.stdout.splitlines():
+        tmp = line.split()
+        if len(tmp) == 9 and tmp[0] == "Open" and tmp[2] == version:
+            return tmp[4], tmp[6]
+    return "", ""
+
+
+def openbabel_version():
+    """The version and release date of the Open Babel library in use.
+
+    Returns
+    -------
+    dict(str, str)
+        The "version", "month" and "year". The month and year are empty if they
+        cannot be found.
+    """
+    global _version
+
+    if _version is None:
+        from openbabel import openbabel
+
+        version = openbabel.OBReleaseVersion()
+        key = _library_key()
+        cached = _read_cache().get(key)
+        if cached is not None and cached.get("version") == version:
+            _version = cached
+        else:
+            month, year = _release_date(version)
+            _version = {"version": version, "month": month, "year": year}
+            _write_cache(key, _version)
+    return _version
+
+
+def cite_openbabel(references, bibliography):
+    """Add the citations for Open Babel.
+
+    Parameters
+    ----------
+    references : ReferenceHandler
+        The reference handler object, or None for no citations.
+    bibliography : dict
+        The bibliography as a dictionary.
+    """
+    if not references:
+        return
+
+    references.cite(
+        raw=bibliography["openbabel"],
+        alias="openbabel_jcinf",
+        module="read_structure_step",
+        level=1,
+        note="The principle Open Babel citation.",
+    )
+
+    try:
+        template = string.Template(bibliography["obabel"])
+        citation = template.substitute(**openbabel_version())
+        references.cite(
+            raw=citation,
+            alias="obabel-exe",
+            module="read_structure_step",
+            level=1,
+            note="The principle citation for the Open Babel executables.",
+        )
+    except Exception as e:
+        logger.debug(f"Could not cite the Open Babel executables: {e}")
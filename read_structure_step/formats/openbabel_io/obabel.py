@@ -1,15 +1,28 @@
 """Implementation of the chemical file reader/write using Open Babel
 """
 
+import itertools
+import logging
+import os
 from pathlib import Path
 import shutil
-import string
-import subprocess
+import tempfile
 
 from openbabel import openbabel
 
-if "OpenBabel_version" not in globals():
-    OpenBabel_version = None
+from ..compression import detect_compression
+from ..compression import open_file
+from ..compression import split_suffix
+from ..indices import parse_indices
+from ..progress import Progress
+from ..sources import as_source
+from ..sources import is_path
+from ..structure_record import name_structure
+from ..structure_record import record_from_OBMol
+from ..structure_record import record_to_configuration
+from .citations import cite_openbabel
+
+logger = logging.getLogger(__name__)
 
 # Get the list of file formats from Open Babel
 obConversion = openbabel.OBConversion()
@@ -18,6 +31,114 @@ known_output_formats = obConversion.GetSupportedOutputFormat()
 del obConversion
 
 
+def _read_molecules(path, extension, selection=None):
+    """Read the molecules in a file one at a time with Open Babel.
+
+    Compressed files and streams are read into memory, since Open Babel cannot read
+    from Python streams. Empty molecules, such as Open Babel finds after the final
+    END record in PDB files, are skipped.
+
+    Parameters
+    ----------
+    path : Path or Stream
+        The path to the file, or a stream (see sources.py).
+    extension : str
+        The extension, including initial dot, defining the format.
+    selection : Selection = None
+        The selected molecules, or None for all.
+
+    Yields
+    ------
+    (int, openbabel.OBMol)
+        The number of the molecule in the file, counting from 1, and the molecule.
+    """
+    obConversion = openbabel.OBConversion()
+    obConversion.SetInFormat(extension.lstrip("."))
+
+    obMol = openbabel.OBMol()
+    if is_path(path) and detect_compression(path) is None:
+        more = obConversion.ReadFile(obMol, str(path))
+    else:
+        with open_file(path, "r") as fd:
+            more = obConversion.ReadString(obMol, fd.read())
+
+    molecule_no = 0
+    while more:
+        if obMol.NumAtoms() > 0:
+            molecule_no += 1
+            if selection is None or molecule_no in selection:
+                yield molecule_no, obMol
+            if selection is not None and selection.done(molecule_no):
+                break
+        obMol = openbabel.OBMol()
+        more = obConversion.Read(obMol)
+
+
+def count_molecules(path, extension):
+    """Count the molecules in a file that Open Babel can read.
+
+    Parameters
+    ----------
+    path : str or Path or Stream
+        The path to the file, or a stream (see sources.py).
+    extension : str
+        The extension, including initial dot, defining the format.
+
+    Returns
+    -------
+    int
+        The number of molecules.
+    """
+    n_molecules = 0
+    for n_molecules, obMol in _read_molecules(as_source(path), extension):
+        pass
+    return n_molecules
+
+
+def iter_file(path, extension=".xyz", add_hydrogens=True, indices="1:end", **kwargs):
+    """Iterate over the structures in any file that Open Babel can read.
+
+    Structures that cannot be converted are logged and skipped.
+
+    Parameters
+    ----------
+    path : str or Path or bytes or file-like object
+        The path to the file, as either a string or Path, or its contents or an open
+        stream (see sources.py).
+
+    extension : str, optional, default: ".xyz"
+        The extension, including initial dot, defining the format.
+
+    add_hydrogens : bool = True
+        Whether to add any missing hydrogen atoms.
+
+    indices : str = "1:end"
+        The generalized indices (slices, SMARTS, etc.) to select structures
+        from a file containing multiple structures.
+
+    Yields
+    ------
+    (int, dict)
+        The number of the structure in the file, counting from 1, and the structure
+        record (see structure_record.py).
+    """
+    path = as_source(path)
+
+    selection = parse_indices(indices)
+    if selection.needs_count:
+        selection.n_structures = count_molecules(path, extension)
+
+    for record_no, obMol in _read_molecules(path, extension, selection):
+        try:
+            if add_hydrogens:
+                obMol.AddHydrogens()
+            record = record_from_OBMol(obMol)
+        except Exception as e:
+            logger.warning(f"Could not read structure {record_no} in {path}: {e}")
+            continue
+        yield record_no, record
+
+
 def load_file(
     path,
     configuration,
@@ -32,6 +153,7 @@ def load_file(
     printer=None,
     references=None,
     bibliography=None,
+    bulk=None,
     **kwargs,
 ):
     """Use Open Babel for reading any of the formats it supports.
@@ -40,10 +162,15 @@ def load_file(
     format. This function is using Open Babel to handle the file, so trusts that Open
     Babel knows what it is doing.
 
+    All the molecules in the file are read one at a time, so multi-model PDB files,
+    multi-frame XYZ files and the like give one configuration per structure. Indices
+    counting from the end of the file need an extra pass to count the molecules.
+
     Parameters
     ----------
-    file_name : str or Path
-        The path to the file, as either a string or Path.
+    file_name : str or Path or bytes or file-like object
+        The path to the file, as either a string or Path, or its contents or an open
+        stream (see sources.py).
 
     configuration : molsystem.Configuration
         The configuration to put the imported structure into.
@@ -55,7 +182,8 @@ def load_file(
         Whether to add any missing hydrogen atoms.
 
     system_db : System_DB = None
-        The system database, used if multiple structures in the file.
+        The system database, used if multiple structures in the file. If None, only
+        the first selected structure is read.
 
     system : System = None
         The system to use if adding subsequent structures as configurations.
@@ -85,114 +213,110 @@ def load_file(
     bibliography : dict
         The bibliography as a dictionary.
 
+    bulk : BulkImport = None
+        Commits the structures to the database in batches. See
+        formats/transactions.py.
+
     Returns
     -------
     [Configuration]
         The list of configurations created.
     """
-    global OpenBabel_version
 
-    if isinstance(path, str):
-        path = Path(path)
+    path = as_source(path)
+
+    selection = parse_indices(indices)
+    if selection.needs_count:
+        selection.n_structures = count_molecules(path, extension)
+
+    progress = None
+    if printer is not None:
+        n_structures = None
+        if selection.n_structures is not None:
+            n_structures = len(selection.selected())
+        progress = Progress(printer, n_structures=n_structures)
+
+    configurations = []
+    structure_no = 1
+    n_errors = 0
+    for record_no, obMol in _read_molecules(path, extension, selection):
+        if structure_no > 1:
+            if system_db is None:
+                # Without a database to put them in, only one structure can be read.
+                break
+            if subsequent_as_configurations:
+                configuration = system.create_configuration()
+            else:
+                system = system_db.create_system()
+                configuration = system.create_configuration()
+
+        structure_no += 1
+        try:
+            if add_hydrogens:
+                obMol.AddHydrogens()
+            title = obMol.GetTitle()
+            record_to_configuration(record_from_OBMol(obMol), configuration)
+        except Exception as e:
+            n_errors += 1
+            if printer is not None:
+                printer("")
+                printer(f"    Error handling structure {record_no} in {path.name}:")
+                printer("        " + str(e))
+            continue
+
+        configurations.append(configuration)
+
+        name_structure(
+            configuration,
+            title=title,
+            structure_no=record_no,
+            system_name=system_name,
+            configuration_name=configuration_name,
+        )
 
-    path.expanduser().resolve()
+        if progress is not None:
+            progress.update(structure_no - 1)
+        if bulk is not None:
+            bulk.added()
+
+    if printer is not None and structure_no > 2:
+        t = progress.elapsed
+        rate = structure_no / t
+        printer(
+            f"    Read {structure_no - n_errors - 1} structures in {t:.1f} "
+            f"seconds = {rate:.2f} per second"
+        )
+        if n_errors > 0:
+            printer(f"    {n_errors} structures could not be read due to errors.")
 
-    obConversion = openbabel.OBConversion()
-    obConversion.SetInAndOutFormats(extension.lstrip("."), "smi")
+    if references:
+        cite_openbabel(references, bibliography)
 
-    obMol = openbabel.OBMol()
-    obConversion.ReadFile(obMol, str(path))
-
-    if add_hydrogens:
-        obMol.AddHydrogens()
-
-    configuration.from_OBMol(obMol)
-
-    # Set the system name
-    if system_name is not None and system_name != "":
-        lower_name = system_name.lower()
-        if "from file" in lower_name:
-            system.name = obMol.GetTitle()
-        elif "canonical smiles" in lower_name:
-            system.name = configuration.canonical_smiles
-        elif "smiles" in lower_name:
-            system.name = configuration.smiles
-        else:
-            system.name = system_name
-
-    # And the configuration name
-    if configuration_name is not None and configuration_name != "":
-        lower_name = configuration_name.lower()
-        if "from file" in lower_name:
-            configuration.name = obMol.GetTitle()
-        elif "canonical smiles" in lower_name:
-            configuration.name = configuration.canonical_smiles
-        elif "smiles" in lower_name:
-            configuration.name = configuration.smiles
-        elif lower_name == "sequential":
-            configuration.name = "1"
-        else:
-            configuration.name = configuration_name
+    return configurations
 
-    if references:
-        # Add the citations for Open Babel
-        references.cite(
-            raw=bibliography["openbabel"],
-            alias="openbabel_jcinf",
-            module="read_structure_step",
-            level=1,
-            note="The principle Open Babel citation.",
-        )
 
-        # See if we can get the version of obabel
-        if OpenBabel_version is None:
-            path = shutil.which("obabel")
-            if path is not None:
-                path = Path(path).expanduser().resolve()
-                try:
-                    result = subprocess.run(
-                        [str(path), "--version"],
-                        stdin=subprocess.DEVNULL,
-                        capture_output=True,
-                        text=True,
-                    )
-                except Exception:
-                    OpenBabel_version = "unknown"
-                else:
-                    OpenBabel_version = "unknown"
-                    lines = result.stdout.splitlines()
-                    for line in lines:
-                        line = line.strip()
-                        tmp = line.split()
-                        if len(tmp) == 9 and tmp[0] == "Open":
-                            OpenBabel_version = {
-                                "version": tmp[2],
-                                "month": tmp[4],
-                                "year": tmp[6],
-                            }
-                        break
-
-        if isinstance(OpenBabel_version, dict):
-            try:
-                template = string.Template(bibliography["obabel"])
-
-                citation = template.substitute(
-                    month=OpenBabel_version["month"],
-                    version=OpenBabel_version["version"],
-                    year=OpenBabel_version["year"],
-                )
+def _with_last(items):
+    """Iterate over items, flagging the last one.
 
-                references.cite(
-                    raw=citation,
-                    alias="obabel-exe",
-                    module="read_structure_step",
-                    level=1,
-                    note="The principle citation for the Open Babel executables.",
-                )
-            except Exception:
-                pass
+    Parameters
+    ----------
+    items : iterable
+        The items, which may be a generator.
 
-    return [configuration]
+    Yields
+    ------
+    (any, bool)
+        Each item, and whether it is the last.
+    """
+    items = iter(items)
+    try:
+        item = next(items)
+    except StopIteration:
+        return
+    for next_item in items:
+        yield item, False
+        item = next_item
+    yield item, True
 
 
 def write_file(
@@ -205,7 +329,7 @@ def write_file(
     bibliography=None,
     **kwargs,
 ):
-    """Use Open Babel for reading any of the formats it supports.
+    """Use Open Babel for writing any of the formats it supports.
 
     See https://en.wikipedia.org/wiki/Chemical_table_file for a description of the
     format. This function is using Open Babel to handle the file, so trusts that Open
@@ -214,10 +338,13 @@ def write_file(
     Parameters
     ----------
     file_name : str or Path
-        The path to the file, as either a string or Path.
+        The path to the file, as either a string or Path. A suffix such as ".gz"
+        compresses the file.
 
     configurations : [molsystem.Configuration]
-        The configurations to write -- should be one for this module
+        The configurations to write, which may be a generator. They are streamed
+        through one Open Babel converter, so formats holding many structures get
+        them all.
 
     extension : str, optional, default: None
         The extension, including initial dot, defining the format.
@@ -237,89 +364,88 @@ def write_file(
     Returns
     -------
     [Configuration]
-        The list of configurations created.
+        The list of configurations written.
     """
-    global OpenBabel_version
 
     if isinstance(path, str):
         path = Path(path)
 
     path.expanduser().resolve()
 
-    obConversion = openbabel.OBConversion()
-    obConversion.SetInAndOutFormats("smi", extension.lstrip("."))
-
-    configuration = configurations[0]
-    system = configuration.system
-    obMol = configuration.to_OBMol()
-    title = f"{system.name}/{configuration.name}"
-    obMol.SetTitle(title)
-
-    if remove_hydrogens == "nonpolar":
-        obMol.DeleteNonPolarHydrogens()
-    elif remove_hydrogens == "all":
-        obMol.DeleteHydrogens()
+    # Look ahead, so that nothing is written if there are no configurations.
+    configurations = _with_last(configurations)
+    first = next(configurations, None)
+    if first is None:
+        return []
+    configurations = itertools.chain([first], configurations)
 
-    obMol.SetTitle(f"{system.name}/{configuration.name}")
-
-    obConversion.WriteFile(obMol, str(path))
+    obConversion = openbabel.OBConversion()
+    obConversion.SetOutFormat(extension.lstrip("."))
+
+    # Open Babel cannot write to Python streams, so compressed files are written
+    # uncompressed to a temporary file first.
+    compression = split_suffix(path)[1]
+    if compression is None:
+        out_path = path
+    else:
+        fd, name = tempfile.mkstemp(prefix=path.name + ".", dir=path.parent)
+        os.close(fd)
+        out_path = Path(name)
+
+    progress = None
+    if printer is not None:
+        n_structures = None
+        if hasattr(configurations, "__len__"):
+            n_structures = len(configurations)
+        progress = Progress(printer, n_structures=n_structures, action="written")
+
+    written = []
+    structure_no = 0
+    try:
+        for configuration, is_last in configurations:
+            structure_no += 1
+            system = configuration.system
+            obMol = configuration.to_OBMol()
+
+            if remove_hydrogens == "nonpolar":
+                obMol.DeleteNonPolarHydrogens()
+            elif remove_hydrogens == "all":
+                obMol.DeleteHydrogens()
+
+            obMol.SetTitle(f"{system.name}/{configuration.name}")
+
+            # Formats such as CML close the file after the last molecule.
+            obConversion.SetLast(is_last)
+            if structure_no == 1:
+                ok = obConversion.WriteFile(obMol, str(out_path))
+            else:
+                ok = obConversion.Write(obMol)
+            if not ok:
+                raise RuntimeError(
+                    f"Error writing structure {structure_no} to {path.name}."
+                )
 
-    if references:
-        # Add the citations for Open Babel
-        references.cite(
-            raw=bibliography["openbabel"],
-            alias="openbabel_jcinf",
-            module="read_structure_step",
-            level=1,
-            note="The principle Open Babel citation.",
+            written.append(configuration)
+            if progress is not None:
+                progress.update(structure_no)
+        obConversion.CloseOutFile()
+
+        if compression is not None:
+            with open(out_path, "rb") as fin, open_file(path, "wb") as fout:
+                shutil.copyfileobj(fin, fout, 1 << 20)
+    finally:
+        if compression is not None:
+            out_path.unlink()
+
+    if printer is not None:
+        t = progress.elapsed
+        rate = structure_no / t if t > 0 else 0.0
+        printer(
+            f"Wrote {structure_no} structures in {t:.1f} seconds = {rate:.2f} "
+            "per second"
         )
 
-        # See if we can get the version of obabel
-        if OpenBabel_version is None:
-            path = shutil.which("obabel")
-            if path is not None:
-                path = Path(path).expanduser().resolve()
-                try:
-                    result = subprocess.run(
-                        [str(path), "--version"],
-                        stdin=subprocess.DEVNULL,
-                        capture_output=True,
-                        text=True,
-                    )
-                except Exception:
-                    OpenBabel_version = "unknown"
-                else:
-                    OpenBabel_version = "unknown"
-                    lines = result.stdout.splitlines()
-                    for line in lines:
-                        line = line.strip()
-                        tmp = line.split()
-                        if len(tmp) == 9 and tmp[0] == "Open":
-                            OpenBabel_version = {
-                                "version": tmp[2],
-                                "month": tmp[4],
-                                "year": tmp[6],
-                            }
-                        break
-
-        if isinstance(OpenBabel_version, dict):
-            try:
-                template = string.Template(bibliography["obabel"])
-
-                citation = template.substitute(
-                    month=OpenBabel_version["month"],
-                    version=OpenBabel_version["version"],
-                    year=OpenBabel_version["year"],
-                )
-
-                references.cite(
-                    raw=citation,
-                    alias="obabel-exe",
-                    module="read_structure_step",
-                    level=1,
-                    note="The principle citation for the Open Babel executables.",
-                )
-            except Exception:
-                pass
+    if references:
+        cite_openbabel(references, bibliography)
 
-    return [configuration]
+    return written
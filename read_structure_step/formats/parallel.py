@@ -0,0 +1,150 @@
+"""
+Helpers for parsing structures in a pool of worker processes.
+
+The workers only parse text into picklable structure records (see
+structure_record.py); the main process consumes the results in the original order
+and does all the work with the SystemDB.
+"""
+
+import collections
+import concurrent.futures
+import itertools
+import os
+import queue
+import threading
+
+
+def n_workers_to_use(n_workers):
+    """The number of worker processes to use.
+
+    Parameters
+    ----------
+    n_workers : int or str or None
+        The requested number of workers. None, 0, or "all" use all the cores.
+
+    Returns
+    -------
+    int
+        The number of workers, at least 1.
+    """
+    if n_workers is None or n_workers == "all":
+        return os.cpu_count() or 1
+    n_workers = int(n_workers)
+    if n_workers <= 0:
+        return os.cpu_count() or 1
+    return n_workers
+
+
+def _map_chunk(fn, chunk):
+    """Apply a function to a chunk of items in a worker process."""
+    return [fn(item) for item in chunk]
+
+
+def ordered_map(fn, items, n_workers, chunksize=64, max_pending=None):
+    """Apply a function to items in worker processes, yielding results in order.
+
+    The items are sent to the workers in chunks to reduce the overhead, and only a
+    limited number of chunks are in flight at once, so arbitrarily long iterables
+    are handled in bounded memory.
+
+    Parameters
+    ----------
+    fn : function
+        The function to apply to each item. It must be picklable, e.g. a module-level
+        function or a functools.partial of one.
+    items : iterable
+        The items. They must be picklable.
+    n_workers : int
+        The number of worker processes.
+    chunksize : int = 64
+        The number of items sent to a worker at a time.
+    max_pending : int = None
+        The maximum number of chunks in flight. Defaults to 4 per worker.
+
+    Yields
+    ------
+    (item, result)
+        Each item and the result of the function, in the order of the items.
+    """
+    if max_pending is None:
+        max_pending = 4 * n_workers
+
+    items = iter(items)
+    pending = collections.deque()
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=n_workers)
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                chunk = list(itertools.islice(items, chunksize))
+                if len(chunk) == 0:
+                    exhausted = True
+                else:
+                    pending.append((chunk, executor.submit(_map_chunk, fn, chunk)))
+            if len(pending) == 0:
+                break
+            chunk, future = pending.popleft()
+            for item, result in zip(chunk, future.result()):
+                yield item, result
+    finally:
+        # If the caller stopped early, don't wait for work that isn't needed.
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def prefetch(items, maxsize=16):
+    """Iterate over items produced in a background thread.
+
+    This overlaps producing the items, e.g. reading and decompressing a file, with
+    the work on them. At most maxsize items wait in the queue, so a slow consumer
+    holds back the producer rather than letting the items pile up in memory.
+
+    Parameters
+    ----------
+    items : iterable
+        The items, which are only iterated over in the background thread.
+    maxsize : int = 16
+        The maximum number of items produced ahead of the consumer.
+
+    Yields
+    ------
+    any
+        The items, in order. Any exception in the producer is raised here.
+    """
+    waiting = queue.Queue(maxsize)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                waiting.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except BaseException as e:
+            put((done, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = waiting.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                break
+            yield item
+    finally:
+        # If the caller stopped early, let the producer finish.
+        stop.set()
+        thread.join()
@@ -0,0 +1,134 @@
+"""
+Progress reports while reading files with many structures.
+
+Counting the structures in a file to report the percentage done requires reading the
+whole file an extra time, which is expensive for large or compressed files. Instead,
+the progress is estimated from the position in the underlying file, i.e. the
+compressed bytes for compressed files, unless the exact number of structures is
+already known, e.g. from a record index.
+"""
+
+import time
+
+from .compression import wrap_file
+from .sources import open_raw
+
+
+def open_tracked(path, mode="rb", threads=1):
+    """Open a file, keeping hold of the underlying binary file to track progress.
+
+    Compressed files are decompressed transparently.
+
+    Parameters
+    ----------
+    path : str or Path or Stream
+        The path to the file, or a stream (see sources.py).
+    mode : str = "rb"
+        The mode, either "rb" or "r" for text.
+    threads : int = 1
+        The number of threads for decompressing the file.
+
+    Returns
+    -------
+    (file-like object, file-like object)
+        The file to read, and the underlying binary file, whose position gives the
+        progress. Both need to be closed.
+    """
+    raw = open_raw(path)
+    return wrap_file(raw, mode, threads=threads), raw
+
+
+class Progress(object):
+    """Periodic reports of the progress reading or writing the structures in a file.
+
+    Attributes
+    ----------
+    printer : function
+        The function to print the reports.
+    tell : function
+        A function returning the position in the underlying file, e.g. the tell
+        method of the binary file from open_tracked.
+    size : int
+        The size of the underlying file in bytes.
+    n_structures : int
+        The number of structures to be read, if known exactly.
+    interval : float
+        The time between reports, in seconds.
+    action : str
+        What is being done to the structures, e.g. "read" or "written".
+    """
+
+    def __init__(
+        self,
+        printer,
+        tell=None,
+        size=None,
+        n_structures=None,
+        interval=60,
+        action="read",
+    ):
+        self.printer = printer
+        self.action = action
+        self.tell = tell
+        self.size = size
+        self.n_structures = n_structures
+        self.interval = interval
+        self.t0 = time.time()
+        self.last_t = self.t0
+
+    @property
+    def elapsed(self):
+        """The time since starting, in seconds."""
+        return time.time() - self.t0
+
+    def fraction(self, structure_no):
+        """The estimated fraction of the work done.
+
+        Parameters
+        ----------
+        structure_no : int
+            The number of structures read so far.
+
+        Returns
+        -------
+        float or None
+            The fraction done, or None if it cannot be estimated.
+        """
+        if self.n_structures is not None and self.n_structures > 0:
+            return min(structure_no / self.n_structures, 1.0)
+        if self.tell is not None and self.size is not None and self.size > 0:
+            try:
+                return min(self.tell() / self.size, 1.0)
+            except (OSError, ValueError):
+                return None
+        return None
+
+    def update(self, structure_no):
+        """Report the progress if enough time has passed since the last report.
+
+        Parameters
+        ----------
+        structure_no : int
+            The number of structures read so far.
+        """
+        t1 = time.time()
+        if t1 - self.last_t < self.interval:
+            return
+        self.last_t = t1
+
+        t = int(t1 - self.t0)
+        fraction = self.fraction(structure_no)
+        if fraction is None or fraction <= 0:
+            self.printer(f"\t{structure_no:6} structures {self.action} in {t} seconds.")
+        else:
+            percent = int(100 * fraction)
+            t_left = int((t1 - self.t0) * (1 - fraction) / fraction)
+            if self.n_structures is None:
+                done = f"{percent}% of the file"
+            else:
+                done = f"{percent}%"
+            self.printer(
+                f"\t{structure_no:6} ({done}) structures {self.action} in {t} "
+                f"seconds. "
+                f"About {t_left} seconds remaining."
+            )
@@ -0,0 +1,753 @@
+"""
+Persistent byte-offset indices for files containing many structures.
+
+Formats such as SDF hold one structure after another, separated by a terminator line
+like "$$$$". Finding a given structure, or even just counting them, requires reading
+the whole file. This module records the byte offset of the end of every record in a
+small sidecar file next to the structure file, e.g. "library.sdf.idx". The sidecar is
+reused as long as the size and modification time of the structure file are unchanged,
+which allows readers to seek directly to the records they need. Only the indices of
+large files are saved by the readers, since small files are quick to scan again and
+are not worth a file beside them in the user's data.
+
+Formats such as CIF instead start each structure with a line like "data_NAME". For
+these a BlockIndex also records the name of each block, so that blocks can be found by
+name as well as by number.
+
+The offsets are positions in the uncompressed stream, so the same index works for
+compressed files, though seeking in them requires decompressing up to the record.
+"""
+
+import array
+import json
+import logging
+from pathlib import Path
+
+from .sources import is_path
+from .sources import source_size
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+# The smallest structure file whose index is saved when it is read, in bytes
+min_saved_size = 16 * 1024 * 1024
+
+
+def sidecar_path(path):
+    """The path of the index file for a structure file.
+
+    Parameters
+    ----------
+    path : str or Path
+        The path to the structure file.
+
+    Returns
+    -------
+    Path
+        The path to the sidecar index file.
+    """
+    path = Path(path)
+    return path.with_name(path.name + ".idx")
+
+
+def split_records(fd, terminator, offsets=None):
+    """Split a binary stream into records, optionally recording their offsets.
+
+    Parameters
+    ----------
+    fd : binary file-like object
+        The stream to read, positioned at the beginning.
+    terminator : bytes
+        The text at the beginning of the line that ends a record, e.g. b"$$$$"
+    offsets : [int] = None
+        If given, the offset of the end of each record is appended to the list.
+
+    Yields
+    ------
+    bytes
+        The text of each record, including the terminator line.
+    """
+    n = len(terminator)
+    position = 0
+    lines = []
+    for line in fd:
+        position += len(line)
+        lines.append(line)
+        if line[0:n] == terminator:
+            if offsets is not None:
+                offsets.append(position)
+            yield b"".join(lines)
+            lines = []
+
+
+def split_blocks(fd, start, selection=None):
+    """Split a stream into blocks each beginning with a line starting with `start`.
+
+    Any text before the first block is ignored. Unselected blocks are skipped without
+    keeping their text, and reading stops after the last selected block.
+
+    Parameters
+    ----------
+    fd : file-like object
+        The stream to read, either text or binary to match `start`.
+    start : str or bytes
+        The text at the beginning of the first line of each block, e.g.
+        "@<TRIPOS>MOLECULE"
+    selection : Selection = None
+        The blocks to return, counting from 1. By default all are returned.
+
+    Yields
+    ------
+    (int, str or bytes)
+        The number of the block, counting from 1, and its text.
+    """
+    n = len(start)
+    empty = start[0:0]
+    block_no = 0
+    lines = None
+    for line in fd:
+        if line[0:n] == start:
+            if lines is not None:
+                yield block_no, empty.join(lines)
+                lines = None
+            if selection is not None and selection.done(block_no):
+                return
+            block_no += 1
+            if selection is None or block_no in selection:
+                lines = []
+        if lines is not None:
+            lines.append(line)
+    if lines is not None:
+        yield block_no, empty.join(lines)
+
+
+class BlockScanner(object):
+    """Split a file into blocks each beginning with a line starting with `start`.
+
+    The blocks are handed out as memoryviews without copying them. A memory-mapped
+    file, or other bytes-like object with a find method, is scanned in place, so
+    only the blocks that are used are ever read into memory. A stream is read in
+    chunks into a buffer holding just the current block, which becomes the block
+    when its end is found; unselected blocks are skipped without keeping their text.
+
+    As with split_blocks, any text before the first block is ignored and scanning
+    stops after the last selected block. The offsets and names for a BlockIndex can
+    be recorded at the same time. The offset of the end of the file is only added if
+    it is reached, so the offsets are complete if there is one more offset than
+    names.
+
+    Attributes
+    ----------
+    position : int
+        The position in the file, e.g. for reporting progress.
+    """
+
+    def __init__(
+        self,
+        source,
+        start,
+        selection=None,
+        offsets=None,
+        names=None,
+        chunk_size=1 << 20,
+    ):
+        """Prepare to scan a file.
+
+        Parameters
+        ----------
+        source : mmap.mmap or bytes or binary file-like object
+            The memory-mapped file or the stream to scan.
+        start : bytes
+            The text at the beginning of the first line of each block, e.g. b"data_"
+        selection : Selection = None
+            The blocks to return, counting from 1. By default all are returned.
+        offsets : [int] = None
+            If given, the offset of the start of each block is appended to the list,
+            followed by the offset of the end of the file.
+        names : [str] = None
+            If given, the name of each block, which follows `start` on its first
+            line, is appended to the list.
+        chunk_size : int = 1 MiB
+            The size of the reads from a stream.
+        """
+        self.source = source
+        self.start = start
+        self.selection = selection
+        self.offsets = offsets
+        self.names = names
+        self.chunk_size = chunk_size
+        self.position = 0
+
+    def __iter__(self):
+        """Iterate over the selected blocks.
+
+        Yields
+        ------
+        (int, memoryview)
+            The number of the block, counting from 1, and its text. For a stream,
+            the text is only valid until the next block.
+        """
+        if hasattr(self.source, "find"):
+            return self._scan_mapped()
+        return self._scan_stream()
+
+    def tell(self):
+        """The position in the file."""
+        return self.position
+
+    def _found(self, block_no, offset, first_line):
+        """Record a block, returning whether it is selected."""
+        if self.offsets is not None:
+            self.offsets.append(offset)
+        if self.names is not None:
+            name = first_line[len(self.start) :].strip()
+            self.names.append(name.decode("utf-8", errors="replace"))
+        return self.selection is None or block_no in self.selection
+
+    def _scan_mapped(self):
+        """Scan a memory-mapped file or bytes-like object in place."""
+        data = self.source
+        size = len(data)
+        marker = b"\n" + self.start
+        if data[0 : len(self.start)] == self.start:
+            position = 0
+        else:
+            position = data.find(marker)
+            position = -1 if position < 0 else position + 1
+
+        view = memoryview(data)
+        try:
+            block_no = 0
+            while position >= 0:
+                end = data.find(marker, position)
+                end = size if end < 0 else end + 1
+                line_end = data.find(b"\n", position, end)
+                line_end = end if line_end < 0 else line_end
+
+                block_no += 1
+                selected = self._found(block_no, position, data[position:line_end])
+                self.position = end
+                if selected:
+                    yield block_no, view[position:end]
+
+                if end == size:
+                    break
+                if self.selection is not None and self.selection.done(block_no):
+                    return
+                position = end
+            self.position = size
+            if self.offsets is not None:
+                self.offsets.append(size)
+        finally:
+            view.release()
+
+    def _scan_stream(self):
+        """Scan a stream, holding only the current block in memory."""
+        fd = self.source
+        marker = b"\n" + self.start
+        # Enough to find the marker spanning two reads
+        keep = len(marker) - 1
+
+        # A newline is put before the stream so that every block follows a newline.
+        buffer = bytearray(b"\n")
+        base = -1
+        searched = 0
+        eof = False
+        block_no = 0
+        while True:
+            # Find the start of the next block, discarding the text before it
+            i = buffer.find(marker, searched)
+            while i < 0 and not eof:
+                drop = max(len(buffer) - keep, 0)
+                del buffer[:drop]
+                base += drop
+                chunk = fd.read(self.chunk_size)
+                if chunk:
+                    buffer += chunk
+                else:
+                    eof = True
+                i = buffer.find(marker)
+            if i < 0:
+                break
+            del buffer[: i + 1]
+            base += i + 1
+
+            # The first line of the block has its name
+            line_end = buffer.find(b"\n")
+            while line_end < 0 and not eof:
+                searched = len(buffer)
+                chunk = fd.read(self.chunk_size)
+                if chunk:
+                    buffer += chunk
+                else:
+                    eof = True
+                line_end = buffer.find(b"\n", searched)
+            line_end = len(buffer) if line_end < 0 else line_end
+
+            block_no += 1
+            selected = self._found(block_no, base, buffer[0:line_end])
+
+            # And the end of the block, which is the start of the next
+            searched = line_end
+            while True:
+                end = buffer.find(marker, searched)
+                if end >= 0 or eof:
+                    break
+                if selected:
+                    searched = max(len(buffer) - keep, 0)
+                else:
+                    drop = max(len(buffer) - keep, 0)
+                    del buffer[:drop]
+                    base += drop
+                    searched = 0
+                chunk = fd.read(self.chunk_size)
+                if chunk:
+                    buffer += chunk
+                else:
+                    eof = True
+            end = len(buffer) if end < 0 else end + 1
+            self.position = base + end
+
+            if end == len(buffer):
+                if selected:
+                    yield block_no, memoryview(buffer)
+                break
+
+            # Hand over the buffer as the block, keeping the rest for the next.
+            rest = buffer[end - 1 :]
+            if selected:
+                del buffer[end:]
+                yield block_no, memoryview(buffer)
+            buffer = rest
+            base += end - 1
+            searched = 0
+            if self.selection is not None and self.selection.done(block_no):
+                return
+
+        self.position = base + len(buffer)
+        if self.offsets is not None:
+            self.offsets.append(self.position)
+
+
+class RecordIndex(object):
+    """The byte offsets of the records in a structure file.
+
+    Attributes
+    ----------
+    offsets : array.array
+        The offset of the start of the file, followed by the offset of the end of each
+        record, so record i spans offsets[i] to offsets[i + 1].
+    size : int
+        The size of the structure file when indexed.
+    mtime_ns : int
+        The modification time of the structure file when indexed.
+    terminator : str
+        The terminator for records.
+    """
+
+    # Identifies the type of index in the sidecar file
+    kind = "records"
+    default_terminator = "$$$$"
+
+    def __init__(self, offsets, size=None, mtime_ns=None, terminator="$$$$"):
+        if isinstance(offsets, array.array):
+            self.offsets = offsets
+        else:
+            self.offsets = array.array("q", offsets)
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.terminator = terminator
+
+    def __len__(self):
+        """The number of records in the file."""
+        return len(self.offsets) - 1
+
+    def span(self, record):
+        """The offset and length of a record.
+
+        Parameters
+        ----------
+        record : int
+            The record, counting from 0.
+
+        Returns
+        -------
+        (int, int)
+            The offset and length of the record in bytes.
+        """
+        start = self.offsets[record]
+        return start, self.offsets[record + 1] - start
+
+    def read(self, fd, record):
+        """Read a single record from a binary stream.
+
+        Parameters
+        ----------
+        fd : binary file-like object
+            The stream, which must be seekable.
+        record : int
+            The record, counting from 0.
+
+        Returns
+        -------
+        bytes
+            The text of the record.
+        """
+        start, length = self.span(record)
+        fd.seek(start)
+        return fd.read(length)
+
+    def records(self, fd, records=None):
+        """Iterate over records in a binary stream, seeking only as needed.
+
+        Parameters
+        ----------
+        fd : binary file-like object
+            The stream, which must be seekable unless reading records in order from
+            the beginning.
+        records : iterable of int = None
+            The records to read, counting from 0, ideally in increasing order. If
+            None, all of the records are read.
+
+        Yields
+        ------
+        (int, bytes)
+            The record number, counting from 0, and its text.
+        """
+        if records is None:
+            records = range(len(self))
+        # Streams that cannot seek, e.g. from a decompressing process, can still be
+        # read sequentially.
+        position = fd.tell() if fd.seekable() else 0
+        for record in records:
+            start, length = self.span(record)
+            if position != start:
+                fd.seek(start)
+            yield record, fd.read(length)
+            position = start + length
+
+    @classmethod
+    def build(cls, path, terminator=None, opener=open):
+        """Create the index by scanning the file.
+
+        Parameters
+        ----------
+        path : str or Path or Stream
+            The path to the structure file, or a stream (see sources.py).
+        terminator : str = "$$$$"
+            The text at the start of the line terminating each record.
+        opener : function = open
+            Function to open the file, e.g. one handling compressed files.
+
+        Returns
+        -------
+        RecordIndex
+        """
+        if terminator is None:
+            terminator = cls.default_terminator
+        size, mtime_ns = _size_and_time(path)
+        marker = terminator.encode()
+        n = len(marker)
+        offsets = [0]
+        position = 0
+        with opener(path, "rb") as fd:
+            for line in fd:
+                position += len(line)
+                if line[0:n] == marker:
+                    offsets.append(position)
+        return cls(offsets, size=size, mtime_ns=mtime_ns, terminator=terminator)
+
+    @classmethod
+    def load(cls, path, terminator=None):
+        """Load the index for a structure file, if it exists and is current.
+
+        Parameters
+        ----------
+        path : str or Path
+            The path to the structure file.
+        terminator : str = None
+            The terminator, which must match that used to build the index. Defaults
+            to the default_terminator of the class, e.g. "$$$$".
+
+        Returns
+        -------
+        RecordIndex or None
+            The index, or None if there is no valid index. Streams have no index.
+        """
+        if not is_path(path):
+            return None
+        if terminator is None:
+            terminator = cls.default_terminator
+        path = Path(path)
+        index_path = sidecar_path(path)
+        try:
+            stat = path.stat()
+            with open(index_path, "rb") as fd:
+                header = json.loads(fd.readline())
+                if (
+                    header.get("version") != INDEX_VERSION
+                    or header.get("kind", "records") != cls.kind
+                    or header.get("size") != stat.st_size
+                    or header.get("mtime_ns") != stat.st_mtime_ns
+                    or header.get("terminator") != terminator
+                ):
+                    logger.debug(f"The index {index_path} is out of date.")
+                    return None
+                extra = cls._read_extra(fd, header)
+                offsets = array.array("q")
+                offsets.frombytes(fd.read())
+        except (OSError, ValueError) as e:
+            logger.debug(f"Could not load the index {index_path}: {e}")
+            return None
+
+        if len(offsets) != header["n_records"] + 1:
+            logger.debug(f"The index {index_path} is corrupt.")
+            return None
+
+        return cls(
+            offsets,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            terminator=terminator,
+            **extra,
+        )
+
+    def is_worth_saving(self):
+        """Whether the structure file is large enough to save its index.
+
+        Returns
+        -------
+        bool
+            True if the file is at least min_saved_size bytes.
+        """
+        return self.size is not None and self.size >= min_saved_size
+
+    def save(self, path):
+        """Write the index to the sidecar file for the structure file.
+
+        Failures, e.g. because the directory is read-only, are logged and ignored,
+        since the index is only an optimization.
+
+        Parameters
+        ----------
+        path : str or Path
+            The path to the structure file.
+
+        Returns
+        -------
+        bool
+            Whether the index was saved. Indices of streams are not saved.
+        """
+        if not is_path(path):
+            return False
+        index_path = sidecar_path(path)
+        header = {
+            "version": INDEX_VERSION,
+            "kind": self.kind,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "terminator": self.terminator,
+            "n_records": len(self),
+        }
+        tmp_path = index_path.with_name(index_path.name + ".tmp")
+        try:
+            with open(tmp_path, "wb") as fd:
+                fd.write(json.dumps(header).encode() + b"\n")
+                self._write_extra(fd)
+                self.offsets.tofile(fd)
+            tmp_path.replace(index_path)
+        except OSError as e:
+            logger.debug(f"Could not save the index {index_path}: {e}")
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            return False
+        return True
+
+    @classmethod
+    def get(cls, path, terminator=None, opener=open, save=True):
+        """Load the index for a file, building and saving it if needed.
+
+        Parameters
+        ----------
+        path : str or Path
+            The path to the structure file.
+        terminator : str = None
+            The text at the start of the line terminating each record. Defaults to
+            the default_terminator of the class, e.g. "$$$$".
+        opener : function = open
+            Function to open the file, e.g. one handling compressed files.
+        save : bool = True
+            Whether to save a newly built index, if the file is large enough (see
+            is_worth_saving).
+
+        Returns
+        -------
+        RecordIndex
+        """
+        index = cls.load(path, terminator=terminator)
+        if index is None:
+            index = cls.build(path, terminator=terminator, opener=opener)
+            if save and index.is_worth_saving():
+                index.save(path)
+        return index
+
+    @classmethod
+    def _read_extra(cls, fd, header):
+        """Read any data between the header and the offsets in the sidecar file.
+
+        Parameters
+        ----------
+        fd : binary file-like object
+            The sidecar file, positioned after the header.
+        header : dict
+            The header of the sidecar file.
+
+        Returns
+        -------
+        dict
+            Further arguments for creating the index.
+        """
+        return {}
+
+    def _write_extra(self, fd):
+        """Write any data between the header and the offsets in the sidecar file.
+
+        Parameters
+        ----------
+        fd : binary file-like object
+            The sidecar file, positioned after the header.
+        """
+        pass
+
+
+class BlockIndex(RecordIndex):
+    """The byte offsets and names of the blocks in a file, such as a CIF file.
+
+    Each block starts with a line beginning with the terminator, e.g. "data_", which
+    is followed by the name of the block.
+
+    Attributes
+    ----------
+    offsets : array.array
+        The offset of the start of the first block, followed by the offset of the end
+        of each block, so block i spans offsets[i] to offsets[i + 1].
+    names : [str]
+        The name of each block.
+    size : int
+        The size of the structure file when indexed.
+    mtime_ns : int
+        The modification time of the structure file when indexed.
+    terminator : str
+        The text at the start of the first line of each block.
+    """
+
+    kind = "blocks"
+    default_terminator = "data_"
+
+    def __init__(self, offsets, names=None, size=None, mtime_ns=None, terminator=None):
+        if terminator is None:
+            terminator = self.default_terminator
+        super().__init__(offsets, size=size, mtime_ns=mtime_ns, terminator=terminator)
+        self.names = [] if names is None else list(names)
+        self._numbers = None
+
+    def find(self, name):
+        """The number of a block given its name, ignoring case as CIF does.
+
+        If several blocks have the same name, the first is found.
+
+        Parameters
+        ----------
+        name : str
+            The name of the block.
+
+        Returns
+        -------
+        int or None
+            The block, counting from 0, or None if there is no such block.
+        """
+        if self._numbers is None:
+            self._numbers = {}
+            for i, block_name in enumerate(self.names):
+                self._numbers.setdefault(block_name.lower(), i)
+        return self._numbers.get(name.lower())
+
+    @classmethod
+    def build(cls, path, terminator=None, opener=open):
+        """Create the index by scanning the file.
+
+        Parameters
+        ----------
+        path : str or Path or Stream
+            The path to the structure file, or a stream (see sources.py).
+        terminator : str = "data_"
+            The text at the start of the first line of each block.
+        opener : function = open
+            Function to open the file, e.g. one handling compressed files.
+
+        Returns
+        -------
+        BlockIndex
+        """
+        if terminator is None:
+            terminator = cls.default_terminator
+        size, mtime_ns = _size_and_time(path)
+        offsets = []
+        names = []
+        with opener(path, "rb") as fd:
+            scanner = BlockScanner(
+                fd, terminator.encode(), _no_blocks, offsets=offsets, names=names
+            )
+            for _ in scanner:
+                pass
+        return cls(
+            offsets, names=names, size=size, mtime_ns=mtime_ns, terminator=terminator
+        )
+
+    @classmethod
+    def _read_extra(cls, fd, header):
+        """Read the names of the blocks, one line of tab-separated names."""
+        names = fd.readline().decode("utf-8").rstrip("\n")
+        names = names.split("\t") if header["n_records"] > 0 else []
+        if len(names) != header["n_records"]:
+            raise ValueError("The names of the blocks are corrupt.")
+        return {"names": names}
+
+    def _write_extra(self, fd):
+        """Write the names of the blocks, one line of tab-separated names."""
+        fd.write("\t".join(self.names).encode("utf-8") + b"\n")
+
+
+class _NoBlocks(object):
+    """A selection of no blocks, for scanning a file without keeping any text."""
+
+    def __contains__(self, block_no):
+        return False
+
+    def done(self, block_no):
+        return False
+
+
+_no_blocks = _NoBlocks()
+
+
+def _size_and_time(path):
+    """The size and modification time of a file, or the size of a stream.
+
+    Parameters
+    ----------
+    path : str or Path or Stream
+        The path to the structure file, or a stream (see sources.py).
+
+    Returns
+    -------
+    (int, int or None)
+        The size in bytes and the modification time in ns, which is None for streams.
+    """
+    if is_path(path):
+        stat = Path(path).stat()
+        return stat.st_size, stat.st_mtime_ns
+    return source_size(path), None
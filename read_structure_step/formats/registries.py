@@ -12,16 +12,68 @@ REGISTERED_READERS : dict(str, dict(str, str))
          "function": the function to call to read the file.
          "description": the readable name for the format, e.g. "MDL structure-data file"
 
+REGISTERED_STREAMING_READERS : dict(str, dict(str, str))
+    The registry of readers that yield the structures in a file one at a time as
+    structure records, rather than creating configurations. The entries are like
+    those in REGISTERED_READERS.
+
 REGISTERED_FORMAT_CHECKERS : dict(str, function)
-    The registry of functions for checking is an unknown file has a given format.
+    The registry of functions for checking if an unknown file has a given format,
+    keyed by the extension. The function is given a sample of the beginning and end
+    of the file (see sniff.py) and returns the confidence, from 0 to 1, that the
+    file has the format.
+
+FORMAT_CHECKER_PRIORITIES : dict(str, int)
+    The priority of each format checker, keyed by the extension. The checkers with
+    higher priority are run first.
 
 FORMAT_METADATA : dict(str, dict(str, str))
     Metadata describing a file format.
+
+The readers, and streaming readers, are given the source of the structures as their
+first argument. This is usually the path to the file, but may also be the contents
+of the file as bytes, or an open binary or text stream, such as a member of a tar
+archive, so that data need not be written to a temporary file to be read. Readers
+should pass it through sources.as_source() and then use open_file(), open_tracked()
+and source_size() rather than the file system directly. A Stream has a name, and
+stem, like a Path for messages and naming the structures, but no other file
+operations.
+
+Formats can also be declared with declare_format, giving the module that implements
+them. The registries then hold lightweight LazyFunction objects, and the module is
+only imported when the format is first used, at which point its decorators replace
+them with the real functions. Other packages can add formats through the
+"read_structure_step.formats" entry point group, with each entry point giving a
+dictionary, or list of dictionaries, of the arguments to declare_format, e.g.
+
+    {
+        "extensions": [".foo"],
+        "module": "foo_package.foo",
+        "reader": "load_foo",
+        "checker": "check_foo",
+        "description": "Foo file",
+    }
+
+These, and the formats handled by Open Babel as a last resort, are only loaded when
+a format is not found or all the formats are needed, e.g. when sniffing a file.
+
+The description and checker priority of a declared format are given only in the
+declaration. When the module is imported, decorators that give no description or
+priority keep those declared.
 """
 
+import importlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "read_structure_step.formats"
+
 REGISTERED_READERS = {}
+REGISTERED_STREAMING_READERS = {}
 REGISTERED_WRITERS = {}
 REGISTERED_FORMAT_CHECKERS = {}
+FORMAT_CHECKER_PRIORITIES = {}
 FORMAT_METADATA = {}
 default_metadata = {
     "single_structure": True,
@@ -33,6 +85,48 @@ default_metadata = {
     "add_hydrogens": False,
 }
 
+# The priority of format checkers unless otherwise given
+default_priority = 50
+
+# The modules implementing declared formats, keyed by extension
+_format_modules = {}
+
+# Functions completing the registries, run when first needed
+_deferred = []
+
+
+class LazyFunction(object):
+    """A function in a module that is only imported when the function is called.
+
+    Attributes
+    ----------
+    module : str
+        The full name of the module.
+    name : str
+        The name of the function in the module.
+    """
+
+    def __init__(self, module, name):
+        self.module = module
+        self.name = name
+        self._function = None
+
+    def __repr__(self):
+        return f"LazyFunction({self.module!r}, {self.name!r})"
+
+    def __call__(self, *args, **kwargs):
+        if self._function is None:
+            module = importlib.import_module(self.module)
+            self._function = getattr(module, self.name)
+        return self._function(*args, **kwargs)
+
+
+def _register(registry, extension, fn, description):
+    """Register a function for a format, keeping any description already given."""
+    if description == "" and extension in registry:
+        description = registry[extension]["description"]
+    registry[extension] = {"function": fn, "description": description}
+
 
 def register_reader(file_format):
 
@@ -50,7 +144,37 @@ def register_reader(file_format):
 
     def decorator_function(fn):
 
-        REGISTERED_READERS[extension] = {"function": fn, "description": description}
+        _register(REGISTERED_READERS, extension, fn, description)
+
+        def wrapper_function(*args, **kwargs):
+            return fn(*args, **kwargs)
+
+        return wrapper_function
+
+    return decorator_function
+
+
+def register_streaming_reader(file_format):
+    """A decorator for registering readers that stream structure records.
+
+    The reader is a generator taking the path and keyword arguments like those of
+    the normal readers, and yielding the number of each structure in the file,
+    counting from 1, and its structure record.
+    """
+    tmp = file_format.split()
+    extension = tmp[0]
+    if extension[0] != ".":
+        extension = "." + extension
+    if len(tmp) == 1:
+        description = ""
+    else:
+        if tmp[1] == "--":
+            description = " ".join(tmp[2:])
+        else:
+            description = " ".join(tmp[1:])
+
+    def decorator_function(fn):
+        _register(REGISTERED_STREAMING_READERS, extension, fn, description)
 
         def wrapper_function(*args, **kwargs):
             return fn(*args, **kwargs)
@@ -75,7 +199,7 @@ def register_writer(file_format):
             description = " ".join(tmp[1:])
 
     def decorator_function(fn):
-        REGISTERED_WRITERS[extension] = {"function": fn, "description": description}
+        _register(REGISTERED_WRITERS, extension, fn, description)
 
         def wrapper_function(*args, **kwargs):
             return fn(*args, **kwargs)
@@ -85,10 +209,26 @@ def register_writer(file_format):
     return decorator_function
 
 
-def register_format_checker(file_format):
+def register_format_checker(file_format, priority=None):
+    """A decorator for registering format checkers.
+
+    Parameters
+    ----------
+    file_format : str
+        The extension for the format, including the dot.
+    priority : int = None
+        The checkers with higher priority are run first, so specific formats should
+        have a higher priority than formats that accept almost anything. By default
+        the priority declared for the format, or 50.
+    """
+
     def decorator_function(fn):
 
         REGISTERED_FORMAT_CHECKERS[file_format] = fn
+        if priority is None:
+            FORMAT_CHECKER_PRIORITIES.setdefault(file_format, default_priority)
+        else:
+            FORMAT_CHECKER_PRIORITIES[file_format] = priority
 
         def wrapper_function(*args, **kwargs):
             return fn(*args, **kwargs)
@@ -111,6 +251,9 @@ def get_format_metadata(extension):
     dict(str, any)
         The metadata as a dictionary.
     """
+    if extension not in FORMAT_METADATA and extension in _format_modules:
+        # The metadata is set when the module is imported.
+        importlib.import_module(_format_modules[extension])
     if extension in FORMAT_METADATA:
         return {**FORMAT_METADATA[extension]}
     else:
@@ -197,15 +340,17 @@ def last_resort_writer(formats, fn):
             REGISTERED_WRITERS[extension] = {"function": fn, "description": description}
 
 
-def last_resort_checker(format, fn):
-    """Sets the reader for a list of formats if there is no reader registered.
+def last_resort_checker(format, fn, priority=50):
+    """Sets the checker for a format if there is no checker registered.
 
     Parameters
     ----------
     format : str
         File extension indicating format, e.g. '.pdb'
     fn : function
-        The function that checks the file
+        The function that checks a sample of the file
+    priority : int = 50
+        The checkers with higher priority are run first.
     """
     tmp = format.split()
     extension = tmp[0]
@@ -214,3 +359,160 @@ def last_resort_checker(format, fn):
 
     if extension not in REGISTERED_FORMAT_CHECKERS:
         REGISTERED_FORMAT_CHECKERS[extension] = fn
+        FORMAT_CHECKER_PRIORITIES[extension] = priority
+
+
+def declare_format(
+    extensions,
+    module,
+    reader=None,
+    streaming_reader=None,
+    writer=None,
+    checker=None,
+    priority=50,
+    description="",
+):
+    """Declare a format implemented in a module that is imported when first used.
+
+    Formats that are already registered are not replaced.
+
+    Parameters
+    ----------
+    extensions : str or [str]
+        The extension(s) for the format, including the dot.
+    module : str
+        The full name of the module implementing the format.
+    reader : str = None
+        The name of the reader function in the module, if any.
+    streaming_reader : str = None
+        The name of the streaming reader, if any.
+    writer : str = None
+        The name of the writer, if any.
+    checker : str = None
+        The name of the format checker, if any.
+    priority : int = 50
+        The priority of the format checker.
+    description : str = ""
+        The readable name for the format.
+    """
+    if isinstance(extensions, str):
+        extensions = [extensions]
+
+    for extension in extensions:
+        if extension[0] != ".":
+            extension = "." + extension
+        _format_modules.setdefault(extension, module)
+        for registry, name in (
+            (REGISTERED_READERS, reader),
+            (REGISTERED_STREAMING_READERS, streaming_reader),
+            (REGISTERED_WRITERS, writer),
+        ):
+            if name is not None and extension not in registry:
+                registry[extension] = {
+                    "function": LazyFunction(module, name),
+                    "description": description,
+                }
+        if checker is not None and extension not in REGISTERED_FORMAT_CHECKERS:
+            REGISTERED_FORMAT_CHECKERS[extension] = LazyFunction(module, checker)
+            FORMAT_CHECKER_PRIORITIES[extension] = priority
+
+
+def defer(fn):
+    """Add a function completing the registries, run when first needed.
+
+    Parameters
+    ----------
+    fn : function
+        The function, which is called without arguments.
+    """
+    _deferred.append(fn)
+
+
+def load_deferred():
+    """Complete the registries, loading the formats from entry points and any
+    other deferred formats, such as those handled by Open Babel."""
+    while len(_deferred) > 0:
+        _deferred.pop(0)()
+
+
+def _load_entry_points():
+    """Declare the formats given by other packages through entry points."""
+    from importlib.metadata import entry_points
+
+    try:
+        points = entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:
+        # Python < 3.10
+        points = entry_points().get(ENTRY_POINT_GROUP, [])
+
+    for point in points:
+        try:
+            descriptors = point.load()
+        except Exception as e:
+            logger.warning(f"Could not load the file formats from {point.value}: {e}")
+            continue
+        if isinstance(descriptors, dict):
+            descriptors = [descriptors]
+        for descriptor in descriptors:
+            declare_format(**descriptor)
+
+
+defer(_load_entry_points)
+
+
+def _lookup(registry, extension):
+    """Find a format in a registry, completing the registries if needed."""
+    if extension not in registry:
+        load_deferred()
+    return registry.get(extension)
+
+
+def get_reader(extension):
+    """The registry entry for the reader for a format.
+
+    Parameters
+    ----------
+    extension : str
+        The file format extension, including dot.
+
+    Returns
+    -------
+    dict(str, any) or None
+        The entry, with the function and description, or None if the format cannot
+        be read.
+    """
+    return _lookup(REGISTERED_READERS, extension)
+
+
+def get_streaming_reader(extension):
+    """The registry entry for the streaming reader for a format.
+
+    Parameters
+    ----------
+    extension : str
+        The file format extension, including dot.
+
+    Returns
+    -------
+    dict(str, any) or None
+        The entry, with the function and description, or None if there is no
+        streaming reader for the format.
+    """
+    return _lookup(REGISTERED_STREAMING_READERS, extension)
+
+
+def get_writer(extension):
+    """The registry entry for the writer for a format.
+
+    Parameters
+    ----------
+    extension : str
+        The file format extension, including dot.
+
+    Returns
+    -------
+    dict(str, any) or None
+        The entry, with the function and description, or None if the format cannot
+        be written.
+    """
+    return _lookup(REGISTERED_WRITERS, extension)
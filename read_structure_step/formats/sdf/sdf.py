@@ -2,22 +2,39 @@
 Implementation of the reader for SDF files using OpenBabel
 """
 
-import gzip
+import functools
+import logging
 from pathlib import Path
-import shutil
-import string
-import subprocess
 import time
 
 from openbabel import openbabel
 
+from ..compression import open_file
+from ..indices import parse_indices
+from ..openbabel_io.citations import cite_openbabel
+from ..parallel import n_workers_to_use
+from ..parallel import ordered_map
+from ..progress import open_tracked
+from ..progress import Progress
+from ..record_index import RecordIndex
+from ..record_index import split_records
 from ..registries import register_format_checker
 from ..registries import register_reader
+from ..registries import register_streaming_reader
 from ..registries import register_writer
 from ..registries import set_format_metadata
+from ..sources import as_source
+from ..sources import is_path
+from ..sources import source_size
+from ..structure_record import name_structure
+from ..structure_record import record_from_OBMol
+from ..structure_record import record_to_configuration
+from .v2000 import parse_v2000
 
-if "OpenBabel_version" not in globals():
-    OpenBabel_version = None
+logger = logging.getLogger(__name__)
+
+# The Open Babel converter for worker processes
+_obConversion = None
 
 set_format_metadata(
     [".sd", ".sdf"],
@@ -32,27 +49,248 @@ set_format_metadata(
 
 
 @register_format_checker(".sdf")
-def check_format(path):
+def check_format(sample):
     """Check if a file is an MDL SDFile.
 
-    Check if the last line is "$$$$", which is the terminator for a molecule in SDFiles.
+    Check for the counts line of the first record, and whether the last line is
+    "$$$$", which is the terminator for a molecule in SDFiles.
+
+    Parameters
+    ----------
+    sample : Sample
+        The beginning and end of the file.
+
+    Returns
+    -------
+    float
+        The confidence that the file is an SDFile.
+    """
+    lines = sample.lines
+    has_counts = len(lines) > 3 and lines[3][34:39].strip() in ("V2000", "V3000")
+    tail_lines = [line.strip() for line in sample.tail_lines if line.strip() != ""]
+    terminated = len(tail_lines) > 0 and tail_lines[-1] == "$$$$"
+    if has_counts and terminated:
+        return 1.0
+    if terminated or (has_counts and "$$$$" in sample.head):
+        return 0.9
+    if has_counts:
+        # Could be a MOL file, which Open Babel reads as SDF
+        return 0.7
+    return 0.0
+
+
+def _parse_record(item, add_hydrogens=True, native=True):
+    """Parse an SDF record into a structure record.
+
+    This is used both in worker processes and, when reading serially, in the main
+    process.
+
+    Parameters
+    ----------
+    item : (int, bytes)
+        The number of the record in the file and its text.
+    add_hydrogens : bool = True
+        Whether to add any missing hydrogen atoms.
+    native : bool = True
+        Whether to try the native V2000 parser before Open Babel.
+
+    Returns
+    -------
+    dict
+        The structure record, or a dictionary with the "error" if the record could
+        not be parsed.
+    """
+    global _obConversion
+
+    if native:
+        structure = parse_v2000(item[1])
+        if structure is not None:
+            return structure
+
+    if _obConversion is None:
+        _obConversion = openbabel.OBConversion()
+        _obConversion.SetInFormat("sdf")
+
+    try:
+        obMol = openbabel.OBMol()
+        _obConversion.ReadString(obMol, item[1].decode("utf-8", errors="replace"))
+        if add_hydrogens:
+            obMol.AddHydrogens()
+        return record_from_OBMol(obMol)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def _get_index(path, selection, opener=open_file):
+    """Get the record index for an SDF file if there is a current one.
+
+    If the number of structures is needed up front to handle the indices, the index
+    is built if necessary. Otherwise it is built while reading the file, so that the
+    next read can use it.
 
     Parameters
     ----------
-    path : str or Path
+    path : Path
+        The path to the SDF file.
+    selection : Selection
+        The selected structures, which is given the number of structures if known.
+    opener : function = open_file
+        Function to open the file, handling any compression.
+
+    Returns
+    -------
+    RecordIndex or None
+        The index, or None if there is no current index.
     """
-    last = ""
-    with open(path, "r") as fd:
-        for line in fd:
-            line = line.strip()
-            if line != "":
-                last = line
+    index = RecordIndex.load(path)
+    if index is None and selection.needs_count:
+        index = RecordIndex.get(path, opener=opener)
+    if index is not None:
+        selection.n_structures = len(index)
+    return index
+
+
+def _read_records(
+    path,
+    selection,
+    index=None,
+    add_hydrogens=True,
+    n_workers=1,
+    native=True,
+    progress=None,
+):
+    """Read and parse the selected records in an SDF file.
+
+    If there is no index, one is created and saved once the whole file has been
+    read.
+
+    Parameters
+    ----------
+    path : Path
+        The path to the SDF file.
+    selection : Selection
+        The selected structures.
+    index : RecordIndex = None
+        The index of the records, if available.
+    add_hydrogens : bool = True
+        Whether to add any missing hydrogen atoms.
+    n_workers : int = 1
+        The number of worker processes parsing the records.
+    native : bool = True
+        Whether to try the native V2000 parser before Open Babel.
+    progress : Progress = None
+        The progress reporter, which is given the position in the file.
+
+    Yields
+    ------
+    (int, bytes, dict)
+        The number of the record, counting from 1, its text, and the structure
+        record, which contains the "error" if the record could not be parsed.
+    """
+    # Indices are only saved for files, which are checked by their size and time.
+    stat = path.stat() if is_path(path) else None
+    size = source_size(path) if stat is None else stat.st_size
+    offsets = [0]
+    parse = functools.partial(_parse_record, add_hydrogens=add_hydrogens, native=native)
+    # The file can be decompressed in parallel if it is read sequentially.
+    threads = n_workers if index is None or selection.is_all else 1
+    fd, raw = open_tracked(path, threads=threads)
+    if progress is not None:
+        progress.tell = raw.tell
+        progress.size = size
+    with fd, raw:
+        if index is None:
+            records = enumerate(split_records(fd, b"$$$$", offsets), start=1)
+        else:
+            wanted = None
+            if not selection.is_all:
+                wanted = [structure - 1 for structure in selection.selected()]
+            records = ((i + 1, record) for i, record in index.records(fd, wanted))
+
+        # Skip unselected records before doing any real work
+        selected = (item for item in records if item[0] in selection)
+
+        # Parse the records in worker processes if requested, otherwise here.
+        if n_workers > 1:
+            parsed = ordered_map(parse, selected, n_workers)
+        else:
+            parsed = ((item, parse(item)) for item in selected)
+
+        for (record_no, record), structure in parsed:
+            yield record_no, record, structure
+
+    if index is None and stat is not None:
+        index = RecordIndex(offsets, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        if index.is_worth_saving():
+            index.save(path)
+
+
+@register_streaming_reader(".sd")
+@register_streaming_reader(".sdf")
+def iter_sdf(
+    path,
+    extension=".sdf",
+    add_hydrogens=True,
+    indices="1:end",
+    n_workers=1,
+    native=True,
+    **kwargs,
+):
+    """Iterate over the structures in an MDL structure-data (SDF) file.
+
+    Records that cannot be parsed are logged and skipped.
+
+    Parameters
+    ----------
+    path : str or Path or bytes or file-like object
+        The path to the file, as either a string or Path, or its contents or an open
+        stream (see sources.py).
+
+    extension : str, optional, default: None
+        The extension, including initial dot, defining the format.
 
-    return last == "$$$$"
+    add_hydrogens : bool = True
+        Whether to add any missing hydrogen atoms.
+
+    indices : str = "1:end"
+        The generalized indices (slices, SMARTS, etc.) to select structures
+        from a file containing multiple structures.
+
+    n_workers : int = 1
+        The number of worker processes parsing the structures. 0 or None use all the
+        cores.
 
+    native : bool = True
+        Whether to use the native parser for simple V2000 records.
 
-@register_reader(".sd -- MDL structure-data file")
-@register_reader(".sdf -- MDL structure-data file")
+    Yields
+    ------
+    (int, dict)
+        The number of the structure in the file, counting from 1, and the structure
+        record (see structure_record.py).
+    """
+    path = as_source(path)
+
+    selection = parse_indices(indices)
+    index = _get_index(path, selection)
+    for record_no, record, structure in _read_records(
+        path,
+        selection,
+        index=index,
+        add_hydrogens=add_hydrogens,
+        n_workers=n_workers_to_use(n_workers),
+        native=native,
+    ):
+        if "error" in structure:
+            logger.warning(
+                f"Could not read entry {record_no} in {path}: {structure['error']}"
+            )
+            continue
+        yield record_no, structure
+
+
+@register_reader(".sd")
+@register_reader(".sdf")
 def load_sdf(
     path,
     configuration,
@@ -67,18 +305,27 @@ def load_sdf(
     printer=None,
     references=None,
     bibliography=None,
+    n_workers=1,
+    native=True,
+    bulk=None,
     **kwargs,
 ):
     """Read an MDL structure-data (SDF) file.
 
     See https://en.wikipedia.org/wiki/Chemical_table_file for a description of the
-    format. This function is using Open Babel to handle the file, so trusts that Open
-    Babel knows what it is doing.
+    format. Simple V2000 records are parsed directly (see v2000.py), which is much
+    faster. Any others are handled by Open Babel, trusting that Open Babel knows what
+    it is doing.
+
+    The byte offsets of the structures in large files are saved in a sidecar index
+    file, e.g. "file.sdf.idx", the first time the file is read. Subsequent reads use
+    the index to find the structures directly as long as the file is unchanged.
 
     Parameters
     ----------
-    file_name : str or Path
-        The path to the file, as either a string or Path.
+    file_name : str or Path or bytes or file-like object
+        The path to the file, as either a string or Path, or its contents or an open
+        stream (see sources.py).
 
     configuration : molsystem.Configuration
         The configuration to put the imported structure into.
@@ -120,193 +367,126 @@ def load_sdf(
     bibliography : dict
         The bibliography as a dictionary.
 
+    n_workers : int = 1
+        The number of worker processes parsing the structures. The configurations are
+        still created in the order of the file by this process. 0 or None use all the
+        cores.
+
+    native : bool = True
+        Whether to use the native parser for simple V2000 records. If False, Open
+        Babel is used for all the records.
+
+    bulk : BulkImport = None
+        Commits the structures to the database in batches. See
+        formats/transactions.py.
+
     Returns
     -------
     [Configuration]
         The list of configurations created.
     """
-    global OpenBabel_version
 
-    if isinstance(path, str):
-        path = Path(path)
+    path = as_source(path)
 
-    path.expanduser().resolve()
+    n_workers = n_workers_to_use(n_workers)
 
-    # Get the information for progress output, if requested.
-    compress = path.suffix == ".gz"
+    selection = parse_indices(indices)
+    index = _get_index(path, selection)
+
+    # Get the information for progress output, if requested. The exact number of
+    # structures is only known if there is an index; otherwise the progress is
+    # estimated from the position in the file.
+    progress = None
     if printer is not None:
-        n_structures = 0
-        with gzip.open(path, mode="rt") if compress else open(path, "r") as fd:
-            for line in fd:
-                if line[0:4] == "$$$$":
-                    n_structures += 1
         printer("")
-        printer(f"    The SDF file contains {n_structures} structures.")
-        last_percent = 0
-        t0 = time.time()
-        last_t = t0
-
-    obConversion = openbabel.OBConversion()
-    obConversion.SetInAndOutFormats("sdf", "smi")
+        if index is None:
+            n_structures = None
+            printer("    Indexing the structures in the SDF file while reading them.")
+        else:
+            n_structures = len(selection.selected())
+            printer(
+                f"    The SDF file contains {len(index)} structures, of which "
+                f"{n_structures} are selected."
+            )
+        progress = Progress(printer, n_structures=n_structures)
 
     configurations = []
     structure_no = 1
     n_errors = 0
-    obMol = openbabel.OBMol()
-    text = ""
-    with gzip.open(path, mode="rt") if compress else open(path, "r") as fd:
-        for line in fd:
-            text += line
-
-            if line[0:4] != "$$$$":
-                continue
-
-            obConversion.ReadString(obMol, text)
-
-            if add_hydrogens:
-                obMol.AddHydrogens()
-
-            if structure_no > 1:
-                if subsequent_as_configurations:
-                    configuration = system.create_configuration()
-                else:
-                    system = system_db.create_system()
-                    configuration = system.create_configuration()
+    for record_no, record, structure in _read_records(
+        path,
+        selection,
+        index=index,
+        add_hydrogens=add_hydrogens,
+        n_workers=n_workers,
+        native=native,
+        progress=progress,
+    ):
+        title = structure.get("title", "")
+
+        if structure_no > 1:
+            if subsequent_as_configurations:
+                configuration = system.create_configuration()
+            else:
+                system = system_db.create_system()
+                configuration = system.create_configuration()
 
-            structure_no += 1
-            try:
-                configuration.from_OBMol(obMol)
-            except Exception as e:
-                n_errors += 1
-                printer("")
-                printer(f"    Error handling entry {structure_no} in the SDF file:")
-                printer("        " + str(e))
-                printer("    Text of the entry is")
-                printer("    " + 60 * "-")
-                for line in text.splitlines():
-                    printer("    " + line)
-                printer("    " + 60 * "-")
-                printer("")
-                text = ""
+        structure_no += 1
+        try:
+            if "error" in structure:
+                raise RuntimeError(structure["error"])
+            else:
+                record_to_configuration(structure, configuration)
+        except Exception as e:
+            n_errors += 1
+            if printer is None:
+                logger.warning(f"Error handling entry {record_no} in the SDF file: {e}")
                 continue
+            text = record.decode("utf-8", errors="replace")
+            printer("")
+            printer(f"    Error handling entry {record_no} in the SDF file:")
+            printer("        " + str(e))
+            printer("    Text of the entry is")
+            printer("    " + 60 * "-")
+            for line in text.splitlines():
+                printer("    " + line)
+            printer("    " + 60 * "-")
+            printer("")
+            continue
+
+        configurations.append(configuration)
+
+        name_structure(
+            configuration,
+            title=title,
+            structure_no=record_no,
+            system_name=system_name,
+            configuration_name=configuration_name,
+        )
 
-            configurations.append(configuration)
-            text = ""
-
-            # Set the system name
-            if system_name is not None and system_name != "":
-                lower_name = system_name.lower()
-                if "from file" in lower_name:
-                    system.name = obMol.GetTitle()
-                elif "canonical smiles" in lower_name:
-                    system.name = configuration.canonical_smiles
-                elif "smiles" in lower_name:
-                    system.name = configuration.smiles
-                else:
-                    system.name = system_name
-
-            # And the configuration name
-            if configuration_name is not None and configuration_name != "":
-                lower_name = configuration_name.lower()
-                if "from file" in lower_name:
-                    configuration.name = obMol.GetTitle()
-                elif "canonical smiles" in lower_name:
-                    configuration.name = configuration.canonical_smiles
-                elif "smiles" in lower_name:
-                    configuration.name = configuration.smiles
-                elif lower_name == "sequential":
-                    configuration.name = str(structure_no)
-                else:
-                    configuration.name = configuration_name
-
-            if printer:
-                percent = int(100 * structure_no / n_structures)
-                if percent > last_percent:
-                    t1 = time.time()
-                    if t1 - last_t >= 60:
-                        t = int(t1 - t0)
-                        rate = structure_no / (t1 - t0)
-                        t_left = int((n_structures - structure_no) / rate)
-                        printer(
-                            f"\t{structure_no:6} ({percent}%) structures read in {t} "
-                            f"seconds. About {t_left} seconds remaining."
-                        )
-                        last_t = t1
-                        last_percent = percent
+        if progress is not None:
+            progress.update(structure_no - 1)
+        if bulk is not None:
+            bulk.added()
 
     if printer:
-        t1 = time.time()
-        rate = structure_no / (t1 - t0)
+        t = progress.elapsed
+        rate = structure_no / t
         printer(
-            f"    Read {structure_no - n_errors - 1} structures in {t1 - t0:.1f} "
+            f"    Read {structure_no - n_errors - 1} structures in {t:.1f} "
             f"seconds = {rate:.2f} per second"
         )
         if n_errors > 0:
             printer(f"    {n_errors} structures could not be read due to errors.")
 
     if references:
-        # Add the citations for Open Babel
-        references.cite(
-            raw=bibliography["openbabel"],
-            alias="openbabel_jcinf",
-            module="read_structure_step",
-            level=1,
-            note="The principle Open Babel citation.",
-        )
-
-        # See if we can get the version of obabel
-        if OpenBabel_version is None:
-            path = shutil.which("obabel")
-            if path is not None:
-                path = Path(path).expanduser().resolve()
-                try:
-                    result = subprocess.run(
-                        [str(path), "--version"],
-                        stdin=subprocess.DEVNULL,
-                        capture_output=True,
-                        text=True,
-                    )
-                except Exception:
-                    OpenBabel_version = "unknown"
-                else:
-                    OpenBabel_version = "unknown"
-                    lines = result.stdout.splitlines()
-                    for line in lines:
-                        line = line.strip()
-                        tmp = line.split()
-                        if len(tmp) == 9 and tmp[0] == "Open":
-                            OpenBabel_version = {
-                                "version": tmp[2],
-                                "month": tmp[4],
-                                "year": tmp[6],
-                            }
-                        break
-
-        if isinstance(OpenBabel_version, dict):
-            try:
-                template = string.Template(bibliography["obabel"])
-
-                citation = template.substitute(
-                    month=OpenBabel_version["month"],
-                    version=OpenBabel_version["version"],
-                    year=OpenBabel_version["year"],
-                )
-
-                references.cite(
-                    raw=citation,
-                    alias="obabel-exe",
-                    module="read_structure_step",
-                    level=1,
-                    note="The principle citation for the Open Babel executables.",
-                )
-            except Exception:
-                pass
+        cite_openbabel(references, bibliography)
 
     return configurations
 
 
-@register_writer(".sd -- MDL structure-data file")
-@register_writer(".sdf -- MDL structure-data file")
+@register_writer(".sd")
+@register_writer(".sdf")
 def write_sdf(
     path,
     configurations,
@@ -315,6 +495,7 @@ def write_sdf(
     printer=None,
     references=None,
     bibliography=None,
+    **kwargs,
 ):
     """Write an MDL structure-data (SDF) file.
 
@@ -345,7 +526,6 @@ def write_sdf(
     bibliography : dict
         The bibliography as a dictionary.
     """
-    global OpenBabel_version
 
     if isinstance(path, str):
         path = Path(path)
@@ -359,8 +539,7 @@ def write_sdf(
     last_percent = 0
     last_t = t0 = time.time()
     structure_no = 1
-    compress = path.suffix == ".gz"
-    with gzip.open(path, mode="wb") if compress else open(path, "w") as fd:
+    with open_file(path, "w") as fd:
         for configuration in configurations:
             obMol = configuration.to_OBMol(properties="all")
 
@@ -382,10 +561,7 @@ def write_sdf(
             if text is None or text == "":
                 raise RuntimeError("Error writing file")
 
-            if compress:
-                fd.write(bytes(text, "utf-8"))
-            else:
-                fd.write(text)
+            fd.write(text)
 
             structure_no += 1
             if printer:
@@ -412,61 +588,6 @@ def write_sdf(
         )
 
     if references:
-        # Add the citations for Open Babel
-        references.cite(
-            raw=bibliography["openbabel"],
-            alias="openbabel_jcinf",
-            module="read_structure_step",
-            level=1,
-            note="The principle Open Babel citation.",
-        )
-
-        # See if we can get the version of obabel
-        if OpenBabel_version is None:
-            path = shutil.which("obabel")
-            if path is not None:
-                path = Path(path).expanduser().resolve()
-                try:
-                    result = subprocess.run(
-                        [str(path), "--version"],
-                        stdin=subprocess.DEVNULL,
-                        capture_output=True,
-                        text=True,
-                    )
-                except Exception:
-                    OpenBabel_version = "unknown"
-                else:
-                    OpenBabel_version = "unknown"
-                    lines = result.stdout.splitlines()
-                    for line in lines:
-                        line = line.strip()
-                        tmp = line.split()
-                        if len(tmp) == 9 and tmp[0] == "Open":
-                            OpenBabel_version = {
-                                "version": tmp[2],
-                                "month": tmp[4],
-                                "year": tmp[6],
-                            }
-                        break
-
-        if isinstance(OpenBabel_version, dict):
-            try:
-                template = string.Template(bibliography["obabel"])
-
-                citation = template.substitute(
-                    month=OpenBabel_version["month"],
-                    version=OpenBabel_version["version"],
-                    year=OpenBabel_version["year"],
-                )
-
-                references.cite(
-                    raw=citation,
-                    alias="obabel-exe",
-                    module="read_structure_step",
-                    level=1,
-                    note="The principle citation for the Open Babel executables.",
-                )
-            except Exception:
-                pass
+        cite_openbabel(references, bibliography)
 
     return configurations
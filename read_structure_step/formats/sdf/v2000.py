@@ -0,0 +1,313 @@
+"""
+A native parser for MDL MOL/SDF records in the V2000 format.
+
+Most SDF files, e.g. from PubChem, ChEMBL or RDKit, contain simple V2000 records
+with explicit hydrogens, bond orders of 1, 2 or 3, and a few charges. Passing these
+through Open Babel costs much more than parsing the fixed columns of the atom and bond
+blocks directly, which is what this module does, producing the same structure record
+as Open Babel would (see structure_record.py).
+
+Records using anything beyond this, such as V3000, aromatic or query bonds, atom
+lists, radicals, or properties other than charges and isotopes, are not handled here:
+parse_v2000 returns None and the caller should fall back to Open Babel. The same is
+true if any atom is missing hydrogens according to the MDL valence model, since Open
+Babel is needed either to place the new atoms or to work out the spin multiplicity.
+
+Unlike Open Babel, the native parser does not add the results of its perception, such
+as the ring information ("SSSR" and "LSSR") and "OpenBabel Symmetry Classes", to the
+property data.
+
+See https://en.wikipedia.org/wiki/Chemical_table_file for a description of the
+format.
+"""
+
+import numpy as np
+
+from molsystem.elements import symbol_to_atno
+
+# The widths of the lines in the atom and bond blocks, to which lines are padded or
+# truncated.
+_atom_width = 69
+_bond_width = 21
+
+# The formal charges for the charge codes 0-7 in the atom block. Code 4 is a doublet
+# radical, which is handled by Open Babel.
+_charges = np.array([0, 3, 2, 1, 0, -1, -2, -3])
+_charge_codes = {0, 1, 2, 3, 5, 6, 7}
+
+# The bond types that are handled: single, double and triple bonds.
+_bond_orders = {1, 2, 3}
+
+# The atomic numbers of the element symbols
+_atnos = {symbol.encode(): atno for symbol, atno in symbol_to_atno.items()}
+
+# The "M  " property lines that are handled.
+_handled_properties = ("M  CHG", "M  ISO", "M  END")
+
+# The normal valences of the neutral elements in the MDL valence model, for deciding
+# whether any hydrogens are missing.
+_valences = {
+    1: (1,),
+    5: (3,),
+    6: (4,),
+    7: (3,),
+    8: (2,),
+    9: (1,),
+    14: (4,),
+    15: (3, 5),
+    16: (2, 4, 6),
+    17: (1, 3, 5, 7),
+    34: (2, 4, 6),
+    35: (1, 3, 5, 7),
+    53: (1, 3, 5, 7),
+}
+
+
+def _allowed_valences(max_valence=12):
+    """A lookup table of whether an atom may have a given valence.
+
+    Charged atoms behave like the isoelectronic neutral atoms, so e.g. N+ has a
+    valence of 4 like C.
+
+    Parameters
+    ----------
+    max_valence : int = 12
+        The largest valence in the table, which is never allowed.
+
+    Returns
+    -------
+    numpy.ndarray
+        Boolean array indexed by the atomic number, the formal charge + 3 for charges
+        from -3 to 3, and the valence.
+    """
+    allowed = np.zeros((119, 7, max_valence + 1), dtype=bool)
+    for atno, valences in _valences.items():
+        for charge in range(-3, 4):
+            for valence in valences:
+                if atno in (1, 6, 14):
+                    valence -= abs(charge)
+                elif atno == 5:
+                    valence -= charge
+                else:
+                    valence += charge
+                if 0 <= valence < max_valence:
+                    allowed[atno, charge + 3, valence] = True
+    return allowed
+
+
+_max_valence = 12
+_allowed = _allowed_valences(_max_valence)
+
+
+def _columns(table, start, stop, n=1):
+    """Adjacent columns of equal width in a fixed-width table as byte strings.
+
+    Parameters
+    ----------
+    table : numpy.ndarray
+        The table as a 2-D array of single bytes.
+    start : int
+        The first character of the first column.
+    stop : int
+        One past the last character of the last column.
+    n : int = 1
+        The number of columns.
+
+    Returns
+    -------
+    numpy.ndarray
+        The fields, with one row per line and n columns, or a 1-D array if n is 1.
+    """
+    fields = table[:, start:stop].copy().view(f"S{(stop - start) // n}")
+    return fields[:, 0] if n == 1 else fields
+
+
+def _integers(fields):
+    """Convert fixed-width fields to integers, treating blank fields as 0."""
+    try:
+        return fields.astype(np.int64)
+    except ValueError:
+        # Some of the fields are blank
+        fields = np.char.strip(fields)
+        return np.where(fields == b"", b"0", fields).astype(np.int64)
+
+
+def _table(lines, width):
+    """Pack lines into a 2-D array of bytes, padding or truncating to the width.
+
+    Short lines are padded with zeros, since the columns that are often missing at
+    the ends of the lines are integers with a default of 0.
+    """
+    text = b"".join(line[:width].ljust(width, b"0") for line in lines)
+    return np.frombuffer(text, dtype="S1").reshape(len(lines), width)
+
+
+def _is_saturated(atnos, formal_charges, bonds):
+    """Whether no atom is missing hydrogens according to the MDL valence model.
+
+    Parameters
+    ----------
+    atnos : numpy.ndarray
+        The atomic numbers of the atoms.
+    formal_charges : numpy.ndarray
+        The formal charges of the atoms.
+    bonds : numpy.ndarray
+        The bonds as rows of the two atoms, counting from 1, and the bond order.
+
+    Returns
+    -------
+    bool
+        True if the valence of every atom is one of its normal valences.
+    """
+    if np.abs(formal_charges).max() > 3:
+        return False
+    n_atoms = len(atnos)
+    if len(bonds) > 0:
+        valences = np.bincount(
+            bonds[:, 0:2].ravel(), weights=bonds[:, 2].repeat(2), minlength=n_atoms + 1
+        )[1:].astype(np.int64)
+        np.minimum(valences, _max_valence, out=valences)
+    else:
+        valences = np.zeros(n_atoms, dtype=np.int64)
+    return bool(_allowed[atnos, formal_charges + 3, valences].all())
+
+
+def parse_v2000(text):
+    """Parse a V2000 MOL or SDF record into a structure record.
+
+    Parameters
+    ----------
+    text : bytes
+        The text of the record, optionally including the data items and the "$$$$"
+        terminator.
+
+    Returns
+    -------
+    dict or None
+        The structure record, or None if the record uses features that are not
+        handled, so should be read with Open Babel.
+    """
+    if b"\r" in text:
+        text = text.replace(b"\r\n", b"\n")
+    lines = text.split(b"\n")
+    if len(lines) < 4:
+        return None
+
+    counts = lines[3]
+    if counts[34:39].strip() != b"V2000":
+        return None
+    try:
+        n_atoms = int(counts[0:3])
+        n_bonds = int(counts[3:6])
+        chiral = int(counts[12:15] or b"0")
+    except ValueError:
+        return None
+    if n_atoms == 0:
+        return None
+    first_bond = 4 + n_atoms
+    first_property = first_bond + n_bonds
+    if len(lines) < first_property:
+        return None
+
+    # The atom block
+    try:
+        table = _table(lines[4:first_bond], _atom_width)
+        coordinates = _columns(table, 0, 30, 3).astype(np.float64)
+        symbols = _columns(table, 31, 34).tolist()
+        # The charge, stereo parity, hydrogen count, stereo care box and valence
+        fields = _integers(_columns(table, 36, 51, 5))
+    except ValueError:
+        return None
+    try:
+        atnos = np.array([_atnos[symbol.strip()] for symbol in symbols])
+    except KeyError:
+        return None
+    charge_codes = fields[:, 0]
+    if not set(charge_codes.tolist()) <= _charge_codes:
+        return None
+    # Hydrogen counts and valences are query and override features
+    if fields[:, 2::2].any():
+        return None
+    formal_charges = _charges[charge_codes]
+
+    # The bond block
+    if n_bonds > 0:
+        try:
+            table = _table(lines[first_bond:first_property], _bond_width)
+            # The atoms, type, stereo and topology
+            fields = _integers(_columns(table, 0, 15, 5))
+        except ValueError:
+            return None
+        bonds = fields[:, 0:3]
+        if not set(bonds[:, 2].tolist()) <= _bond_orders or fields[:, 4].any():
+            return None
+        if bonds[:, 0:2].min() < 1 or bonds[:, 0:2].max() > n_atoms:
+            return None
+    else:
+        bonds = np.zeros((0, 3), dtype=np.int64)
+
+    # The properties block. Any charges given here replace those in the atom block.
+    n_lines = len(lines)
+    line_no = first_property
+    charges_reset = False
+    while line_no < n_lines:
+        line = lines[line_no].decode("utf-8", errors="replace").rstrip()
+        line_no += 1
+        if line.startswith("M  END"):
+            break
+        if not line.startswith(_handled_properties):
+            return None
+        if line.startswith("M  CHG"):
+            if not charges_reset:
+                formal_charges[:] = 0
+                charges_reset = True
+            try:
+                fields = [int(field) for field in line[6:].split()]
+            except ValueError:
+                return None
+            if len(fields) != 2 * fields[0] + 1:
+                return None
+            for atom, charge in zip(fields[1::2], fields[2::2]):
+                if atom < 1 or atom > n_atoms:
+                    return None
+                formal_charges[atom - 1] = charge
+    else:
+        # No "M  END" line
+        return None
+
+    if not _is_saturated(atnos, formal_charges, bonds):
+        return None
+
+    # The data items, which follow the "M  END" line
+    data = {"MOL Chiral Flag": str(chiral)}
+    key = None
+    values = []
+    for line in lines[line_no:]:
+        line = line.decode("utf-8", errors="replace").rstrip()
+        if line.startswith("$$$$"):
+            break
+        if key is None:
+            if line.startswith(">"):
+                start = line.find("<")
+                stop = line.rfind(">")
+                if start > 0 and stop > start:
+                    key = line[start + 1 : stop]
+                    values = []
+        elif line == "":
+            data[key] = "\n".join(values)
+            key = None
+        else:
+            values.append(line)
+    if key is not None:
+        data[key] = "\n".join(values)
+
+    return {
+        "title": lines[0].decode("utf-8", errors="replace").strip(),
+        "atnos": atnos.tolist(),
+        "coordinates": coordinates.tolist(),
+        "formal_charges": formal_charges.tolist(),
+        "bonds": [tuple(bond) for bond in bonds.tolist()],
+        "charge": int(formal_charges.sum()),
+        "multiplicity": 1,
+        "data": data,
+    }
@@ -0,0 +1,215 @@
+"""
+A persistent cache of the 3-D structures built from SMILES.
+
+Building 3-D coordinates is by far the slowest part of reading a SMILES file, and the
+same libraries are often read again and again. The cache is a small SQLite database
+mapping the canonical SMILES, together with the settings of the builder, to the
+structure record (see structure_record.py) that was built, so later reads skip the
+builder. The least recently used structures are removed once the cache holds more
+than a set number of structures.
+
+So that a cached structure fits any SMILES for the same molecule, the structures
+are built from the canonical SMILES, and their atoms are in its order.
+
+Each process opens its own connection, so the cache can be used from worker
+processes. So that reading structures from the cache does not mean a write for each,
+the times that structures were last used are kept in memory and written in batches,
+before adding structures and when the cache is closed.
+"""
+
+import json
+import logging
+from pathlib import Path
+import sqlite3
+import time
+
+from ..openbabel_io.citations import openbabel_version
+
+logger = logging.getLogger(__name__)
+
+# The default cache, in the SEAMM data directory
+default_path = (
+    Path.home() / ".seamm.d" / "data" / "read_structure_step" / "smiles_geometry.db"
+)
+
+# The default maximum number of structures in the cache
+default_max_entries = 1000000
+
+# The default number of uses of structures kept before writing their times
+default_flush_interval = 100
+
+
+def cache_file(geometry_cache):
+    """The path to the cache file for the geometry_cache option of the readers.
+
+    Parameters
+    ----------
+    geometry_cache : bool or str or Path or None
+        True for the default cache, a path to a cache file, or False or None for no
+        cache.
+
+    Returns
+    -------
+    str or None
+        The path to the cache file, or None if not caching.
+    """
+    if geometry_cache is None or geometry_cache is False:
+        return None
+    if geometry_cache is True:
+        return str(default_path)
+    return str(Path(geometry_cache).expanduser())
+
+
+class GeometryCache(object):
+    """An on-disk cache of structures built from SMILES, with LRU eviction.
+
+    Attributes
+    ----------
+    path : str
+        The path to the SQLite file.
+    max_entries : int
+        The maximum number of structures to keep.
+    n_hits : int
+        The number of structures found in the cache.
+    n_misses : int
+        The number of structures not found in the cache.
+    flush_interval : int
+        The number of uses of structures kept before writing their times.
+    """
+
+    def __init__(self, path=None, max_entries=None, flush_interval=None):
+        self.path = str(default_path if path is None else path)
+        self.max_entries = default_max_entries if max_entries is None else max_entries
+        self.flush_interval = (
+            default_flush_interval if flush_interval is None else flush_interval
+        )
+        self.n_hits = 0
+        self.n_misses = 0
+        self._last_used = {}
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=30.0)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = normal")
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS geometry ("
+                "    key TEXT PRIMARY KEY,"
+                "    record TEXT NOT NULL,"
+                "    last_used INTEGER NOT NULL"
+                ")"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS geometry_last_used"
+                "    ON geometry (last_used)"
+            )
+        self._n_entries = len(self)
+
+    def __len__(self):
+        """The number of structures in the cache."""
+        return self._db.execute("SELECT COUNT(*) FROM geometry").fetchone()[0]
+
+    def close(self):
+        """Close the connection to the database."""
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+    @staticmethod
+    def key(canonical_smiles, add_hydrogens=True):
+        """The key for a structure: the canonical SMILES and the builder settings.
+
+        Parameters
+        ----------
+        canonical_smiles : str
+            The canonical SMILES of the molecule.
+        add_hydrogens : bool = True
+            Whether the hydrogen atoms were added.
+
+        Returns
+        -------
+        str
+        """
+        version = openbabel_version()["version"]
+        hydrogens = "H" if add_hydrogens else "-"
+        return f"{canonical_smiles}\t{hydrogens}\tOpenBabel {version}"
+
+    def get(self, key):
+        """The structure record for a key, or None if it is not in the cache.
+
+        Parameters
+        ----------
+        key : str
+            The key, from the key method.
+
+        Returns
+        -------
+        dict or None
+            The structure record, without a title.
+        """
+        row = self._db.execute(
+            "SELECT record FROM geometry WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.n_misses += 1
+            return None
+
+        self.n_hits += 1
+        self._last_used[key] = time.time_ns()
+        if len(self._last_used) >= self.flush_interval:
+            self.flush()
+        # JSON has no tuples, so restore them as in structure records.
+        record = json.loads(row[0])
+        for name in ("coordinates", "bonds"):
+            if name in record:
+                record[name] = [tuple(item) for item in record[name]]
+        return record
+
+    def put(self, key, record):
+        """Add a structure to the cache, evicting the least recently used if full.
+
+        Parameters
+        ----------
+        key : str
+            The key, from the key method.
+        record : dict
+            The structure record. The title is not stored.
+        """
+        record = {k: v for k, v in record.items() if k != "title"}
+        self.flush()
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO geometry (key, record, last_used)"
+                " VALUES (?, ?, ?)",
+                (key, json.dumps(record, separators=(",", ":")), time.time_ns()),
+            )
+        self._n_entries += 1
+        if self._n_entries > self.max_entries:
+            self.evict()
+
+    def flush(self):
+        """Write the times that structures were last used to the database."""
+        if len(self._last_used) > 0:
+            with self._db:
+                self._db.executemany(
+                    "UPDATE geometry SET last_used = ? WHERE key = ?",
+                    [(t, key) for key, t in self._last_used.items()],
+                )
+            self._last_used.clear()
+
+    def evict(self):
+        """Remove the least recently used structures beyond the maximum number."""
+        self.flush()
+        n = len(self)
+        if n > self.max_entries:
+            with self._db:
+                self._db.execute(
+                    "DELETE FROM geometry WHERE key IN ("
+                    "    SELECT key FROM geometry ORDER BY last_used LIMIT ?"
+                    ")",
+                    (n - self.max_entries,),
+                )
+            logger.debug(f"Removed {n - self.max_entries} structures from the cache")
+            n = self.max_entries
+        self._n_entries = n
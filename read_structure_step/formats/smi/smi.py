@@ -2,23 +2,55 @@
 Implementation of the reader for SMILES files using OpenBabel
 """
 
+import functools
+import json
 import logging
-from pathlib import Path
-import shutil
-import string
-import subprocess
-import time
+import multiprocessing.util
+import os
+import re
 
 from openbabel import openbabel
 
+from ..compression import open_file
+from ..indices import parse_indices
+from ..openbabel_io.citations import cite_openbabel
+from ..parallel import n_workers_to_use
+from ..parallel import ordered_map
+from ..progress import open_tracked
+from ..progress import Progress
 from ..registries import register_format_checker
 from ..registries import register_reader
+from ..registries import register_streaming_reader
+from ..registries import register_writer
 from ..registries import set_format_metadata
+from ..sources import as_source
+from ..sources import source_size
+from ..structure_record import coordinates_property
+from ..structure_record import name_structure
+from ..structure_record import record_from_configuration
+from ..structure_record import record_from_OBMol
+from ..structure_record import record_to_configuration
+from ..structure_record import record_to_OBMol
+from .geometry_cache import cache_file
+from .geometry_cache import GeometryCache
 
 logger = logging.getLogger("read_structure_step.read_structure")
 
-if "OpenBabel_version" not in globals():
-    OpenBabel_version = None
+# The Open Babel converters for worker processes
+_obConversion = None
+_canonical_conversion = None
+
+# The geometry caches opened, by process id and path. A forked worker inherits the
+# caches of its parent, but SQLite connections cannot be used across a fork, so each
+# process opens its own. The readers close the caches in this process when done, and
+# the workers close theirs as they exit, writing the times structures were used.
+_caches = {}
+
+# The ways of handling the coordinates
+coordinates_options = ("build", "none")
+
+# The characters in SMILES, which must contain at least one atom
+_smiles_re = re.compile(r"(?=.*[BCNOPSFIbcnops])[A-Za-z0-9@+\-\[\]()=#$%/\\.:*~]+")
 
 set_format_metadata(
     [".smi"],
@@ -33,31 +65,397 @@ set_format_metadata(
 
 
 @register_format_checker(".smi")
-def check_format(path):
+def check_format(sample):
     """Check if a file is file of SMILES strings.
 
+    Almost any word is a valid SMILES, so this only gives a modest confidence when
+    the first few structures look like SMILES and can be read by Open Babel.
+
     Parameters
     ----------
-    path : str or Path
+    sample : Sample
+        The beginning and end of the file.
+
+    Returns
+    -------
+    float
+        The confidence that the file contains SMILES.
     """
-    if isinstance(path, str):
-        path = Path(path)
+    lines = [line for line in sample.lines if _is_structure(line)][0:5]
+    if len(lines) == 0:
+        return 0.0
 
-    path.expanduser().resolve()
+    smiles = [line.split()[0] for line in lines]
+    if any(_smiles_re.fullmatch(text) is None for text in smiles):
+        return 0.0
 
     obConversion = openbabel.OBConversion()
-    obConversion.SetInAndOutFormats("smi", "mol")
+    obConversion.SetInFormat("smi")
+    # Not being SMILES is an answer, not an error, so don't print any errors.
+    openbabel.obErrorLog.StopLogging()
+    try:
+        for text in smiles:
+            obMol = openbabel.OBMol()
+            if not obConversion.ReadString(obMol, text) or obMol.NumAtoms() == 0:
+                return 0.0
+    finally:
+        openbabel.obErrorLog.StartLogging()
+    return 0.5
+
+
+def _is_structure(line):
+    """Whether a line in a SMILES file contains a structure.
+
+    Parameters
+    ----------
+    line : str
+        The line of the file.
+
+    Returns
+    -------
+    bool
+        False for comments and blank lines, True otherwise.
+    """
+    return line[0:1] != "#" and line.strip() != ""
+
+
+def _selected_lines(fd, selection):
+    """The selected SMILES in a file, skipping comments and blank lines.
+
+    Parameters
+    ----------
+    fd : file-like object
+        The open file.
+    selection : Selection
+        The selected structures.
+
+    Yields
+    ------
+    (int, str)
+        The number of the structure, counting from 1, and the line.
+    """
+    record_no = 0
+    for line in fd:
+        if not _is_structure(line):
+            continue
+        record_no += 1
+        if record_no in selection:
+            yield record_no, line
+        if selection.done(record_no):
+            break
+
+
+def _parse_smiles(obConversion, line, add_hydrogens=True, build=True):
+    """Create a 3-D molecule from a line of a SMILES file.
+
+    Parameters
+    ----------
+    obConversion : openbabel.OBConversion
+        The Open Babel converter, with SMILES as the input format.
+    line : str
+        The SMILES, optionally followed by the title.
+    add_hydrogens : bool = True
+        Whether to add any missing hydrogen atoms.
+    build : bool = True
+        Whether to build the 3-D coordinates. Otherwise they are all zero.
+
+    Returns
+    -------
+    openbabel.OBMol or None
+        The molecule, or None if the SMILES could not be read.
+    """
+    obMol = openbabel.OBMol()
+    if not obConversion.ReadString(obMol, line):
+        return None
+
+    if add_hydrogens:
+        obMol.AddHydrogens()
+
+    # Get coordinates for a 3-D structure
+    if build:
+        builder = openbabel.OBBuilder()
+        builder.Build(obMol)
+
+    logger.debug(
+        f"\tcharge={obMol.GetTotalCharge()} "
+        f"multiplicity={obMol.GetTotalSpinMultiplicity()}"
+    )
+    return obMol
+
+
+def _canonical_smiles(obMol):
+    """The canonical SMILES of a molecule, without its title."""
+    global _canonical_conversion
+
+    if _canonical_conversion is None:
+        _canonical_conversion = openbabel.OBConversion()
+        _canonical_conversion.SetOutFormat("can")
+        _canonical_conversion.AddOption("n", openbabel.OBConversion.OUTOPTIONS)
+    return _canonical_conversion.WriteString(obMol).strip()
+
+
+def _parse_cached(obConversion, line, cache, add_hydrogens=True):
+    """Get the 3-D structure record for a line from the cache, or build it.
+
+    Parameters
+    ----------
+    obConversion : openbabel.OBConversion
+        The Open Babel converter, with SMILES as the input format.
+    line : str
+        The SMILES, optionally followed by the title.
+    cache : GeometryCache
+        The cache of structures.
+    add_hydrogens : bool = True
+        Whether to add any missing hydrogen atoms.
+
+    Returns
+    -------
+    dict or None
+        The structure record, or None if the SMILES could not be read.
+    """
     obMol = openbabel.OBMol()
-    result = True
+    if not obConversion.ReadString(obMol, line):
+        return None
+    title = obMol.GetTitle()
+    canonical = _canonical_smiles(obMol)
+
+    key = cache.key(canonical, add_hydrogens=add_hydrogens)
+    record = cache.get(key)
+    if record is None:
+        obMol = _parse_smiles(obConversion, canonical, add_hydrogens=add_hydrogens)
+        if obMol is None:
+            return None
+        record = record_from_OBMol(obMol)
+        cache.put(key, record)
+    record["title"] = title
+    return record
+
+
+def _open_cache(geometry_cache):
+    """The connection of this process to a geometry cache, opening it if needed.
+
+    Parameters
+    ----------
+    geometry_cache : str
+        The path to the cache of 3-D structures.
+
+    Returns
+    -------
+    GeometryCache
+    """
+    key = (os.getpid(), geometry_cache)
+    if key not in _caches:
+        cache = _caches[key] = GeometryCache(geometry_cache)
+        # Worker processes exit without returning to the readers, so close the
+        # cache when the process exits. Closing it again is harmless.
+        multiprocessing.util.Finalize(None, cache.close, exitpriority=10)
+    return _caches[key]
+
+
+def _close_cache(geometry_cache):
+    """Close the connection of this process to a geometry cache, if open.
+
+    Parameters
+    ----------
+    geometry_cache : str or None
+        The path to the cache of 3-D structures, or None if not caching.
+    """
+    cache = _caches.pop((os.getpid(), geometry_cache), None)
+    if cache is not None:
+        cache.close()
+
+
+def _parse_line(item, add_hydrogens=True, geometry_cache=None, coordinates="build"):
+    """Build the 3-D structure record for a line of a SMILES file.
+
+    This is used both in worker processes and in the main process, so it keeps its
+    own Open Babel converter and connection to the cache.
+
+    Parameters
+    ----------
+    item : (int, str)
+        The number of the structure and the line.
+    add_hydrogens : bool = True
+        Whether to add any missing hydrogen atoms.
+    geometry_cache : str = None
+        The path to the cache of 3-D structures, or None to always build them.
+    coordinates : str = "build"
+        Whether to "build" the 3-D coordinates or not ("none"). Unless built, the
+        structure is flagged with the coordinates_property and the coordinates are
+        all zero.
+
+    Returns
+    -------
+    dict
+        The structure record (see structure_record.py), or a dict with the "error"
+        if the SMILES could not be read.
+    """
+    global _obConversion
+
+    if _obConversion is None:
+        _obConversion = openbabel.OBConversion()
+        _obConversion.SetInAndOutFormats("smi", "mol")
+
     try:
-        obConversion.ReadFile(obMol, str(path))
-    except BaseException():
-        result = False
+        if coordinates != "build":
+            obMol = _parse_smiles(
+                _obConversion, item[1], add_hydrogens=add_hydrogens, build=False
+            )
+            record = None if obMol is None else record_from_OBMol(obMol)
+            if record is not None:
+                record["data"][f"SEAMM|{coordinates_property}|str|"] = coordinates
+        elif geometry_cache is None:
+            obMol = _parse_smiles(_obConversion, item[1], add_hydrogens=add_hydrogens)
+            record = None if obMol is None else record_from_OBMol(obMol)
+        else:
+            record = _parse_cached(
+                _obConversion,
+                item[1],
+                _open_cache(geometry_cache),
+                add_hydrogens=add_hydrogens,
+            )
+    except Exception as e:
+        return {"error": str(e)}
+    if record is None:
+        return {"error": "the SMILES could not be read"}
+    return record
+
+
+def _read_structures(
+    fd,
+    selection,
+    add_hydrogens=True,
+    n_workers=1,
+    geometry_cache=None,
+    coordinates="build",
+):
+    """Build the structures for the selected SMILES in a file.
+
+    Building the 3-D coordinates takes far longer than reading the file, and each
+    molecule is independent, so with more than one worker the lines are sent to
+    worker processes, which return the structure records in the order of the file.
+
+    Parameters
+    ----------
+    fd : file-like object
+        The open file.
+    selection : Selection
+        The selected structures.
+    add_hydrogens : bool = True
+        Whether to add any missing hydrogen atoms.
+    n_workers : int = 1
+        The number of worker processes building the structures.
+    geometry_cache : str = None
+        The path to the cache of 3-D structures, or None to always build them.
+    coordinates : str = "build"
+        Whether to "build" the 3-D coordinates or not ("none"). Without building
+        them, reading is quick enough that worker processes do not help.
+
+    Yields
+    ------
+    (int, str, dict)
+        The number of the structure, counting from 1, the line, and the structure
+        record, which contains the "error" if the SMILES could not be read.
+    """
+    if coordinates not in coordinates_options:
+        raise ValueError(
+            f"The coordinates must be one of {', '.join(coordinates_options)}, not "
+            f"'{coordinates}'."
+        )
+    parse = functools.partial(
+        _parse_line,
+        add_hydrogens=add_hydrogens,
+        geometry_cache=geometry_cache,
+        coordinates=coordinates,
+    )
+    lines = _selected_lines(fd, selection)
+    if n_workers > 1 and coordinates == "build":
+        parsed = ordered_map(parse, lines, n_workers, chunksize=16)
+    else:
+        parsed = ((item, parse(item)) for item in lines)
+
+    for (record_no, line), structure in parsed:
+        yield record_no, line, structure
+
+
+@register_streaming_reader(".smi")
+def iter_smi(
+    path,
+    extension=".smi",
+    add_hydrogens=True,
+    indices="1:end",
+    n_workers=1,
+    geometry_cache=None,
+    coordinates="build",
+    **kwargs,
+):
+    """Iterate over the structures in a file of SMILES strings, one per line.
+
+    SMILES that cannot be read are logged and skipped.
+
+    Parameters
+    ----------
+    path : str or Path or bytes or file-like object
+        The path to the file, as either a string or Path, or its contents or an open
+        stream (see sources.py).
+
+    extension : str, optional, default: None
+        The extension, including initial dot, defining the format.
 
-    return result
+    add_hydrogens : bool = True
+        Whether to add any missing hydrogen atoms.
+
+    indices : str = "1:end"
+        The generalized indices (slices, SMARTS, etc.) to select structures
+        from a file containing multiple structures.
 
+    n_workers : int = 1
+        The number of worker processes building the 3-D structures. 0 or None use
+        all the cores.
+
+    geometry_cache : bool or str or Path = None
+        Whether to use the cache of 3-D structures (see geometry_cache.py): True
+        for the default cache in the SEAMM data directory, or the path to a cache
+        file. The structures are then built from the canonical SMILES.
+
+    coordinates : str = "build"
+        Whether to "build" the 3-D coordinates, or not build them at all ("none"),
+        which is much faster when only the connectivity is needed. Without them all
+        the atoms are at the origin.
+
+    Yields
+    ------
+    (int, dict)
+        The number of the structure in the file, counting from 1, and the structure
+        record (see structure_record.py).
+    """
+    path = as_source(path)
+
+    selection = parse_indices(indices)
+    if selection.needs_count:
+        with open_file(path, "r") as fd:
+            selection.n_structures = sum(1 for line in fd if _is_structure(line))
 
-@register_reader(".smi -- SMILES file")
+    geometry_cache = cache_file(geometry_cache)
+    try:
+        with open_file(path, "r") as fd:
+            for record_no, line, structure in _read_structures(
+                fd,
+                selection,
+                add_hydrogens=add_hydrogens,
+                n_workers=n_workers_to_use(n_workers),
+                geometry_cache=geometry_cache,
+                coordinates=coordinates,
+            ):
+                if "error" in structure:
+                    logger.warning(f"Could not read SMILES {record_no}: {line.strip()}")
+                    continue
+                yield record_no, structure
+    finally:
+        _close_cache(geometry_cache)
+
+
+@register_reader(".smi")
 def load_mol2(
     path,
     configuration,
@@ -72,14 +470,19 @@ def load_mol2(
     printer=None,
     references=None,
     bibliography=None,
+    n_workers=1,
+    geometry_cache=None,
+    coordinates="build",
+    bulk=None,
     **kwargs,
 ):
     """Read a file of SMILES strings, one per line
 
     Parameters
     ----------
-    file_name : str or Path
-        The path to the file, as either a string or Path.
+    file_name : str or Path or bytes or file-like object
+        The path to the file, as either a string or Path, or its contents or an open
+        stream (see sources.py).
 
     configuration : molsystem.Configuration
         The configuration to put the imported structure into.
@@ -121,176 +524,262 @@ def load_mol2(
     bibliography : dict
         The bibliography as a dictionary.
 
+    n_workers : int = 1
+        The number of worker processes building the 3-D structures. The
+        configurations are still created in the order of the file by this process.
+        0 or None use all the cores.
+
+    geometry_cache : bool or str or Path = None
+        Whether to use the cache of 3-D structures (see geometry_cache.py): True
+        for the default cache in the SEAMM data directory, or the path to a cache
+        file. The structures are then built from the canonical SMILES.
+
+    coordinates : str = "build"
+        Whether to "build" the 3-D coordinates, or not build them at all ("none"),
+        which is much faster when only the connectivity is needed. Without them all
+        the atoms are at the origin.
+
+    bulk : BulkImport = None
+        Commits the structures to the database in batches. See
+        formats/transactions.py.
+
     Returns
     -------
     [Configuration]
         The list of configurations created.
     """
-    global OpenBabel_version
 
-    if isinstance(path, str):
-        path = Path(path)
+    path = as_source(path)
 
-    path.expanduser().resolve()
+    selection = parse_indices(indices)
 
-    # Get the information for progress output, if requested.
-    if printer is not None:
-        n_structures = 0
-        with path.open() as fd:
-            for line in fd:
-                if line[0] != "#":
-                    n_structures += 1
-        printer(f"The SMILES file contains {n_structures} structures.")
-        last_percent = 0
-        t0 = time.time()
-        last_t = t0
+    # The structures are only counted if needed for the indices. Otherwise the
+    # progress is estimated from the position in the file.
+    n_structures = None
+    if selection.needs_count:
+        with open_file(path, "r") as fd:
+            selection.n_structures = sum(1 for line in fd if _is_structure(line))
+        n_structures = len(selection.selected())
 
-    obConversion = openbabel.OBConversion()
-    obConversion.SetInAndOutFormats("smi", "mol")
+    fd, raw = open_tracked(path, "r")
+    progress = None
+    if printer is not None:
+        if n_structures is None:
+            printer(f"Reading the SMILES file {path.name}.")
+        else:
+            printer(f"The SMILES file contains {n_structures} selected structures.")
+        progress = Progress(
+            printer, tell=raw.tell, size=source_size(path), n_structures=n_structures
+        )
 
     configurations = []
     structure_no = 1
-    while True:
-        if structure_no == 1:
-            obMol = openbabel.OBMol()
-            not_done = obConversion.ReadFile(obMol, str(path))
-        else:
-            obMol = openbabel.OBMol()
-            not_done = obConversion.Read(obMol)
+    geometry_cache = cache_file(geometry_cache)
+    try:
+        with fd, raw:
+            for record_no, line, structure in _read_structures(
+                fd,
+                selection,
+                add_hydrogens=add_hydrogens,
+                n_workers=n_workers_to_use(n_workers),
+                geometry_cache=geometry_cache,
+                coordinates=coordinates,
+            ):
+                if "error" in structure:
+                    logger.warning(f"Could not read SMILES {record_no}: {line.strip()}")
+                    continue
+
+                title = structure.get("title", "")
+                logger.debug(f" {structure_no}: {title}")
+
+                if structure_no > 1:
+                    if subsequent_as_configurations:
+                        configuration = system.create_configuration()
+                    else:
+                        system = system_db.create_system()
+                        configuration = system.create_configuration()
+
+                record_to_configuration(structure, configuration)
+                configurations.append(configuration)
+
+                name_structure(
+                    configuration,
+                    title=title,
+                    structure_no=record_no,
+                    system_name=system_name,
+                    configuration_name=configuration_name,
+                )
 
-        if not not_done:
-            break
+                structure_no += 1
+                if progress is not None:
+                    progress.update(structure_no - 1)
+                if bulk is not None:
+                    bulk.added()
+    finally:
+        _close_cache(geometry_cache)
 
-        logger.debug(f" {structure_no}: {obMol.GetTitle()}")
+    if printer:
+        t = progress.elapsed
+        rate = structure_no / t
+        printer(
+            f"Read {structure_no - 1} structures in {t:.1f} seconds = {rate:.2f} "
+            "per second"
+        )
 
-        if add_hydrogens:
-            obMol.AddHydrogens()
+    if references:
+        cite_openbabel(references, bibliography)
 
-        # Get coordinates for a 3-D structure
-        builder = openbabel.OBBuilder()
-        builder.Build(obMol)
+    return configurations
+
+
+def _smiles_row(item, remove_hydrogens="no"):
+    """The line of a SMILES file for a structure.
+
+    This runs in worker processes as well as the main process.
+
+    Parameters
+    ----------
+    item : (dict, [str])
+        The structure record and the values of the other columns.
+    remove_hydrogens : str = "no"
+        Whether to remove "nonpolar" or "all" hydrogen atoms first.
 
-        logger.debug(
-            f"\tcharge={obMol.GetTotalCharge()} "
-            f"multiplicity={obMol.GetTotalSpinMultiplicity()}"
+    Returns
+    -------
+    str
+        The canonical SMILES and the other columns, separated by tabs.
+    """
+    record, columns = item
+    obMol = record_to_OBMol(record)
+    if remove_hydrogens == "nonpolar":
+        obMol.DeleteNonPolarHydrogens()
+    elif remove_hydrogens == "all":
+        obMol.DeleteHydrogens()
+    return "\t".join([_canonical_smiles(obMol), *columns]) + "\n"
+
+
+def _columns(configuration, properties):
+    """The name and requested properties of a configuration, as text."""
+    system = configuration.system
+    columns = [f"{system.name}/{configuration.name}"]
+    for _property in properties or []:
+        values = configuration.properties.get(
+            _property, match="exact", include_system_properties=True
         )
+        value = values.get(_property, {}).get("value", "")
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, separators=(",", ":"))
+        columns.append(str(value).replace("\t", " ").replace("\n", " "))
+    return columns
 
-        if structure_no > 1:
-            if subsequent_as_configurations:
-                configuration = system.create_configuration()
-            else:
-                system = system_db.create_system()
-                configuration = system.create_configuration()
-
-        configuration.from_OBMol(obMol)
-        configurations.append(configuration)
-
-        # Set the system name
-        if system_name is not None and system_name != "":
-            lower_name = system_name.lower()
-            if "from file" in lower_name:
-                system.name = obMol.GetTitle()
-            elif "canonical smiles" in lower_name:
-                system.name = configuration.canonical_smiles
-            elif "smiles" in lower_name:
-                system.name = configuration.smiles
-            else:
-                system.name = system_name
-
-        # And the configuration name
-        if configuration_name is not None and configuration_name != "":
-            lower_name = configuration_name.lower()
-            if "from file" in lower_name:
-                configuration.name = obMol.GetTitle()
-            elif "canonical smiles" in lower_name:
-                configuration.name = configuration.canonical_smiles
-            elif "smiles" in lower_name:
-                configuration.name = configuration.smiles
-            elif lower_name == "sequential":
-                configuration.name = str(structure_no)
-            else:
-                configuration.name = configuration_name
-
-        structure_no += 1
-        if printer:
-            percent = int(100 * structure_no / n_structures)
-            if percent > last_percent:
-                t1 = time.time()
-                if t1 - last_t >= 60:
-                    t = int(t1 - t0)
-                    rate = structure_no / (t1 - t0)
-                    t_left = int((n_structures - structure_no) / rate)
-                    printer(
-                        f"\t{structure_no:6} ({percent}%) structures read in {t} "
-                        f"seconds. About {t_left} seconds remaining."
-                    )
-                    last_t = t1
-                    last_percent = percent
 
-    if printer:
-        t1 = time.time()
-        rate = structure_no / (t1 - t0)
+@register_writer(".smi")
+def write_smi(
+    path,
+    configurations,
+    extension=".smi",
+    remove_hydrogens="no",
+    printer=None,
+    references=None,
+    bibliography=None,
+    n_workers=1,
+    properties=None,
+    batch_size=1000,
+    **kwargs,
+):
+    """Write the canonical SMILES of configurations to a file, one per line.
+
+    Each line has the canonical SMILES followed by the name of the structure,
+    "<system name>/<configuration name>", and the values of any properties
+    requested, separated by tabs. If there are properties, a first comment line
+    names the columns.
+
+    Parameters
+    ----------
+    path : str or Path
+        The path to the file. A suffix such as ".gz" compresses the file.
+
+    configurations : [molsystem.Configuration]
+        The configurations to write, which may be a generator.
+
+    extension : str, optional, default: ".smi"
+        The extension, including initial dot, defining the format.
+
+    remove_hydrogens : str = "no"
+        Whether to remove "nonpolar" or "all" hydrogen atoms before writing.
+
+    printer : Logger or Printer
+        A function that prints to the appropriate place, used for progress.
+
+    references : ReferenceHandler = None
+        The reference handler object or None
+
+    bibliography : dict
+        The bibliography as a dictionary.
+
+    n_workers : int = 1
+        The number of worker processes creating the canonical SMILES. The lines are
+        still written in the order of the configurations. 0 or None use all the
+        cores.
+
+    properties : [str] = None
+        The names of properties to write as extra columns.
+
+    batch_size : int = 1000
+        The number of lines written to the file at a time.
+
+    Returns
+    -------
+    [Configuration]
+        The configurations written, if given as a list.
+    """
+    n_workers = n_workers_to_use(n_workers)
+    if isinstance(properties, str):
+        properties = [properties]
+
+    progress = None
+    if printer is not None:
+        n_structures = None
+        if hasattr(configurations, "__len__"):
+            n_structures = len(configurations)
+        progress = Progress(printer, n_structures=n_structures, action="written")
+
+    # Only the main process can use the database, so it extracts the structures and
+    # the columns, and the workers create the canonical SMILES.
+    items = (
+        (record_from_configuration(configuration), _columns(configuration, properties))
+        for configuration in configurations
+    )
+    row = functools.partial(_smiles_row, remove_hydrogens=remove_hydrogens)
+    if n_workers > 1:
+        rows = (line for _, line in ordered_map(row, items, n_workers, chunksize=256))
+    else:
+        rows = (row(item) for item in items)
+
+    structure_no = 0
+    with open_file(path, "w") as fd:
+        if properties:
+            fd.write("\t".join(["#SMILES", "name", *properties]) + "\n")
+        batch = []
+        for line in rows:
+            batch.append(line)
+            structure_no += 1
+            if len(batch) >= batch_size:
+                fd.write("".join(batch))
+                batch = []
+            if progress is not None:
+                progress.update(structure_no)
+        fd.write("".join(batch))
+
+    if printer is not None:
+        t = progress.elapsed
+        rate = structure_no / t if t > 0 else 0.0
         printer(
-            f"Read {structure_no} structures in {t1 - t0:.1f} seconds = {rate:.2f} "
+            f"Wrote {structure_no} structures in {t:.1f} seconds = {rate:.2f} "
             "per second"
         )
 
     if references:
-        # Add the citations for Open Babel
-        references.cite(
-            raw=bibliography["openbabel"],
-            alias="openbabel_jcinf",
-            module="read_structure_step",
-            level=1,
-            note="The principle Open Babel citation.",
-        )
-
-        # See if we can get the version of obabel
-        if OpenBabel_version is None:
-            path = shutil.which("obabel")
-            if path is not None:
-                path = Path(path).expanduser().resolve()
-                try:
-                    result = subprocess.run(
-                        [str(path), "--version"],
-                        stdin=subprocess.DEVNULL,
-                        capture_output=True,
-                        text=True,
-                    )
-                except Exception:
-                    OpenBabel_version = "unknown"
-                else:
-                    OpenBabel_version = "unknown"
-                    lines = result.stdout.splitlines()
-                    for line in lines:
-                        line = line.strip()
-                        tmp = line.split()
-                        if len(tmp) == 9 and tmp[0] == "Open":
-                            OpenBabel_version = {
-                                "version": tmp[2],
-                                "month": tmp[4],
-                                "year": tmp[6],
-                            }
-                        break
-
-        if isinstance(OpenBabel_version, dict):
-            try:
-                template = string.Template(bibliography["obabel"])
-
-                citation = template.substitute(
-                    month=OpenBabel_version["month"],
-                    version=OpenBabel_version["version"],
-                    year=OpenBabel_version["year"],
-                )
-
-                references.cite(
-                    raw=citation,
-                    alias="obabel-exe",
-                    module="read_structure_step",
-                    level=1,
-                    note="The principle citation for the Open Babel executables.",
-                )
-            except Exception:
-                pass
+        cite_openbabel(references, bibliography)
 
     return configurations
@@ -0,0 +1,172 @@
+"""
+Working out the format of a file from its contents.
+
+Reading a whole file, possibly several times, to decide what it is becomes very
+expensive for large files. Instead a bounded sample is read once -- the beginning of
+the file and, for uncompressed files, the end -- and given to all the format
+checkers. Each checker returns its confidence, from 0 to 1, that the sample is in
+its format, and the checkers are run in order of priority so that the specific
+formats are tried before the more permissive ones like SMILES.
+"""
+
+import os
+
+from .compression import detect_compression
+from .compression import open_file
+from .registries import default_priority
+from .registries import FORMAT_CHECKER_PRIORITIES
+from .registries import load_deferred
+from .registries import REGISTERED_FORMAT_CHECKERS
+from .sources import is_path
+
+# The default number of bytes read from the beginning and end of the file
+head_size = 64 * 1024
+tail_size = 4 * 1024
+
+
+class Sample(object):
+    """The beginning and end of a file, for working out its format.
+
+    Attributes
+    ----------
+    head : str
+        The text at the beginning of the file, ending with a complete line unless
+        the whole file has been read.
+    tail : str
+        The text at the end of the file, starting with a complete line. This is
+        empty if the file is compressed, and all of the file if it is complete.
+    complete : bool
+        Whether the sample is the whole file.
+    path : str or Path
+        The path to the file, if known.
+    """
+
+    def __init__(self, head, tail=None, complete=True, path=None):
+        self.head = head
+        self.tail = head if tail is None and complete else tail or ""
+        self.complete = complete
+        self.path = path
+        self._lines = None
+
+    @property
+    def lines(self):
+        """The lines at the beginning of the file."""
+        if self._lines is None:
+            self._lines = self.head.splitlines()
+        return self._lines
+
+    @property
+    def tail_lines(self):
+        """The lines at the end of the file."""
+        return self.tail.splitlines()
+
+
+def read_sample(path, head_size=head_size, tail_size=tail_size):
+    """Read the beginning and end of a file.
+
+    Parameters
+    ----------
+    path : str or Path or Stream
+        The path to the file, which may be compressed, or a stream.
+    head_size : int
+        The maximum number of bytes to read from the beginning of the file.
+    tail_size : int
+        The maximum number of bytes to read from the end, if the file is not
+        compressed or a stream.
+
+    Returns
+    -------
+    Sample
+        The sample of the file.
+    """
+    if is_path(path) and detect_compression(path) is None:
+        size = os.path.getsize(path)
+        with open(path, "rb") as fd:
+            head = fd.read(head_size)
+            complete = size <= head_size
+            if complete:
+                tail = head
+            else:
+                fd.seek(max(size - tail_size, head_size))
+                tail = fd.read()
+    else:
+        with open_file(path, "rb") as fd:
+            head = fd.read(head_size + 1)
+        complete = len(head) <= head_size
+        head = head[:head_size]
+        tail = head if complete else b""
+
+    if not complete:
+        # Only keep complete lines.
+        head = head[: head.rfind(b"\n") + 1]
+        tail = tail[tail.find(b"\n") + 1 :]
+
+    return Sample(
+        head.decode("utf-8", errors="replace"),
+        tail.decode("utf-8", errors="replace"),
+        complete=complete,
+        path=path,
+    )
+
+
+def score_formats(sample):
+    """The confidence that the sample is in each of the known formats.
+
+    The checkers are run in order of decreasing priority, stopping at the first that
+    is certain.
+
+    Parameters
+    ----------
+    sample : Sample
+        The sample of the file.
+
+    Returns
+    -------
+    [(str, float)]
+        The extension for each format and the confidence, from 0 to 1, in order of
+        decreasing priority.
+    """
+    load_deferred()
+    checkers = sorted(
+        REGISTERED_FORMAT_CHECKERS.items(),
+        key=lambda item: -FORMAT_CHECKER_PRIORITIES.get(item[0], default_priority),
+    )
+    result = []
+    for extension, checker in checkers:
+        confidence = float(checker(sample))
+        result.append((extension, confidence))
+        if confidence >= 1:
+            break
+    return result
+
+
+def sniff_format(path, head_size=head_size, tail_size=tail_size):
+    """Work out the format of a file from its contents.
+
+    Parameters
+    ----------
+    path : str or Path or Stream or Sample
+        The path to the file or a stream, or a sample already read.
+    head_size : int
+        The maximum number of bytes to read from the beginning of the file.
+    tail_size : int
+        The maximum number of bytes to read from the end of the file.
+
+    Returns
+    -------
+    str or None
+        The extension for the most likely format, including the dot, or None if
+        nothing matches. Ties go to the format with the higher priority.
+    """
+    if isinstance(path, Sample):
+        sample = path
+    else:
+        sample = read_sample(path, head_size=head_size, tail_size=tail_size)
+
+    best = None
+    best_confidence = 0.0
+    for extension, confidence in score_formats(sample):
+        if confidence > best_confidence:
+            best = extension
+            best_confidence = confidence
+    return best
@@ -0,0 +1,224 @@
+"""
+The sources that structures are read from: files, or data already in memory.
+
+The readers are normally given the path to a file, but can also be given the
+contents of a file as bytes, or an open binary or text stream, e.g. a member of a
+tar archive from TarFile.extractfile(), so that the data need not be written to a
+temporary file first. as_source() turns these into a Stream, which readers can open
+as many times as they need, e.g. to count the structures and then read them. Each
+time it is opened it is read from the position the stream was at when given to the
+reader. A stream that cannot seek, such as a pipe, can only be read once.
+
+A string is always taken to be the path to a file; to read text in memory, wrap it
+in a Stream or io.StringIO.
+"""
+
+import io
+import os
+from pathlib import Path
+from pathlib import PurePath
+
+
+def is_path(source):
+    """Whether a source is the path to a file, rather than data or a stream.
+
+    Parameters
+    ----------
+    source : str or Path or bytes or file-like object or Stream
+        The source of the structures.
+
+    Returns
+    -------
+    bool
+    """
+    return isinstance(source, (str, os.PathLike))
+
+
+def as_source(source, name=None):
+    """Put the source of structures into the form the readers use.
+
+    Parameters
+    ----------
+    source : str or Path or bytes or file-like object or Stream
+        The path to the file, its contents, or an open stream.
+    name : str = None
+        The name of the file for data or streams, used in messages and for names
+        taken from the file.
+
+    Returns
+    -------
+    Path or Stream
+        The path to the file, or the data or stream wrapped in a Stream.
+    """
+    if isinstance(source, Stream):
+        return source
+    if is_path(source):
+        return Path(source)
+    return Stream(source, name=name)
+
+
+def open_raw(source):
+    """Open the source of structures as an unbuffered binary stream.
+
+    Parameters
+    ----------
+    source : str or Path or Stream
+        The path to the file or the stream.
+
+    Returns
+    -------
+    binary file-like object
+        The stream, positioned at the beginning of the data. Closing it does not
+        close the stream given to a Stream.
+    """
+    if isinstance(source, Stream):
+        return source.open()
+    return open(source, "rb", buffering=0)
+
+
+def source_size(source):
+    """The size of the source in bytes, if known.
+
+    Parameters
+    ----------
+    source : str or Path or Stream
+        The path to the file or the stream.
+
+    Returns
+    -------
+    int or None
+        The size, which is None for streams that cannot seek.
+    """
+    if isinstance(source, Stream):
+        return source.size
+    return os.path.getsize(source)
+
+
+class _Borrowed(io.RawIOBase):
+    """A stream that reads from another without closing it.
+
+    Positions are relative to the position of the other stream when given, so the
+    data starts at 0.
+    """
+
+    def __init__(self, fd, start=0):
+        self._fd = fd
+        self._start = start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._fd.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        return n
+
+    def seekable(self):
+        return self._fd.seekable()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            offset += self._start
+        return self._fd.seek(offset, whence) - self._start
+
+    def tell(self):
+        return self._fd.tell() - self._start
+
+
+class Stream(object):
+    """The contents of a file in memory, or an open stream, to read structures from.
+
+    Attributes
+    ----------
+    name : str
+        The name of the file, e.g. the name of the member of a tar archive, used
+        in messages and for names taken from the file.
+    """
+
+    def __init__(self, data, name=None):
+        """Wrap the data or stream.
+
+        Parameters
+        ----------
+        data : bytes or str or file-like object
+            The contents of the file, as bytes or text, or an open binary or text
+            stream. Text streams are read into memory when opened.
+        name : str = None
+            The name of the file. By default the name of the stream, if it has one.
+        """
+        if name is None:
+            name = getattr(data, "name", None)
+            if not isinstance(name, str):
+                name = "<stream>"
+        self.name = name
+
+        self._data = None
+        self._fd = None
+        self._start = None
+        self._opened = False
+        if isinstance(data, str):
+            self._data = data.encode("utf-8")
+        elif isinstance(data, (bytes, bytearray, memoryview)):
+            self._data = bytes(data)
+        elif isinstance(data, io.TextIOBase) and not data.seekable():
+            self._data = data.read().encode("utf-8")
+        else:
+            self._fd = data
+            if data.seekable():
+                self._start = data.tell()
+
+    def __repr__(self):
+        return f"Stream({self.name!r})"
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def stem(self):
+        """The name without its suffix, like Path.stem."""
+        return PurePath(self.name).stem
+
+    @property
+    def suffix(self):
+        """The suffix of the name, like Path.suffix."""
+        return PurePath(self.name).suffix
+
+    @property
+    def size(self):
+        """The size of the data in bytes, or None if not known."""
+        if self._data is not None:
+            return len(self._data)
+        if self._start is None or isinstance(self._fd, io.TextIOBase):
+            return None
+        position = self._fd.tell()
+        end = self._fd.seek(0, io.SEEK_END)
+        self._fd.seek(position)
+        return end - self._start
+
+    def open(self):
+        """Open the data for reading from the beginning.
+
+        Returns
+        -------
+        binary file-like object
+            The data. Closing it does not close the underlying stream.
+        """
+        if self._data is not None:
+            return io.BytesIO(self._data)
+
+        if self._start is None:
+            if self._opened:
+                raise ValueError(
+                    f"The stream {self.name} cannot seek, so can only be read once."
+                )
+        else:
+            self._fd.seek(self._start)
+        self._opened = True
+
+        if isinstance(self._fd, io.TextIOBase):
+            return io.BytesIO(self._fd.read().encode("utf-8"))
+        if self._start is None:
+            # Buffered so that the compression can be detected without seeking
+            return io.BufferedReader(_Borrowed(self._fd))
+        return _Borrowed(self._fd, self._start)
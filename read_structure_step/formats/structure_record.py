@@ -0,0 +1,343 @@
+"""
+Lightweight, picklable records of structures.
+
+Parsing structures, e.g. with Open Babel, can be done in worker processes, but the
+resulting OBMol objects cannot be sent back to the main process, and the SystemDB must
+only be written by the main process. Instead the workers return a structure record,
+which is a plain dictionary with the following items:
+
+    "title" : str
+        The title of the structure in the file.
+    "atnos" : [int]
+        The atomic numbers of the atoms.
+    "coordinates" : [(float, float, float)]
+        The Cartesian coordinates of the atoms, in Å.
+    "formal_charges" : [int]
+        The formal charges on the atoms.
+    "bonds" : [(int, int, int)]
+        The two atoms, counting from 1, and bond order for each bond.
+    "charge" : int
+        The net charge of the structure.
+    "multiplicity" : int
+        The spin multiplicity.
+    "data" : {str: str}
+        Any property data, such as the tags in an SDF file.
+
+The main process then creates the configurations from the records, in order.
+
+Structures read without 3-D coordinates have all-zero coordinates and are flagged
+with the coordinates_property. This is "none" for structures from SMILES whose
+coordinates were not built. The models of NMR ensembles in mmCIF files can be left
+without their coordinates until needed, flagged "lazy", in which case the
+coordinates_source_property records where to read them from. Nothing reads them
+automatically: only ensure_coordinates, which write calls, fills them in.
+"""
+
+import json
+
+# The property flagging configurations whose 3-D coordinates have not been built.
+coordinates_property = "coordinate generation"
+
+# The property giving where to read coordinates that were left until needed.
+coordinates_source_property = "coordinate source"
+
+
+def record_from_OBMol(obMol):
+    """Create a structure record from an Open Babel molecule.
+
+    Parameters
+    ----------
+    obMol : openbabel.OBMol
+        The Open Babel molecule.
+
+    Returns
+    -------
+    dict
+        The structure record.
+    """
+    # Only import Open Babel when it is being used.
+    from openbabel import openbabel
+
+    atnos = []
+    coordinates = []
+    formal_charges = []
+    for obAtom in openbabel.OBMolAtomIter(obMol):
+        atnos.append(obAtom.GetAtomicNum())
+        coordinates.append((obAtom.x(), obAtom.y(), obAtom.z()))
+        formal_charges.append(obAtom.GetFormalCharge())
+
+    bonds = []
+    for obBond in openbabel.OBMolBondIter(obMol):
+        bonds.append(
+            (obBond.GetBeginAtomIdx(), obBond.GetEndAtomIdx(), obBond.GetBondOrder())
+        )
+
+    data = {}
+    for item in obMol.GetData():
+        data[item.GetAttribute()] = item.GetValue()
+
+    return {
+        "title": obMol.GetTitle(),
+        "atnos": atnos,
+        "coordinates": coordinates,
+        "formal_charges": formal_charges,
+        "bonds": bonds,
+        "charge": obMol.GetTotalCharge(),
+        "multiplicity": obMol.GetTotalSpinMultiplicity(),
+        "data": data,
+    }
+
+
+def record_from_configuration(configuration, title=""):
+    """Create a structure record from a configuration.
+
+    This is the reverse of record_to_configuration, without any properties, so that
+    configurations can be handed to worker processes, e.g. for writing.
+
+    Parameters
+    ----------
+    configuration : molsystem.Configuration
+        The configuration.
+    title : str = ""
+        The title for the structure.
+
+    Returns
+    -------
+    dict
+        The structure record.
+    """
+    atoms = configuration.atoms
+    if "formal_charge" in atoms:
+        formal_charges = list(atoms.get_column_data("formal_charge"))
+    else:
+        formal_charges = [0] * atoms.n_atoms
+
+    index = {j: i for i, j in enumerate(atoms.ids, start=1)}
+    bonds = [
+        (index[row["i"]], index[row["j"]], row["bondorder"])
+        for row in configuration.bonds.bonds()
+    ]
+
+    return {
+        "title": title,
+        "atnos": list(atoms.atomic_numbers),
+        "coordinates": [tuple(xyz) for xyz in atoms.get_coordinates(fractionals=False)],
+        "formal_charges": formal_charges,
+        "bonds": bonds,
+        "charge": configuration.charge,
+        "multiplicity": configuration.spin_multiplicity,
+        "data": {},
+    }
+
+
+def record_to_OBMol(record):
+    """Create an Open Babel molecule from a structure record.
+
+    Parameters
+    ----------
+    record : dict
+        The structure record.
+
+    Returns
+    -------
+    openbabel.OBMol
+        The Open Babel molecule.
+    """
+    # Only import Open Babel when it is being used.
+    from openbabel import openbabel
+
+    obMol = openbabel.OBMol()
+    for atno, xyz, formal_charge in zip(
+        record["atnos"], record["coordinates"], record["formal_charges"]
+    ):
+        obAtom = obMol.NewAtom()
+        obAtom.SetAtomicNum(atno)
+        obAtom.SetVector(*xyz)
+        if formal_charge != 0:
+            obAtom.SetFormalCharge(formal_charge)
+    for i, j, order in record["bonds"]:
+        obMol.AddBond(i, j, order)
+
+    obMol.SetTitle(record.get("title", ""))
+    if record.get("charge") is not None:
+        obMol.SetTotalCharge(record["charge"])
+    if record.get("multiplicity") is not None:
+        obMol.SetTotalSpinMultiplicity(record["multiplicity"])
+    obMol.AssignSpinMultiplicity(True)
+    return obMol
+
+
+def record_to_configuration(record, configuration, properties="all"):
+    """Load a structure record into a configuration.
+
+    This mirrors Configuration.from_OBMol, so the result is the same as reading the
+    structure directly with Open Babel.
+
+    Parameters
+    ----------
+    record : dict
+        The structure record.
+    configuration : molsystem.Configuration
+        The configuration to fill, which is cleared first.
+    properties : str = "all"
+        Whether to include all properties or none.
+    """
+    configuration.clear()
+
+    # Get the property data, cast to correct type
+    data = {}
+    for key, value in record["data"].items():
+        if not key.startswith("SEAMM|"):
+            try:
+                value = int(value)
+            except Exception:
+                try:
+                    value = float(value)
+                except Exception:
+                    pass
+        data[key] = value
+
+    configuration.charge = record["charge"]
+    configuration.spin_multiplicity = record["multiplicity"]
+    if "SEAMM|net charge|int|" in data:
+        configuration.charge = int(data.pop("SEAMM|net charge|int|"))
+    if "SEAMM|spin multiplicity|int|" in data:
+        configuration.spin_multiplicity = int(data.pop("SEAMM|spin multiplicity|int|"))
+    coordinates = record["coordinates"]
+    if "SEAMM|XYZ|json|" in data:
+        coordinates = json.loads(data.pop("SEAMM|XYZ|json|"))
+    if "SEAMM|cell|json|" in data:
+        configuration.periodicity = 3
+        configuration.cell.parameters = json.loads(data.pop("SEAMM|cell|json|"))
+        configuration.coordinate_system = "fractional"
+    data.pop("SEAMM|system name|str|", None)
+    data.pop("SEAMM|configuration name|str|", None)
+
+    atoms = configuration.atoms
+    xs = [xyz[0] for xyz in coordinates]
+    ys = [xyz[1] for xyz in coordinates]
+    zs = [xyz[2] for xyz in coordinates]
+    qs = record["formal_charges"]
+    if any(q != 0 for q in qs):
+        if "formal_charge" not in atoms:
+            atoms.add_attribute("formal_charge", coltype="int", default=0)
+        ids = atoms.append(x=xs, y=ys, z=zs, atno=record["atnos"], formal_charge=qs)
+    else:
+        ids = atoms.append(x=xs, y=ys, z=zs, atno=record["atnos"])
+    if configuration.periodicity != 0:
+        atoms.set_coordinates([list(xyz) for xyz in coordinates], fractionals=False)
+
+    if len(record["bonds"]) > 0:
+        configuration.bonds.append(
+            i=[ids[i - 1] for i, j, order in record["bonds"]],
+            j=[ids[j - 1] for i, j, order in record["bonds"]],
+            bondorder=[order for i, j, order in record["bonds"]],
+        )
+
+    # Record any properties in the database if desired
+    if properties == "all":
+        configuration_properties = configuration.properties
+        for key, value in data.items():
+            if key.startswith("SEAMM|"):
+                _, _property, _type, units = key.split("|", 4)
+                units = units.strip()
+                if _type == "int":
+                    value = int(value)
+                elif _type == "float":
+                    value = float(value)
+                elif _type == "json":
+                    value = json.loads(value)
+                if not configuration_properties.exists(_property):
+                    configuration_properties.add(_property, _type=_type, units=units)
+            else:
+                _property = key
+                if not configuration_properties.exists(_property):
+                    configuration_properties.add(_property, value.__class__.__name__)
+            configuration_properties.put(_property, value)
+
+
+def name_structure(
+    configuration, title="", structure_no=1, system_name=None, configuration_name=None
+):
+    """Name a configuration and its system following the naming directives.
+
+    Parameters
+    ----------
+    configuration : molsystem.Configuration
+        The configuration, already filled, e.g. by record_to_configuration.
+    title : str = ""
+        The title of the structure in the file.
+    structure_no : int = 1
+        The number of the structure in the file, counting from 1.
+    system_name : str = None
+        The name for the system. Can be directives like "from file", "SMILES" or
+        "Canonical SMILES". If None, no name is given.
+    configuration_name : str = None
+        The name for the configuration, which can also be "sequential". If None,
+        no name is given.
+    """
+    system = configuration.system
+
+    # Set the system name
+    if system_name is not None and system_name != "":
+        lower_name = system_name.lower()
+        if "from file" in lower_name:
+            system.name = title
+        elif "canonical smiles" in lower_name:
+            system.name = configuration.canonical_smiles
+        elif "smiles" in lower_name:
+            system.name = configuration.smiles
+        else:
+            system.name = system_name
+
+    # And the configuration name
+    if configuration_name is not None and configuration_name != "":
+        lower_name = configuration_name.lower()
+        if "from file" in lower_name:
+            configuration.name = title
+        elif "canonical smiles" in lower_name:
+            configuration.name = configuration.canonical_smiles
+        elif "smiles" in lower_name:
+            configuration.name = configuration.smiles
+        elif lower_name == "sequential":
+            configuration.name = str(structure_no)
+        else:
+            configuration.name = configuration_name
+
+
+def ensure_coordinates(configuration):
+    """Read the 3-D coordinates of a configuration if they were left until needed.
+
+    The coordinates of models of NMR ensembles that were not read at once are all
+    zero until this reads them from the file given by the coordinates_source_property.
+    Nothing is done for any other configuration.
+
+    Parameters
+    ----------
+    configuration : molsystem.Configuration
+        The configuration.
+
+    Returns
+    -------
+    bool
+        Whether the coordinates were read.
+    """
+    properties = configuration.properties
+    if not properties.exists(coordinates_property):
+        return False
+    flag = properties.get(coordinates_property, match="exact")
+    if flag.get(coordinates_property, {}).get("value") != "lazy":
+        return False
+
+    if not properties.exists(coordinates_source_property):
+        return False
+    source = properties.get(coordinates_source_property, match="exact")
+    source = source.get(coordinates_source_property, {}).get("value")
+    if source is None:
+        return False
+
+    from .cif.mmcif import load_model_coordinates
+
+    load_model_coordinates(configuration, source)
+    properties.put(coordinates_property, "read")
+    return True
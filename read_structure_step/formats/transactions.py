@@ -0,0 +1,118 @@
+"""
+Grouping the writes to the SystemDB into transactions while importing structures.
+
+molsystem commits after most operations, so creating each system and configuration
+is many small write transactions. For files with many structures that, rather than
+parsing, limits the speed of reading. While a BulkImport is active the commits are
+deferred, and the structures are committed in batches instead.
+
+If commits are already being deferred, e.g. because the flowchart makes each step
+one transaction, the BulkImport leaves the transaction alone and does nothing.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BulkImport(object):
+    """Commit the structures being imported in batches.
+
+    Use it as a context manager around the import, calling ``added`` after each
+    structure::
+
+        with BulkImport(system_db, batch_size=1000) as bulk:
+            for ...:
+                system = system_db.create_system()
+                ...
+                bulk.added()
+
+    Everything is committed when the context exits, even after an error, so the
+    structures already imported are kept, as they are without batching.
+
+    Attributes
+    ----------
+    system_db : SystemDB
+        The system database.
+    batch_size : int
+        The number of structures in each transaction.
+    relaxed : bool
+        Whether to turn off waiting for the data to reach the disk while importing.
+        Quicker, but the database may be corrupted if the computer crashes.
+    n_structures : int
+        The number of structures added so far.
+    n_commits : int
+        The number of transactions committed so far.
+    """
+
+    def __init__(self, system_db, batch_size=1000, relaxed=False):
+        self.system_db = system_db
+        self.batch_size = batch_size
+        self.relaxed = relaxed
+        self.n_structures = 0
+        self.n_commits = 0
+        self._active = False
+        self._synchronous = None
+        self._n_pending = 0
+
+    @property
+    def active(self):
+        """Whether this BulkImport is controlling the transactions."""
+        return self._active
+
+    def __enter__(self):
+        db = None if self.system_db is None else self.system_db.db
+        if (
+            db is None
+            or self.batch_size is None
+            or self.batch_size < 1
+            or not hasattr(self.system_db, "deferred_commit")
+            or self.system_db.deferred_commit
+        ):
+            return self
+
+        # The durability can only be changed outside a transaction
+        db.commit()
+        if self.relaxed:
+            self._synchronous = db.execute("PRAGMA synchronous").fetchone()[0]
+            db.execute("PRAGMA synchronous = OFF")
+        self.system_db.deferred_commit = True
+        self._active = True
+        return self
+
+    def __exit__(self, etype, value, traceback):
+        if not self._active:
+            return False
+
+        self._active = False
+        db = self.system_db.db
+        self.system_db.deferred_commit = False
+        db.commit()
+        if self._n_pending > 0:
+            self.n_commits += 1
+            self._n_pending = 0
+        if self._synchronous is not None:
+            db.execute(f"PRAGMA synchronous = {self._synchronous}")
+            self._synchronous = None
+        logger.debug(
+            f"Imported {self.n_structures} structures in {self.n_commits} "
+            "transactions."
+        )
+        return False
+
+    def added(self, n=1):
+        """Note that structures have been added, committing if the batch is full.
+
+        Parameters
+        ----------
+        n : int = 1
+            The number of structures added.
+        """
+        self.n_structures += n
+        if not self._active:
+            return
+        self._n_pending += n
+        if self._n_pending >= self.batch_size:
+            self.system_db.commit_transaction()
+            self.n_commits += 1
+            self._n_pending = 0
@@ -4,6 +4,12 @@ The public interface to the read_structure_step SEAMM plugin
 
 from . import utils
 from . import formats
+from .formats.sources import as_source
+from .formats.sources import Stream
+from .formats.structure_record import name_structure
+from .formats.structure_record import record_to_configuration
+from .formats.transactions import BulkImport
+import contextlib
 import os
 
 
@@ -21,14 +27,22 @@ def read(
     printer=None,
     references=None,
     bibliography=None,
+    n_workers=1,
+    batch_size=1000,
+    relaxed_durability=False,
+    bulk=None,
+    **kwargs,
 ):
     """
     Calls the appropriate functions to parse the requested file.
 
     Parameters
     ----------
-    file_name : str
-        Name of the file
+    file_name : str or bytes or file-like object
+        Name of the file, or its contents as bytes, or an open binary or text stream
+        such as a member of a tar archive. The format of contents and streams is
+        taken from the extension if given, then the name of the stream, and
+        finally from the contents.
 
     configuration : Configuration
         The SEAMM configuration to read into
@@ -47,7 +61,8 @@ def read(
 
     indices : str = None
         The generalized indices (slices, SMARTS, etc.) to select structures
-        from a file containing multiple structures.
+        from a file containing multiple structures, e.g. "1:100" or
+        "5,17,200:300:10". See formats/indices.py for the syntax.
 
     subsequent_as_configurations : bool = False
         Normally and subsequent structures are loaded into new systems; however,
@@ -70,12 +85,249 @@ def read(
     bibliography : dict
         The bibliography as a dictionary.
 
+    n_workers : int = 1
+        The number of worker processes to use for parsing, for readers that support
+        it. 0 or None use all the cores.
+
+    batch_size : int = 1000
+        The number of structures committed to the database in each transaction.
+        None or 0 commit each structure as it is created.
+
+    relaxed_durability : bool = False
+        Whether to skip waiting for the data to reach the disk while importing. This
+        is quicker, but the database may be corrupted if the computer crashes.
+
+    bulk : BulkImport = None
+        A bulk import already in progress, e.g. for all the files in an archive, to
+        use rather than starting one for this file.
+
+    **kwargs
+        Any other options are passed to the reader for the format, e.g.
+        geometry_cache for SMILES files.
+
     Returns
     -------
     [Configuration]
         The list of configurations created.
     """
 
+    file_name, extension = _check_file(file_name, extension)
+
+    entry = formats.registries.get_reader(extension)
+    if entry is None:
+        raise KeyError(
+            "read_structure_step: the file format %s was not recognized." % extension
+        )
+
+    reader = entry["function"]
+
+    # Commit the structures in batches, unless part of a larger import
+    if bulk is None:
+        context = BulkImport(
+            system_db, batch_size=batch_size, relaxed=relaxed_durability
+        )
+    else:
+        context = contextlib.nullcontext(bulk)
+
+    with context as bulk:
+        configurations = reader(
+            file_name,
+            configuration,
+            extension=extension,
+            add_hydrogens=add_hydrogens,
+            system_db=system_db,
+            system=system,
+            indices=indices,
+            subsequent_as_configurations=subsequent_as_configurations,
+            system_name=system_name,
+            configuration_name=configuration_name,
+            printer=printer,
+            references=references,
+            bibliography=bibliography,
+            n_workers=n_workers,
+            bulk=bulk,
+            **kwargs,
+        )
+
+    return configurations
+
+
+def iter_structures(
+    file_name,
+    extension=None,
+    add_hydrogens=False,
+    indices=None,
+    n_workers=1,
+    system_db=None,
+    system=None,
+    subsequent_as_configurations=False,
+    system_name=None,
+    configuration_name=None,
+    batch_size=1000,
+    relaxed_durability=False,
+    **kwargs,
+):
+    """Iterate over the structures in a file, one at a time.
+
+    Unlike read(), which creates all the configurations before returning, this is a
+    generator, so the caller can filter or transform the structures, or stop early,
+    without holding all of them in memory.
+
+    Without a system database, the structures are yielded as lightweight structure
+    records (see formats/structure_record.py), which requires a streaming reader for
+    the format. With a system database, each configuration is created when it is
+    reached and then yielded. Formats without a streaming reader are then handled by
+    the normal reader, though that creates all the configurations up front.
+
+    Parameters
+    ----------
+    file_name : str or bytes or file-like object
+        Name of the file, or its contents or an open stream, as for read().
+
+    extension : str, optional, default: None
+        The extension, including initial dot, defining the format.
+
+    add_hydrogens : bool = False
+        Whether to add any missing hydrogen atoms.
+
+    indices : str = None
+        The generalized indices (slices, SMARTS, etc.) to select structures
+        from a file containing multiple structures, e.g. "1:100" or
+        "5,17,200:300:10". See formats/indices.py for the syntax.
+
+    n_workers : int = 1
+        The number of worker processes to use for parsing, for readers that support
+        it. 0 or None use all the cores.
+
+    system_db : System_DB = None
+        The system database in which to create configurations. If None, structure
+        records are yielded instead.
+
+    system : System = None
+        The system to use if adding the structures as configurations.
+
+    subsequent_as_configurations : bool = False
+        Normally the structures are loaded into new systems; however, if this option
+        is True and a system is given, they will be added as configurations of it.
+
+    system_name : str = None
+        The name for systems. Can be directives like "SMILES" or
+        "Canonical SMILES". If None, no name is given.
+
+    configuration_name : str = None
+        The name for configurations. Can be directives like "SMILES" or
+        "Canonical SMILES". If None, no name is given.
+
+    batch_size : int = 1000
+        The number of configurations committed to the database in each transaction.
+        The last batch is committed when the iteration finishes or is stopped.
+
+    relaxed_durability : bool = False
+        Whether to skip waiting for the data to reach the disk while importing.
+
+    **kwargs
+        Any other options are passed to the reader for the format, e.g.
+        geometry_cache for SMILES files.
+
+    Yields
+    ------
+    dict or Configuration
+        The structure record, or the configuration if a system database was given.
+    """
+    file_name, extension = _check_file(file_name, extension)
+
+    entry = formats.registries.get_streaming_reader(extension)
+    if entry is None:
+        if system_db is None:
+            raise KeyError(
+                f"read_structure_step: the file format {extension} cannot be "
+                "streamed without a system database."
+            )
+        if system is None or not subsequent_as_configurations:
+            system = system_db.create_system()
+        yield from read(
+            file_name,
+            system.create_configuration(),
+            extension=extension,
+            add_hydrogens=add_hydrogens,
+            system_db=system_db,
+            system=system,
+            indices=indices,
+            subsequent_as_configurations=subsequent_as_configurations,
+            system_name=system_name,
+            configuration_name=configuration_name,
+            n_workers=n_workers,
+            batch_size=batch_size,
+            relaxed_durability=relaxed_durability,
+            **kwargs,
+        )
+        return
+
+    reader = entry["function"]
+    with BulkImport(
+        system_db, batch_size=batch_size, relaxed=relaxed_durability
+    ) as bulk:
+        for structure_no, record in reader(
+            file_name,
+            extension=extension,
+            add_hydrogens=add_hydrogens,
+            indices=indices,
+            n_workers=n_workers,
+            **kwargs,
+        ):
+            if system_db is None:
+                yield record
+                continue
+
+            if system is None or not subsequent_as_configurations:
+                system = system_db.create_system()
+            configuration = system.create_configuration()
+            record_to_configuration(record, configuration)
+            name_structure(
+                configuration,
+                title=record.get("title", ""),
+                structure_no=structure_no,
+                system_name=system_name,
+                configuration_name=configuration_name,
+            )
+
+            bulk.added()
+            yield configuration
+
+
+def _check_file(file_name, extension=None):
+    """Check the file name and work out the format of the file.
+
+    Parameters
+    ----------
+    file_name : str or bytes or file-like object
+        Name of the file, or its contents or an open stream.
+
+    extension : str, optional, default: None
+        The extension, including initial dot, defining the format.
+
+    Returns
+    -------
+    (str or Stream, str)
+        The absolute path of the file, or the contents or stream as a Stream (see
+        formats/sources.py), and the extension giving the format.
+    """
+    if isinstance(file_name, (bytes, bytearray, memoryview, Stream)) or hasattr(
+        file_name, "read"
+    ):
+        source = as_source(file_name)
+        if extension is None:
+            extension = utils.guess_extension(source.name, use_file_name=True)
+            if extension is None:
+                extension = utils.guess_extension(source, use_file_name=False)
+        else:
+            extension = utils.sanitize_file_format(extension)
+
+        if extension is None:
+            raise NameError("Extension could not be identified")
+
+        return source, extension
+
     if type(file_name) is not str:
         raise TypeError(
             """read_structure_step: The file name must be a string, but a
@@ -105,27 +357,4 @@ def read(
     if extension is None:
         raise NameError("Extension could not be identified")
 
-    if extension not in formats.registries.REGISTERED_READERS.keys():
-        raise KeyError(
-            "read_structure_step: the file format %s was not recognized." % extension
-        )
-
-    reader = formats.registries.REGISTERED_READERS[extension]["function"]
-
-    configurations = reader(
-        file_name,
-        configuration,
-        extension=extension,
-        add_hydrogens=add_hydrogens,
-        system_db=system_db,
-        system=system,
-        indices=indices,
-        subsequent_as_configurations=subsequent_as_configurations,
-        system_name=system_name,
-        configuration_name=configuration_name,
-        printer=printer,
-        references=references,
-        bibliography=bibliography,
-    )
-
-    return configurations
+    return file_name, extension
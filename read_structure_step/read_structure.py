@@ -13,11 +13,19 @@ directory, and is used for all normal output from this step.
 
 import logging
 from pathlib import PurePath, Path
-import tarfile
-import tempfile
 import textwrap
 
+from .formats.archive import archive_members
+from .formats.archive import is_archive
+from .formats.archive import parse_members
+from .formats.compression import split_suffix
+from .formats.openbabel_io.citations import cite_openbabel
+from .formats.parallel import n_workers_to_use
+from .formats.progress import Progress
 from .formats.registries import get_format_metadata
+from .formats.structure_record import name_structure
+from .formats.structure_record import record_to_configuration
+from .formats.transactions import BulkImport
 import read_structure_step
 from .read import read
 import seamm
@@ -74,13 +82,13 @@ class ReadStructure(seamm.Node):
         """Setup the command-line / config file parser"""
         # Need to mimic MOPAC step to find the MOPAC executable
         parser_name = "mopac-step"
-        print(f"Parser {parser_name}, {self.step_type=}")
+        logger.debug(f"Parser {parser_name}, {self.step_type=}")
         parser = getParser()
 
         # Remember if the parser exists ... this type of step may have been
         # found before
         parser_exists = parser.exists(parser_name)
-        print(f"{parser_exists=}")
+        logger.debug(f"{parser_exists=}")
 
         # Create the standard options, e.g. log-level
         result = super().create_parser(name=parser_name)
@@ -151,15 +159,15 @@ class ReadStructure(seamm.Node):
 
         if self.is_expr(filename) or self.is_expr(file_type):
             extension = "all"
+        elif filename != "" and is_archive(filename):
+            extension = "all"
         else:
             if file_type != "from extension":
                 extension = file_type.split()[0]
             else:
                 if filename != "":
                     path = PurePath(filename)
-                    extension = path.suffix
-                    if extension == ".gz":
-                        extension = path.with_suffix("").suffix
+                    extension = split_suffix(path)[0].suffix
 
         # Get the metadata for the format
         metadata = get_format_metadata(extension)
@@ -181,15 +189,14 @@ class ReadStructure(seamm.Node):
             context=seamm.flowchart_variables._data
         )
 
-        # Check for tar files, potentially compressed
+        # Check for archives, potentially compressed, directories and glob patterns
         if isinstance(P["file"], Path):
             path = P["file"].expanduser().resolve()
         else:
             path = Path(P["file"].strip()).expanduser().resolve()
 
-        extensions = path.suffixes
-        if ".tar" in extensions or ".tgz" in extensions:
-            self.read_tarfile(path, P)
+        if is_archive(path):
+            self.read_archive(path, P)
         else:
             # What type of file?
             filename = str(path)
@@ -198,9 +205,7 @@ class ReadStructure(seamm.Node):
             if file_type != "from extension":
                 extension = file_type.split()[0]
             else:
-                extension = path.suffix
-                if extension == ".gz":
-                    extension = path.with_suffix("").suffix
+                extension = split_suffix(path)[0].suffix
 
             if extension == "":
                 extension = guess_extension(filename, use_file_name=False)
@@ -208,6 +213,7 @@ class ReadStructure(seamm.Node):
 
             # Print what we are doing
             printer.important(self.description_text(P))
+            self._warn_no_coordinates(P)
 
             # Read the file into the system
             system_db = self.get_variable("_system_db")
@@ -231,6 +237,12 @@ class ReadStructure(seamm.Node):
                 printer=printer.important,
                 references=self.references,
                 bibliography=self._bibliography,
+                n_workers=P["number of workers"],
+                batch_size=P["batch size"],
+                relaxed_durability=P["relaxed durability"],
+                geometry_cache=P["geometry cache"],
+                coordinates=P["coordinates"],
+                model_indices=P["model indices"],
             )
 
             # Finish the output
@@ -268,92 +280,196 @@ class ReadStructure(seamm.Node):
 
         return next_node
 
-    def read_tarfile(self, tarfile_path, P):
-        """Read structures from a tarfile.
+    def read_archive(self, path, P):
+        """Read structures from an archive, directory, or glob pattern.
+
+        Tar and zip archives, directories, and glob patterns such as "**/*.sdf" are
+        handled. The members are listed lazily, and members of archives are given to
+        the readers as streams rather than being written to temporary files. With
+        more than one worker, the members are parsed in worker processes while a
+        background thread reads the archive or lists the files, and the structures
+        are added to the database here in the original order.
 
         Parameters
         ----------
         path : pathlib.Path
-            The path to the tarfile.
+            The path to the archive or directory, or the glob pattern.
         P : {str: str}
             Dictionary of control parameters for this step.
         """
         file_type = P["file type"]
         if file_type != "from extension":
             extensions = [file_type.split()[0]]
+        else:
+            extensions = None
+
+        path = path.expanduser()
+        n_workers = n_workers_to_use(P["number of workers"])
+        self._warn_no_coordinates(P)
+
+        # Commit the structures from all the members in batches
+        system_db = self.get_variable("_system_db")
+        with BulkImport(
+            system_db, batch_size=P["batch size"], relaxed=P["relaxed durability"]
+        ) as bulk:
+            if n_workers > 1:
+                n = self._read_archive_in_parallel(path, extensions, n_workers, P, bulk)
+            else:
+                progress = Progress(printer.important)
+                n = 0
+                for name, extension, source in archive_members(path, extensions):
+                    self._read_member(source, extension, P, bulk)
+                    n += 1
+                    progress.update(n)
 
-        as_configurations = (
-            P["subsequent structure handling"] == "Create a new configuration"
+        printer.important(
+            __(
+                f"\n    Created {n} structures from {path}",
+                indent=4 * " ",
+            )
         )
 
-        n = 0
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            tmp_dir_path = Path(tmp_dir)
-            with tarfile.open(tarfile_path.expanduser(), "r") as tar:
-                for member in tar:
-                    if not member.isfile():
-                        continue
-
-                    if member.name[0] == ".":
-                        continue
+    def _warn_no_coordinates(self, P):
+        """Warn that structures are stored without coordinates.
 
-                    path = PurePath(member.name)
-                    if path.name[0] == ".":
-                        continue
-                    extension = path.suffix
+        Parameters
+        ----------
+        P : {str: str}
+            Dictionary of control parameters for this step.
+        """
+        if P["coordinates"] == "none":
+            printer.important(
+                __(
+                    "\n    Warning: the 3-D coordinates of structures from SMILES are "
+                    "not being built, so all their atoms are at the origin.",
+                    indent=4 * " ",
+                )
+            )
+        if P["model indices"].strip() != "1:end":
+            printer.important(
+                __(
+                    "\n    Warning: only the coordinates of NMR models "
+                    f"{P['model indices']} are being read. The atoms of the other "
+                    "models in uncompressed files are at the origin.",
+                    indent=4 * " ",
+                )
+            )
 
-                    # If explicit extension does not match, skip.
-                    if file_type != "from extension" and extension not in extensions:
-                        continue
+    def _read_member(self, source, extension, P, bulk=None):
+        """Read the structures in a member of an archive or directory.
 
-                    # For the time being write the contents to a file. Eventually should
-                    # rewrite all the routines to handle text as well as files.
-                    fd = tar.extractfile(member)
-                    if fd is None:
-                        fd.close()
-                        continue
+        Parameters
+        ----------
+        source : str or Stream
+            The path to the file, or the contents of the member.
+        extension : str or None
+            The extension giving the format, or None to work it out.
+        P : {str: str}
+            Dictionary of control parameters for this step.
+        bulk : BulkImport = None
+            The bulk import committing the structures in batches.
+        """
+        system_db = self.get_variable("_system_db")
+        system, configuration = self.get_system_configuration(
+            P, structure_handling=True
+        )
 
-                    data = fd.read()
-                    fd.close()
+        read(
+            source,
+            configuration,
+            extension=extension,
+            add_hydrogens=P["add hydrogens"],
+            system_db=system_db,
+            system=system,
+            indices=P["indices"],
+            subsequent_as_configurations=(
+                P["subsequent structure handling"] == "Create a new configuration"
+            ),
+            system_name=P["system name"],
+            configuration_name=P["configuration name"],
+            printer=printer.important,
+            references=self.references,
+            bibliography=self._bibliography,
+            bulk=bulk,
+            geometry_cache=P["geometry cache"],
+            coordinates=P["coordinates"],
+            model_indices=P["model indices"],
+        )
 
-                    tmp_path = tmp_dir_path / path.name
-                    tmp_path.write_bytes(data)
+    def _read_archive_in_parallel(self, path, extensions, n_workers, P, bulk=None):
+        """Parse the members of an archive or directory in worker processes.
 
-                    filename = str(tmp_path)
+        Parameters
+        ----------
+        path : pathlib.Path
+            The path to the archive or directory, or the glob pattern.
+        extensions : [str] or None
+            The extensions of the members to read, or None for all.
+        n_workers : int
+            The number of worker processes.
+        P : {str: str}
+            Dictionary of control parameters for this step.
+        bulk : BulkImport = None
+            The bulk import committing the structures in batches.
 
-                    if extension == "":
-                        extension = guess_extension(filename)
+        Returns
+        -------
+        int
+            The number of members read.
+        """
+        as_configurations = (
+            P["subsequent structure handling"] == "Create a new configuration"
+        )
+        system_db = self.get_variable("_system_db")
 
-                    # Read the file into the system
-                    system_db = self.get_variable("_system_db")
+        progress = Progress(printer.important)
+        n = 0
+        n_structures = 0
+        members = archive_members(path, extensions, in_memory=True)
+        for (name, extension, source), result in parse_members(
+            members,
+            n_workers,
+            add_hydrogens=P["add hydrogens"],
+            indices=P["indices"],
+            geometry_cache=P["geometry cache"],
+            coordinates=P["coordinates"],
+            model_indices=P["model indices"],
+        ):
+            if "error" in result:
+                printer.important(f"    Could not read {name}: {result['error']}")
+                continue
+            n += 1
+
+            if result["records"] is None:
+                # The workers cannot parse this format, so read it here.
+                self._read_member(source, result["extension"], P, bulk)
+                continue
+
+            for i, (record_no, record) in enumerate(result["records"]):
+                if i == 0:
                     system, configuration = self.get_system_configuration(
                         P, structure_handling=True
                     )
-
-                    read(
-                        filename,
-                        configuration,
-                        extension=extension,
-                        add_hydrogens=P["add hydrogens"],
-                        system_db=system_db,
-                        system=system,
-                        indices=P["indices"],
-                        subsequent_as_configurations=as_configurations,
-                        system_name=P["system name"],
-                        configuration_name=P["configuration name"],
-                        printer=printer.important,
-                        references=self.references,
-                        bibliography=self._bibliography,
-                    )
-
-                    tmp_path.unlink()
-                    n += 1
-                    if n % 1000 == 0:
-                        print(n)
-
-        printer.important(
-            __(
-                f"\n    Created {n} structures from the tarfile {tarfile}",
-                indent=4 * " ",
-            )
-        )
+                elif as_configurations:
+                    configuration = system.create_configuration()
+                else:
+                    system = system_db.create_system()
+                    configuration = system.create_configuration()
+
+                record_to_configuration(record, configuration)
+                name_structure(
+                    configuration,
+                    title=record.get("title", ""),
+                    structure_no=record_no,
+                    system_name=P["system name"],
+                    configuration_name=P["configuration name"],
+                )
+                n_structures += 1
+                progress.update(n_structures)
+                if bulk is not None:
+                    bulk.added()
+
+        if n_structures > 0:
+            cite_openbabel(self.references, self._bibliography)
+
+        return n
@@ -11,6 +11,7 @@ import seamm
 logger = logging.getLogger(__name__)
 
 
+formats.registries.load_deferred()
 _filetypes = sorted(formats.registries.REGISTERED_READERS.keys())
 
 
@@ -45,7 +46,11 @@ class ReadStructureParameters(seamm.Parameters):
             "enumeration": tuple(),
             "format_string": "s",
             "description": "Structure file:",
-            "help_text": ("The file containing the structure."),
+            "help_text": (
+                "The file containing the structure. Tar and zip archives, "
+                "directories, and glob patterns such as 'data/**/*.sdf' read all the "
+                "structure files in them."
+            ),
         },
         "file type": {
             "default": "from extension",
@@ -72,7 +77,88 @@ class ReadStructureParameters(seamm.Parameters):
             "enumeration": tuple(),
             "format_string": "s",
             "description": "Structures to read:",
-            "help_text": ("The set of structures to read"),
+            "help_text": (
+                "The set of structures to read, counting from 1, e.g. '1:100', "
+                "'5,17,200:300:10' or '-50:end'. The blocks in CIF and mmCIF files "
+                "can also be given by name, e.g. 'data_ACETCR,data_1ABC'."
+            ),
+        },
+        "model indices": {
+            "default": "1:end",
+            "kind": "string",
+            "default_units": "",
+            "enumeration": tuple(),
+            "format_string": "s",
+            "description": "NMR models to read:",
+            "help_text": (
+                "The models of NMR ensembles in mmCIF files whose coordinates are "
+                "read, counting from 1, e.g. '1:end' or '1,5:10'. The first and "
+                "representative models are always read. The other models are stored "
+                "with all their atoms at the origin."
+            ),
+        },
+        "number of workers": {
+            "default": 1,
+            "kind": "integer",
+            "default_units": "",
+            "enumeration": ("all",),
+            "format_string": "",
+            "description": "Number of worker processes:",
+            "help_text": (
+                "The number of processes used to parse the structures in large files. "
+                "'all' uses all the cores."
+            ),
+        },
+        "coordinates": {
+            "default": "build",
+            "kind": "enum",
+            "default_units": "",
+            "enumeration": ("build", "none"),
+            "format_string": "s",
+            "description": "3-D coordinates:",
+            "help_text": (
+                "For SMILES, whether to build the 3-D coordinates, or not build them "
+                "at all (none), which is much quicker when only the connectivity is "
+                "needed. Without coordinates every atom is at the origin."
+            ),
+        },
+        "geometry cache": {
+            "default": "no",
+            "kind": "bool",
+            "default_units": "",
+            "enumeration": ("yes", "no"),
+            "format_string": "s",
+            "description": "Cache 3-D structures:",
+            "help_text": (
+                "Whether to keep the 3-D structures built from SMILES in a cache in "
+                "the SEAMM data directory, so they need not be built again."
+            ),
+        },
+        "batch size": {
+            "default": 1000,
+            "kind": "integer",
+            "default_units": "",
+            "enumeration": tuple(),
+            "format_string": "",
+            "description": "Structures per transaction:",
+            "help_text": (
+                "The number of structures written to the database in each "
+                "transaction when reading many structures. Larger batches are faster; "
+                "0 writes each structure on its own."
+            ),
+        },
+        "relaxed durability": {
+            "default": "no",
+            "kind": "bool",
+            "default_units": "",
+            "enumeration": ("yes", "no"),
+            "format_string": "s",
+            "description": "Relaxed durability:",
+            "help_text": (
+                "Whether to skip waiting for the database to reach the disk while "
+                "reading. Faster, but the database may be corrupted if the computer "
+                "crashes."
+            ),
         },
     }
 
@@ -7,6 +7,7 @@ import pprint  # noqa: F401
 import tkinter as tk
 import tkinter.ttk as ttk
 
+from .formats.compression import split_suffix
 from .formats.registries import get_format_metadata
 import seamm
 from seamm_util import ureg, Q_, units_class  # noqa: F401
@@ -62,7 +63,18 @@ class TkReadStructure(seamm.TkNode):
 
         # Create the widgets
         P = self.node.parameters
-        for key in ("file", "file type", "indices", "add hydrogens"):
+        for key in (
+            "file",
+            "file type",
+            "indices",
+            "model indices",
+            "add hydrogens",
+            "number of workers",
+            "coordinates",
+            "geometry cache",
+            "batch size",
+            "relaxed durability",
+        ):
             self[key] = P[key].widget(frame1)
         for key in (
             "structure handling",
@@ -118,9 +130,7 @@ class TkReadStructure(seamm.TkNode):
             else:
                 if filename != "":
                     path = PurePath(filename)
-                    extension = path.suffix
-                    if extension == ".gz":
-                        extension = path.with_suffix("").suffix
+                    extension = split_suffix(path)[0].suffix
 
         # Get the metadata for the format
         metadata = get_format_metadata(extension)
@@ -137,8 +147,18 @@ class TkReadStructure(seamm.TkNode):
         items = []
         if extension == "all" or not metadata["single_structure"]:
             items.append("indices")
+        if extension in ("all", ".mmcif"):
+            items.append("model indices")
         if extension == "all" or metadata["add_hydrogens"]:
             items.append("add hydrogens")
+        if extension == "all" or not metadata["single_structure"]:
+            items.append("number of workers")
+        if extension in ("all", ".smi"):
+            items.append("coordinates")
+            items.append("geometry cache")
+        if extension == "all" or not metadata["single_structure"]:
+            items.append("batch size")
+            items.append("relaxed durability")
         if len(items) > 0:
             widgets = []
             for item in items:
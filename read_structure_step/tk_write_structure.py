@@ -6,6 +6,7 @@ from pathlib import PurePath
 import pprint  # noqa: F401
 import tkinter as tk
 
+from .formats.compression import split_suffix
 from .formats.registries import get_format_metadata
 import seamm
 from seamm_util import ureg, Q_, units_class  # noqa: F401
@@ -81,9 +82,7 @@ class TkWriteStructure(seamm.TkNode):
             else:
                 if filename != "":
                     path = PurePath(filename)
-                    extension = path.suffix
-                    if extension == ".gz":
-                        extension = path.with_suffix("").suffix
+                    extension = split_suffix(path)[0].suffix
 
         # Get the metadata for the format
         metadata = get_format_metadata(extension)
@@ -1,12 +1,13 @@
 import os
-from . import formats
+from .formats.compression import split_suffix
+from .formats.sniff import sniff_format
 import re
 
 
 def guess_extension(file_name, use_file_name=False):
     """
     Returns the file format. It can either use the file name extension or
-    guess based on signatures found in the file.
+    guess based on signatures found in the beginning and end of the file.
 
     Parameters
     ----------
@@ -24,6 +25,8 @@ def guess_extension(file_name, use_file_name=False):
     """
 
     if use_file_name is True:
+        # Ignore any suffix for compression, e.g. ".gz"
+        file_name = str(split_suffix(file_name)[0])
         (root, ext) = os.path.splitext(file_name)
 
         if ext == "":
@@ -31,14 +34,7 @@ def guess_extension(file_name, use_file_name=False):
 
         return ext.lower()
 
-    available_extensions = formats.registries.REGISTERED_FORMAT_CHECKERS.keys()
-
-    for extension in available_extensions:
-
-        extension_checker = formats.registries.REGISTERED_FORMAT_CHECKERS[extension]
-
-        if extension_checker(file_name) is True:
-            return extension
+    return sniff_format(file_name)
 
 
 def sanitize_file_format(file_format):
@@ -3,6 +3,7 @@ The public interface to the read_structure_step SEAMM plugin
 """
 
 from . import formats
+from .formats.structure_record import ensure_coordinates
 import os
 
 
@@ -14,6 +15,8 @@ def write(
     printer=None,
     references=None,
     bibliography=None,
+    n_workers=1,
+    **kwargs,
 ):
     """
     Calls the appropriate functions to parse the requested file.
@@ -41,6 +44,14 @@ def write(
     bibliography : dict
         The bibliography as a dictionary.
         The list of configurations created.
+
+    n_workers : int = 1
+        The number of worker processes to use, for writers that support it. 0 or
+        None use all the cores.
+
+    **kwargs
+        Any other options are passed to the writer for the format, e.g. the
+        properties to write as columns in SMILES files.
     """
 
     if type(file_name) is not str:
@@ -61,12 +72,20 @@ def write(
     if extension is None:
         raise NameError("Extension could not be identified")
 
-    if extension not in formats.registries.REGISTERED_WRITERS.keys():
+    entry = formats.registries.get_writer(extension)
+    if entry is None:
         raise KeyError(
             "write_structure_step: the file format %s was not recognized." % extension
         )
 
-    writer = formats.registries.REGISTERED_WRITERS[extension]["function"]
+    writer = entry["function"]
+
+    # Models of ensembles read without their coordinates need them before writing
+    if isinstance(configurations, (list, tuple)):
+        for configuration in configurations:
+            ensure_coordinates(configuration)
+    else:
+        configurations = _with_coordinates(configurations)
 
     writer(
         file_name,
@@ -76,4 +95,13 @@ def write(
         printer=printer,
         references=references,
         bibliography=bibliography,
+        n_workers=n_workers,
+        **kwargs,
     )
+
+
+def _with_coordinates(configurations):
+    """Read any coordinates left until needed as the configurations are written."""
+    for configuration in configurations:
+        ensure_coordinates(configuration)
+        yield configuration
@@ -14,6 +14,7 @@ directory, and is used for all normal output from this step.
 import logging
 from pathlib import PurePath
 
+from .formats.compression import split_suffix
 import read_structure_step
 from .write import write
 import seamm
@@ -124,9 +125,7 @@ class WriteStructure(seamm.Node):
         if file_type != "from extension":
             extension = file_type.split()[0]
         else:
-            extension = path.suffix
-            if extension == ".gz":
-                extension = path.with_suffix("").suffix
+            extension = split_suffix(path)[0].suffix
 
         if extension == "":
             raise RuntimeError(
@@ -179,9 +178,9 @@ class WriteStructure(seamm.Node):
             )
         else:
             n_per_file = int(n_per_file)
-            if path.suffix == ".gz":
-                base = path.with_suffix("")
-                suffix = base.suffix + ".gz"
+            base, compression = split_suffix(path)
+            if compression is not None:
+                suffix = base.suffix + path.suffix
                 stem = str(base.with_suffix(""))
             else:
                 suffix = path.suffix
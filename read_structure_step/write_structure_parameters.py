@@ -11,6 +11,7 @@ import seamm
 logger = logging.getLogger(__name__)
 
 
+formats.registries.load_deferred()
 _filetypes = sorted(formats.registries.REGISTERED_WRITERS.keys())
 
 
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for reading the structure files in archives, directories and globs."""
+
+import io
+from pathlib import Path
+from pathlib import PurePath
+import tarfile
+import zipfile
+
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+from read_structure_step.formats.archive import archive_members
+from read_structure_step.formats.archive import is_archive
+from read_structure_step.formats.archive import parse_members
+from read_structure_step.formats.parallel import prefetch
+from read_structure_step.formats.sources import Stream
+from . import build_filenames
+
+data_files = {
+    "a.sdf": "3TR_model.sdf",
+    "b.xyz": "3TR_model.xyz",
+    "c.mol2": "3TR_model.mol2",
+    "noext": "3TR_model.sdf",
+    ".hidden.sdf": "3TR_model.sdf",
+}
+names = ["a.sdf", "b.xyz", "c.mol2", "noext"]
+
+
+@pytest.fixture(params=["tar", "tgz", "zip", "directory", "glob"])
+def archive(tmp_path, request):
+    """Structure files in several formats in an archive, directory or pattern."""
+    contents = {
+        name: Path(build_filenames.build_data_filename(file_name)).read_bytes()
+        for name, file_name in data_files.items()
+    }
+    kind = request.param
+    if kind in ("tar", "tgz"):
+        path = tmp_path / f"structures.{kind}"
+        with tarfile.open(path, "w" if kind == "tar" else "w:gz") as tar:
+            info = tarfile.TarInfo("dir")
+            info.type = tarfile.DIRTYPE
+            tar.addfile(info)
+            for name, data in contents.items():
+                info = tarfile.TarInfo(f"dir/{name}")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+    elif kind == "zip":
+        path = tmp_path / "structures.zip"
+        with zipfile.ZipFile(path, "w") as archive:
+            for name, data in contents.items():
+                archive.writestr(f"dir/{name}", data)
+    else:
+        path = tmp_path / "tree"
+        (path / "dir").mkdir(parents=True)
+        (path / ".git").mkdir()
+        (path / ".git" / "x.sdf").write_bytes(contents["a.sdf"])
+        for name, data in contents.items():
+            (path / "dir" / name).write_bytes(data)
+        if kind == "glob":
+            path = str(path / "**" / "*")
+    return path
+
+
+def member_names(members):
+    return [PurePath(name).name for name, _, _ in members]
+
+
+def test_is_archive(archive, tmp_path):
+    assert is_archive(archive)
+    assert not is_archive(tmp_path / "x.sdf.gz")
+
+
+def test_glob_characters(tmp_path):
+    """Existing files with glob characters in their names are not patterns."""
+    path = tmp_path / "ligand[1].sdf"
+    path.write_bytes(
+        Path(build_filenames.build_data_filename("3TR_model.sdf")).read_bytes()
+    )
+    assert not is_archive(path)
+    assert is_archive(tmp_path / "ligand[12].sdf")
+
+    with tarfile.open(tmp_path / "ligands[1].tar", "w") as tar:
+        tar.add(path, arcname=path.name)
+    members = list(archive_members(tmp_path / "ligands[1].tar"))
+    assert member_names(members) == ["ligand[1].sdf"]
+
+
+def test_members(archive):
+    members = list(archive_members(archive))
+    if isinstance(archive, str):
+        # Glob patterns are in the order of the file system.
+        members.sort()
+    assert member_names(members) == names
+    assert [extension for _, extension, _ in members] == [
+        ".sdf",
+        ".xyz",
+        ".mol2",
+        None,
+    ]
+    for name, _, source in members:
+        assert isinstance(source, (str, Stream))
+
+
+def test_streams(archive):
+    """Members of archives are streams, read without extracting them."""
+    if not isinstance(archive, Path) or archive.is_dir():
+        pytest.skip("files are given as paths")
+    for name, extension, source in archive_members(archive):
+        assert isinstance(source, Stream)
+        with source.open() as fd:
+            head = fd.read(4)
+        if extension == ".xyz":
+            assert head == b"10\n\n"
+
+
+def test_extensions(archive):
+    members = list(archive_members(archive, extensions=[".xyz"], in_memory=True))
+    assert member_names(members) == ["b.xyz"]
+
+
+def test_parse(archive):
+    members = archive_members(archive, in_memory=True)
+    results = [
+        (name, result) for (name, _, _), result in parse_members(members, n_workers=2)
+    ]
+    if isinstance(archive, str):
+        results.sort(key=lambda item: item[0])
+
+    assert [PurePath(name).name for name, _ in results] == names
+    extensions = [result["extension"] for _, result in results]
+    assert extensions == [".sdf", ".xyz", ".mol2", ".sdf"]
+
+    # MOL2 has no streaming reader, so is left for the main process.
+    n_atoms = [
+        None if result["records"] is None else len(result["records"][0][1]["atnos"])
+        for _, result in results
+    ]
+    assert n_atoms == [10, 10, None, 10]
+
+
+def test_prefetch():
+    assert list(prefetch(range(100), maxsize=4)) == list(range(100))
+
+
+def test_prefetch_error():
+    def items():
+        yield 1
+        raise RuntimeError("broken archive")
+
+    with pytest.raises(RuntimeError, match="broken archive"):
+        list(prefetch(items()))
+
+
+def test_prefetch_early_stop():
+    produced = []
+
+    def items():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    for i in prefetch(items(), maxsize=2):
+        if i == 5:
+            break
+    assert len(produced) < 10
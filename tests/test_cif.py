@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for reading CIF files."""
+
+import gzip
+import lzma
+
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+from read_structure_step import ensure_coordinates
+from read_structure_step.formats import record_index
+from read_structure_step.formats.cif.mmcif import parse_atom_site
+from read_structure_step.formats.cif.mmcif import parse_ensemble
+from read_structure_step.formats.record_index import BlockIndex
+from read_structure_step.formats.record_index import sidecar_path
+
+from molsystem.system_db import SystemDB
+
+nacl = """\
+data_NaCl
+_cell_length_a 5.64
+_cell_length_b 5.64
+_cell_length_c 5.64
+_cell_angle_alpha 90
+_cell_angle_beta 90
+_cell_angle_gamma 90
+_symmetry_space_group_name_H-M 'F m -3 m'
+loop_
+_atom_site_label
+_atom_site_type_symbol
+_atom_site_fract_x
+_atom_site_fract_y
+_atom_site_fract_z
+Na1 Na 0 0 0
+Cl1 Cl 0.5 0.5 0.5
+loop_
+_geom_bond_atom_site_label_1
+_geom_bond_atom_site_label_2
+_geom_bond_site_symmetry_2
+Na1 Cl1 1_554
+"""
+
+kcl = """\
+data_KCl
+_cell_length_a 6.29
+_cell_length_b 6.29
+_cell_length_c 6.29
+_cell_angle_alpha 90
+_cell_angle_beta 90
+_cell_angle_gamma 90
+_symmetry_space_group_name_H-M 'P -1'
+loop_
+_atom_site_label
+_atom_site_type_symbol
+_atom_site_fract_x
+_atom_site_fract_y
+_atom_site_fract_z
+K1 K 0 0 0
+Cl1 Cl 0.5 0.5 0.5
+"""
+
+mmcif = """\
+data_1ABC
+#
+_entry.id   1ABC
+#
+loop_
+_chem_comp.id
+_chem_comp.type
+A   'RNA linking'
+GLY 'L-peptide linking'
+#
+loop_
+_atom_site.group_PDB
+_atom_site.id
+_atom_site.type_symbol
+_atom_site.label_atom_id
+_atom_site.label_alt_id
+_atom_site.label_comp_id
+_atom_site.label_asym_id
+_atom_site.label_entity_id
+_atom_site.label_seq_id
+_atom_site.pdbx_PDB_ins_code
+_atom_site.Cartn_x
+_atom_site.Cartn_y
+_atom_site.Cartn_z
+_atom_site.occupancy
+_atom_site.B_iso_or_equiv
+_atom_site.pdbx_formal_charge
+_atom_site.auth_seq_id
+ATOM   1    N N     . GLY A 1 1 ? -6.960  18.124 10.450 1.00 30.00 ? 1
+ATOM   2    C CA    . GLY A 1 1 ? -5.960  18.124 10.450 1.00 30.00 ? 1
+ATOM   3    O "O5'" . A   B 2 . ? 1.5     2.25   -3.0   0.50 20.00 -1 2
+HETATM 4    Zn ZN   . ZN  C 3 . ? 10      11     12     1.00 40.00 2 3
+#
+loop_
+_pdbx_struct_oper_list.id
+_pdbx_struct_oper_list.type
+1 'identity operation'
+"""
+
+
+@pytest.fixture()
+def system_db():
+    """Create a system db, system and configuration."""
+    db = SystemDB(filename="file:seamm_db?mode=memory&cache=shared")
+    db.create_system(name="default").create_configuration(name="default")
+
+    yield db
+
+    db.close()
+    try:
+        del db
+    except:  # noqa: E722
+        print("Caught error deleting the database")
+
+
+def summary(configuration):
+    return (
+        configuration.system.name,
+        configuration.name,
+        configuration.cell.parameters,
+        configuration.symmetry.group,
+        configuration.symmetry.symops,
+        configuration.atoms.get_as_dict(asymmetric=True)["name"],
+        configuration.atoms.symbols,
+        configuration.coordinates,
+        configuration.bonds.n_bonds,
+    )
+
+
+@pytest.mark.parametrize("indices", ["1:end", "2:3"])
+def test_workers(tmp_path, system_db, indices):
+    """The data blocks are parsed in worker processes, in the order of the file."""
+    path = tmp_path / "salts.cif"
+    path.write_text(nacl + kcl + nacl.replace("NaCl", "NaCl_2"))
+
+    results = []
+    for n_workers in (1, 2):
+        system = system_db.create_system()
+        results.append(
+            read_structure_step.read(
+                str(path),
+                system.create_configuration(),
+                system_db=system_db,
+                system=system,
+                indices=indices,
+                system_name="from file",
+                n_workers=n_workers,
+            )
+        )
+    serial, parallel = results
+
+    names = ["NaCl", "KCl", "NaCl_2"] if indices == "1:end" else ["KCl", "NaCl_2"]
+    assert [c.system.name for c in parallel] == names
+    assert [summary(c) for c in parallel] == [summary(c) for c in serial]
+    assert parallel[-1].n_atoms == 8
+    assert parallel[-1].bonds.n_bonds == 32
+
+
+def read(path, system_db, **kwargs):
+    system = system_db.create_system()
+    return read_structure_step.read(
+        str(path),
+        system.create_configuration(),
+        system_db=system_db,
+        system=system,
+        system_name="from file",
+        **kwargs,
+    )
+
+
+def test_named_blocks(tmp_path, system_db, monkeypatch):
+    monkeypatch.setattr(record_index, "min_saved_size", 0)
+    path = tmp_path / "salts.cif"
+    path.write_text(nacl + kcl + nacl.replace("NaCl", "NaCl_2"))
+
+    # The index is built when the whole file is first read
+    assert [c.system.name for c in read(path, system_db)] == ["NaCl", "KCl", "NaCl_2"]
+    assert BlockIndex.load(path).names == ["NaCl", "KCl", "NaCl_2"]
+
+    configurations = read(path, system_db, indices="data_nacl_2,data_KCl,data_X")
+    assert [c.system.name for c in configurations] == ["KCl", "NaCl_2"]
+    assert [c.n_atoms for c in configurations] == [2, 8]
+
+    # A changed file is indexed again
+    path.write_text(kcl + nacl)
+    configurations = read(path, system_db, indices="data_NaCl")
+    assert [c.system.name for c in configurations] == ["NaCl"]
+    assert BlockIndex.load(path).names == ["KCl", "NaCl"]
+
+
+def test_no_index_for_small_file(tmp_path, system_db):
+    path = tmp_path / "salts.cif"
+    path.write_text(nacl + kcl)
+
+    assert [c.system.name for c in read(path, system_db)] == ["NaCl", "KCl"]
+    assert not sidecar_path(path).exists()
+
+
+def test_no_index_for_partial_read(tmp_path, system_db, monkeypatch):
+    monkeypatch.setattr(record_index, "min_saved_size", 0)
+    path = tmp_path / "salts.cif"
+    path.write_text(nacl + kcl + nacl.replace("NaCl", "NaCl_2"))
+
+    assert [c.system.name for c in read(path, system_db, indices="1")] == ["NaCl"]
+    assert not sidecar_path(path).exists()
+
+
+def test_compressed(tmp_path, system_db):
+    """Compressed files are streamed rather than memory-mapped."""
+    text = nacl + kcl + nacl.replace("NaCl", "NaCl_2")
+    path = tmp_path / "salts.cif"
+    path.write_text(text)
+    gz_path = tmp_path / "salts.cif.gz"
+    with gzip.open(gz_path, "wt") as fd:
+        fd.write(text)
+
+    for indices in ("1:end", "2", "data_NaCl_2"):
+        expected = read(path, system_db, indices=indices)
+        configurations = read(gz_path, system_db, indices=indices)
+        assert [summary(c) for c in configurations] == [summary(c) for c in expected]
+
+
+def atoms(configuration):
+    data = configuration.atoms.get_as_dict(asymmetric=True)
+    return {k: v for k, v in data.items() if k not in ("id", "configuration")}
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        mmcif,
+        mmcif.replace(
+            "_atom_site.B_iso", "_atom_site.pdbx_PDB_model_num\n_atom_site.B_iso"
+        )
+        .replace(" 1.00 ", " 1.00 1 ")
+        .replace(" 0.50 ", " 0.50 1 "),
+    ],
+    ids=["atoms", "model number"],
+)
+def test_mmcif_native(tmp_path, system_db, text):
+    """The native parser gives the same atoms as from_mmcif_text."""
+    path = tmp_path / "1abc.mmcif"
+    path.write_text(text)
+    (configuration,) = read(path, system_db, configuration_name=None)
+    assert configuration.name == "1ABC"
+    assert configuration.n_atoms == 4
+    assert configuration.atoms.symbols == ["N", "C", "O", "Zn"]
+
+    expected = system_db.create_system().create_configuration()
+    expected.from_mmcif_text(mmcif)
+    assert atoms(configuration) == atoms(expected)
+
+
+@pytest.mark.parametrize(
+    "old, new",
+    [
+        ("GLY A 1 1", "'GLY A' A 1 1"),
+        (" 1 1 ? -6.960", " 1 1 ?\n-6.960"),
+        ("_atom_site.Cartn_x", "_atom_site.fract_x"),
+        ("_entry.id   1ABC", ""),
+        ("ATOM   2 ", "# A comment\nATOM   2 "),
+    ],
+    ids=["quoted space", "line break", "fractional", "no entry", "comment"],
+)
+def test_mmcif_not_native(old, new):
+    """The blocks that are left to from_mmcif_text."""
+    assert parse_atom_site(mmcif) is not None
+    text = mmcif.replace(old, new)
+    assert text != mmcif
+    assert parse_atom_site(text) is None
+
+
+def ensemble(n_models=3, representative=2):
+    """An NMR ensemble of the test structure, moving the first atom in each model."""
+    text = mmcif.replace(
+        "_atom_site.B_iso", "_atom_site.pdbx_PDB_model_num\n_atom_site.B_iso"
+    ).replace(
+        "_entry.id   1ABC\n#\n",
+        "_entry.id   1ABC\n#\n"
+        f"_pdbx_nmr_ensemble.conformers_submitted_total_number {n_models}\n"
+        f"_pdbx_nmr_representative.conformer_id {representative}\n#\n",
+    )
+    start = text.index("ATOM   1")
+    end = text.index("#\n", start)
+    rows = text[start:end]
+    models = [
+        rows.replace(" 1.00 ", f" 1.00 {i} ")
+        .replace(" 0.50 ", f" 0.50 {i} ")
+        .replace("-6.960", f"{i}.960")
+        for i in range(1, n_models + 1)
+    ]
+    return text[:start] + "".join(models) + text[end:]
+
+
+def test_ensemble(tmp_path, system_db):
+    """Only the coordinates of the first, representative and selected models are read
+    at once, and the others when needed."""
+    path = tmp_path / "1abc.mmcif"
+    path.write_text(ensemble(n_models=4))
+
+    configurations = read(path, system_db, model_indices="4")
+    assert [c.name for c in configurations] == [
+        "model_1",
+        "representative",
+        "model_3",
+        "model_4",
+    ]
+    first, representative, lazy, selected = configurations
+    assert first.system.name == "1ABC"
+    assert first.system.configuration.id == representative.id
+    assert len({c.atomset for c in configurations}) == 1
+    assert all(c.atoms.symbols == ["N", "C", "O", "Zn"] for c in configurations)
+    assert [c.coordinates[0][0] for c in configurations] == [1.96, 2.96, 0.0, 4.96]
+    assert lazy.coordinates[1] == [0.0, 0.0, 0.0]
+
+    assert ensure_coordinates(lazy)
+    assert lazy.coordinates[0:2] == [[3.96, 18.124, 10.45], [-5.96, 18.124, 10.45]]
+    assert not ensure_coordinates(lazy)
+    assert not ensure_coordinates(selected)
+
+    # By default all the models are read at once
+    configurations = read(path, system_db)
+    assert [c.coordinates[0][0] for c in configurations] == [1.96, 2.96, 3.96, 4.96]
+    assert not any(ensure_coordinates(c) for c in configurations)
+
+
+def test_ensemble_deferred(tmp_path, system_db):
+    """The coordinates of deferred models are read by ensure_coordinates, not write."""
+    path = tmp_path / "1abc.mmcif"
+    path.write_text(ensemble(n_models=4))
+    system_id = read(path, system_db, model_indices="1")[0].system.id
+
+    # A fresh view of the stored models, as another step would see them
+    system = system_db.get_system(system_id)
+    deferred = system.get_configuration(system.configuration_ids[2])
+    assert deferred.coordinates[0] == [0.0, 0.0, 0.0]
+    assert ensure_coordinates(deferred)
+
+    stored = system.get_configuration(deferred.id)
+    assert stored.coordinates[0:2] == [[3.96, 18.124, 10.45], [-5.96, 18.124, 10.45]]
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".xz"])
+def test_ensemble_compressed(tmp_path, system_db, suffix):
+    """The coordinates of all the models in compressed files are read at once."""
+    path = tmp_path / ("1abc.mmcif" + suffix)
+    opener = gzip.open if suffix == ".gz" else lzma.open
+    with opener(path, "wt") as fd:
+        fd.write(ensemble(n_models=4))
+
+    configurations = read(path, system_db)
+    assert [c.coordinates[0][0] for c in configurations] == [1.96, 2.96, 3.96, 4.96]
+    assert not any(ensure_coordinates(c) for c in configurations)
+
+
+def test_ensemble_changed(tmp_path, system_db):
+    path = tmp_path / "1abc.mmcif"
+    path.write_text(ensemble())
+    lazy = read(path, system_db, model_indices="1")[2]
+    path.write_text(ensemble().replace("1ABC", "2ABC"))
+    with pytest.raises(RuntimeError):
+        ensure_coordinates(lazy)
+
+
+def test_ensemble_not_native():
+    """Ensembles whose models have different atoms are left to from_mmcif_text."""
+    assert parse_ensemble(ensemble()) is not None
+    zinc = "HETATM 4    Zn ZN   . ZN  C 3 . ? 10      11     12     1.00 2 40.00 2 3\n"
+    assert zinc in ensemble()
+    text = ensemble().replace(zinc, "")
+    assert parse_ensemble(text) is None
+    assert parse_ensemble(mmcif) is None
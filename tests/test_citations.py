@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the shared Open Babel version and citations."""
+
+import json
+
+import pytest  # noqa: F401
+from openbabel import openbabel
+
+from read_structure_step.formats.openbabel_io import citations
+
+bibliography = {
+    "openbabel": "@article{openbabel}",
+    "obabel": "@misc{obabel, version={$version}, month={$month}, year={$year}}",
+}
+
+
+class References(object):
+    """A stand-in for the reference handler that keeps the citations."""
+
+    def __init__(self):
+        self.citations = {}
+
+    def cite(self, raw=None, alias=None, **kwargs):
+        self.citations[alias] = raw
+
+
+@pytest.fixture()
+def probe(tmp_path, monkeypatch):
+    """Count the probes of the obabel executable, with a private cache."""
+    calls = []
+
+    def release_date(version):
+        calls.append(version)
+        return "Oct", "2020"
+
+    monkeypatch.setattr(citations, "_release_date", release_date)
+    monkeypatch.setattr(citations, "cache_path", tmp_path / "version.json")
+    monkeypatch.setattr(citations, "_version", None)
+    return calls
+
+
+def test_version_once(probe):
+    version = citations.openbabel_version()
+    assert version == {
+        "version": openbabel.OBReleaseVersion(),
+        "month": "Oct",
+        "year": "2020",
+    }
+    assert citations.openbabel_version() is version
+    assert len(probe) == 1
+
+
+def test_disk_cache(probe, monkeypatch):
+    version = citations.openbabel_version()
+    cache = json.loads(citations.cache_path.read_text())
+    assert list(cache.values()) == [version]
+
+    # A new process only needs the cache.
+    monkeypatch.setattr(citations, "_version", None)
+    assert citations.openbabel_version() == version
+    assert len(probe) == 1
+
+
+def test_no_disk_cache(probe, monkeypatch):
+    monkeypatch.setattr(citations, "cache_path", None)
+    citations.openbabel_version()
+    monkeypatch.setattr(citations, "_version", None)
+    citations.openbabel_version()
+    assert len(probe) == 2
+
+
+def test_cite(probe):
+    references = References()
+    citations.cite_openbabel(references, bibliography)
+    assert references.citations == {
+        "openbabel_jcinf": "@article{openbabel}",
+        "obabel-exe": (
+            "@misc{obabel, version={"
+            + openbabel.OBReleaseVersion()
+            + "}, month={Oct}, year={2020}}"
+        ),
+    }
+    citations.cite_openbabel(References(), bibliography)
+    assert len(probe) == 1
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the transparent compression of structure files."""
+
+import bz2
+import gzip
+import lzma
+from pathlib import Path
+import shutil
+
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+from read_structure_step.formats.compression import detect_compression
+from read_structure_step.formats.compression import open_file
+from read_structure_step.formats.compression import split_suffix
+from read_structure_step.formats.compression import zstandard
+from . import build_filenames
+
+from molsystem.system_db import SystemDB
+
+compressors = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+have_zstd = zstandard is not None or shutil.which("zstd") is not None
+
+
+@pytest.fixture()
+def configuration():
+    """Create a system db, system and configuration."""
+    db = SystemDB(filename="file:seamm_db?mode=memory&cache=shared")
+    system = db.create_system(name="default")
+    configuration = system.create_configuration(name="default")
+
+    yield configuration
+
+    db.close()
+    try:
+        del db
+    except:  # noqa: E722
+        print("Caught error deleting the database")
+
+
+def compress(tmp_path, structure, suffix):
+    """Write a compressed copy of a test file."""
+    data = Path(build_filenames.build_data_filename(structure)).read_bytes()
+    path = tmp_path / (structure + suffix)
+    with compressors[suffix](path, "wb") as fd:
+        fd.write(data)
+    return path
+
+
+@pytest.mark.parametrize(
+    "suffix",
+    [
+        ".gz",
+        ".bz2",
+        ".xz",
+        pytest.param(
+            ".zst",
+            marks=pytest.mark.skipif(
+                not have_zstd, reason="zstandard or zstd is not available"
+            ),
+        ),
+    ],
+)
+def test_round_trip(tmp_path, suffix):
+    text = "Line one\nLine two\n" * 100
+    path = tmp_path / ("text.txt" + suffix)
+    with open_file(path, "w") as fd:
+        fd.write(text)
+
+    assert path.read_bytes() != text.encode()
+    assert detect_compression(path) == split_suffix(path)[1]
+    with open_file(path, "r") as fd:
+        assert fd.read() == text
+
+
+def test_detect_by_content(tmp_path):
+    """A gzipped file is recognized without the .gz suffix."""
+    path = tmp_path / "text.txt"
+    with gzip.open(path, "wt") as fd:
+        fd.write("Compressed text\n")
+
+    assert detect_compression(path) == "gzip"
+    with open_file(path, "r") as fd:
+        assert fd.read() == "Compressed text\n"
+
+
+def test_split_suffix():
+    assert split_suffix("a/b.sdf.gz") == (Path("a/b.sdf"), "gzip")
+    assert split_suffix("b.tgz") == (Path("b.tar"), "gzip")
+    assert split_suffix("b.sdf") == (Path("b.sdf"), None)
+
+
+@pytest.mark.skipif(shutil.which("xz") is None, reason="xz is not installed")
+def test_threads(tmp_path):
+    text = "".join(f"Line {i}\n" for i in range(10000))
+    path = tmp_path / "text.txt.xz"
+    with open_file(path, "w", threads=2) as fd:
+        fd.write(text)
+    with open_file(path, "r", threads=2) as fd:
+        assert fd.read() == text
+    assert lzma.decompress(path.read_bytes()).decode() == text
+
+
+@pytest.mark.parametrize("suffix", [".bz2", ".xz"])
+@pytest.mark.parametrize(
+    "structure", ["3TR_model.mol2", "3TR_model.xyz", "3TR_model.sdf"]
+)
+def test_read(tmp_path, configuration, structure, suffix):
+    path = compress(tmp_path, structure, suffix)
+    read_structure_step.read(str(path), configuration)
+
+    assert configuration.n_atoms == 10
+    assert configuration.bonds.n_bonds == 10
+
+
+def test_read_smiles(tmp_path, configuration):
+    path = tmp_path / "molecules.smi.xz"
+    with lzma.open(path, "wt") as fd:
+        fd.write("CCO ethanol\n")
+    read_structure_step.read(str(path), configuration, add_hydrogens=True)
+
+    assert configuration.n_atoms == 9
+
+
+@pytest.mark.parametrize("structure", ["3TR_model.sdf", "3TR_model.xyz"])
+def test_write(tmp_path, configuration, structure):
+    file_name = build_filenames.build_data_filename(structure)
+    read_structure_step.read(file_name, configuration)
+
+    path = tmp_path / (structure + ".xz")
+    read_structure_step.write(
+        str(path), [configuration], extension=Path(structure).suffix
+    )
+
+    assert detect_compression(path) == "xz"
+    with lzma.open(path, "rt") as fd:
+        text = fd.read()
+    assert "N" in text
+
+    configuration.clear()
+    read_structure_step.read(str(path), configuration)
+    assert configuration.n_atoms == 10
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the cache of 3-D structures built from SMILES."""
+
+import os
+import sqlite3
+
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+from read_structure_step import iter_structures
+from read_structure_step.formats.smi import smi
+from read_structure_step.formats.smi.geometry_cache import cache_file
+from read_structure_step.formats.smi.geometry_cache import default_path
+from read_structure_step.formats.smi.geometry_cache import GeometryCache
+
+smiles = """\
+CCO ethanol
+c1ccccc1 benzene
+CC(=O)O acetic acid
+OCC ethanol again
+"""
+
+
+@pytest.fixture()
+def smi_file(tmp_path):
+    path = tmp_path / "molecules.smi"
+    path.write_text(smiles)
+    return path
+
+
+def test_cache_file(tmp_path):
+    assert cache_file(None) is None
+    assert cache_file(False) is None
+    assert cache_file(True) == str(default_path)
+    assert cache_file(tmp_path / "x.db") == str(tmp_path / "x.db")
+
+
+def test_lru(tmp_path):
+    cache = GeometryCache(tmp_path / "cache.db", max_entries=2)
+    cache.put("a", {"title": "A", "atnos": [6]})
+    cache.put("b", {"atnos": [7]})
+    assert cache.get("a") == {"atnos": [6]}
+    cache.put("c", {"atnos": [8]})
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert (cache.n_hits, cache.n_misses) == (3, 1)
+    cache.close()
+
+    # The cache persists
+    cache = GeometryCache(tmp_path / "cache.db")
+    assert len(cache) == 2
+    cache.close()
+
+
+def test_batched_use(tmp_path):
+    """The times structures were used are written in batches."""
+    path = tmp_path / "cache.db"
+    cache = GeometryCache(path, flush_interval=2)
+    cache.put("a", {"atnos": [6]})
+    cache.put("b", {"atnos": [7]})
+
+    def last_used():
+        with sqlite3.connect(path) as db:
+            return dict(db.execute("SELECT key, last_used FROM geometry"))
+
+    before = last_used()
+    assert cache.get("a") is not None
+    assert last_used() == before
+    assert cache.get("b") is not None
+    after = last_used()
+    assert after["a"] > before["a"] and after["b"] > before["b"]
+
+    assert cache.get("a") is not None
+    cache.close()
+    assert last_used()["a"] > after["a"]
+
+
+def test_key():
+    assert GeometryCache.key("CCO") != GeometryCache.key("CCO", add_hydrogens=False)
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_read(smi_file, tmp_path, n_workers):
+    path = tmp_path / "cache.db"
+    first = list(
+        iter_structures(
+            str(smi_file), add_hydrogens=True, geometry_cache=path, n_workers=n_workers
+        )
+    )
+    assert [record["title"] for record in first] == [
+        "ethanol",
+        "benzene",
+        "acetic acid",
+        "ethanol again",
+    ]
+    assert [len(record["atnos"]) for record in first] == [9, 12, 8, 9]
+
+    # Both SMILES for ethanol give the same structure.
+    assert first[3]["coordinates"] == first[0]["coordinates"]
+    cache = GeometryCache(path)
+    assert len(cache) == 3
+    cache.close()
+
+    # The connection of this process is closed after reading
+    assert (os.getpid(), str(path)) not in smi._caches
+
+    def last_used():
+        with sqlite3.connect(path) as db:
+            return dict(db.execute("SELECT key, last_used FROM geometry"))
+
+    before = last_used()
+    second = list(
+        iter_structures(
+            str(smi_file), add_hydrogens=True, geometry_cache=path, n_workers=n_workers
+        )
+    )
+    # The structures found in the cache are marked as used
+    after = last_used()
+    assert all(after[key] > t for key, t in before.items())
+    assert [record["title"] for record in second] == [
+        record["title"] for record in first
+    ]
+    assert [record["coordinates"] for record in second] == [
+        record["coordinates"] for record in first
+    ]
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the generalized indices selecting structures."""
+
+from pathlib import Path
+
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+from read_structure_step.formats.indices import parse_indices
+from . import build_filenames
+
+from molsystem.system_db import SystemDB
+
+smiles = """\
+CCO ethanol
+c1ccccc1 benzene
+# A comment
+CC(=O)O acetic acid
+C methane
+"""
+
+
+@pytest.fixture()
+def system_db():
+    """Create a system db, system and configuration."""
+    db = SystemDB(filename="file:seamm_db?mode=memory&cache=shared")
+    db.create_system(name="default").create_configuration(name="default")
+
+    yield db
+
+    db.close()
+    try:
+        del db
+    except:  # noqa: E722
+        print("Caught error deleting the database")
+
+
+@pytest.mark.parametrize(
+    "indices, n, expected",
+    [
+        ("1:end", 5, [1, 2, 3, 4, 5]),
+        (None, 3, [1, 2, 3]),
+        ("1:3", 10, [1, 2, 3]),
+        ("5,17,200:300:10", 1000, [5, 17] + list(range(200, 301, 10))),
+        ("-3:end", 10, [8, 9, 10]),
+        ("2", 10, [2]),
+        (":2,9:", 10, [1, 2, 9, 10]),
+        ("1:end:3", 10, [1, 4, 7, 10]),
+        ("-1", 10, [10]),
+    ],
+)
+def test_resolve(indices, n, expected):
+    selection = parse_indices(indices)
+    assert selection.resolve(n) == expected
+
+    selection.n_structures = n
+    assert [i for i in range(1, n + 1) if i in selection] == expected
+
+
+def test_open_ended():
+    selection = parse_indices("3:5,10:end")
+    assert not selection.needs_count
+    assert selection.last is None
+    assert [i for i in range(1, 13) if i in selection] == [3, 4, 5, 10, 11, 12]
+
+    selection = parse_indices("3:5,8")
+    assert selection.last == 8
+    assert selection.done(8)
+    assert not selection.done(7)
+
+
+def test_needs_count():
+    selection = parse_indices("-10:end")
+    assert selection.needs_count
+    with pytest.raises(RuntimeError):
+        1 in selection
+
+
+@pytest.mark.parametrize("indices", ["0", "a:b", "1:2:3:4", "1:10:-1", "CCO", "data_"])
+def test_bad_indices(indices):
+    with pytest.raises(ValueError):
+        parse_indices(indices)
+
+
+def test_names():
+    selection = parse_indices("2,data_ACETCR, data_1abc")
+    assert selection.names == ["ACETCR", "1abc"]
+    assert selection.needs_count
+    with pytest.raises(RuntimeError):
+        2 in selection
+
+    blocks = {"1abc": 0, "acetcr": 4}
+    missing = selection.resolve_names(lambda name: blocks.get(name.lower()))
+    assert missing == []
+    selection.n_structures = 10
+    assert selection.selected() == [1, 2, 5]
+
+
+def test_missing_names():
+    selection = parse_indices("data_X")
+    assert selection.resolve_names(lambda name: None) == ["X"]
+    selection.n_structures = 3
+    assert selection.selected() == []
+
+
+def test_names_not_supported(tmp_path, system_db):
+    path = tmp_path / "molecules.smi"
+    path.write_text(smiles)
+
+    system = system_db.create_system(name="smi")
+    with pytest.raises(RuntimeError):
+        read_structure_step.read(
+            str(path),
+            system.create_configuration(),
+            system_db=system_db,
+            system=system,
+            indices="data_ethanol",
+        )
+
+
+def test_sdf_indices(tmp_path, system_db):
+    text = Path(build_filenames.build_data_filename("3TR_model.sdf")).read_text()
+    text = text.rstrip() + "\n"
+    path = tmp_path / "many.sdf"
+    path.write_text("".join(text.replace("3TR", f"{i}TR") for i in range(1, 8)))
+
+    system = system_db.create_system(name="sdf")
+    configurations = read_structure_step.read(
+        str(path),
+        system.create_configuration(),
+        system_db=system_db,
+        system=system,
+        indices="2,-2:end",
+        system_name="from file",
+    )
+    names = [c.system.name for c in configurations]
+    assert names == [
+        "2TR - Model conformer",
+        "6TR - Model conformer",
+        "7TR - Model conformer",
+    ]
+
+
+def test_smi_indices(tmp_path, system_db):
+    path = tmp_path / "molecules.smi"
+    path.write_text(smiles)
+
+    system = system_db.create_system(name="smi")
+    configurations = read_structure_step.read(
+        str(path),
+        system.create_configuration(),
+        system_db=system_db,
+        system=system,
+        indices="2:3",
+        system_name="from file",
+        configuration_name="sequential",
+    )
+    assert [c.system.name for c in configurations] == ["benzene", "acetic acid"]
+    assert [c.name for c in configurations] == ["2", "3"]
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for streaming the structures in a file with iter_structures."""
+
+from pathlib import Path
+
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+from read_structure_step import iter_structures
+from . import build_filenames
+
+from molsystem.system_db import SystemDB
+
+smiles = """\
+CCO ethanol
+c1ccccc1 benzene
+# A comment
+CC(=O)O acetic acid
+C methane
+"""
+
+
+@pytest.fixture()
+def sdf_file(tmp_path):
+    """An SDF file with several copies of the test structure."""
+    text = Path(build_filenames.build_data_filename("3TR_model.sdf")).read_text()
+    text = text.rstrip() + "\n"
+    path = tmp_path / "many.sdf"
+    path.write_text("".join(text.replace("3TR", f"{i}TR") for i in range(1, 8)))
+    return path
+
+
+@pytest.fixture()
+def system_db():
+    """Create a system db, system and configuration."""
+    db = SystemDB(filename="file:seamm_db?mode=memory&cache=shared")
+    db.create_system(name="default").create_configuration(name="default")
+
+    yield db
+
+    db.close()
+    try:
+        del db
+    except:  # noqa: E722
+        print("Caught error deleting the database")
+
+
+def test_sdf_records(sdf_file):
+    records = list(iter_structures(str(sdf_file)))
+    assert [record["title"] for record in records] == [
+        f"{i}TR - Model conformer" for i in range(1, 8)
+    ]
+    assert records[0]["atnos"] == [7, 7, 6, 7, 6, 7, 1, 1, 1, 1]
+    assert len(records[0]["bonds"]) == 10
+
+
+def test_stop_early(sdf_file):
+    titles = []
+    for record in iter_structures(str(sdf_file), indices="2:end"):
+        titles.append(record["title"])
+        if len(titles) == 2:
+            break
+    assert titles == ["2TR - Model conformer", "3TR - Model conformer"]
+
+
+def test_smi_records(tmp_path):
+    path = tmp_path / "molecules.smi"
+    path.write_text(smiles)
+
+    records = list(iter_structures(str(path), indices="2:3", add_hydrogens=True))
+    assert [record["title"] for record in records] == ["benzene", "acetic acid"]
+    assert len(records[0]["atnos"]) == 12
+
+
+def test_smi_workers(tmp_path):
+    """The 3-D structures are built in worker processes, in the order of the file."""
+    path = tmp_path / "molecules.smi"
+    path.write_text(smiles + "not(a)smiles bad\nCCN ethylamine\n")
+
+    serial = list(iter_structures(str(path), add_hydrogens=True))
+    parallel = list(iter_structures(str(path), add_hydrogens=True, n_workers=2))
+    assert [record["title"] for record in parallel] == [
+        "ethanol",
+        "benzene",
+        "acetic acid",
+        "methane",
+        "ethylamine",
+    ]
+    assert [record["atnos"] for record in parallel] == [
+        record["atnos"] for record in serial
+    ]
+
+
+def test_read_smi_workers(tmp_path, system_db):
+    path = tmp_path / "molecules.smi"
+    path.write_text(smiles)
+
+    system = system_db.create_system()
+    configurations = read_structure_step.read(
+        str(path),
+        system.create_configuration(),
+        system_db=system_db,
+        system=system,
+        add_hydrogens=True,
+        system_name="from file",
+        n_workers=2,
+    )
+    assert [c.system.name for c in configurations] == [
+        "ethanol",
+        "benzene",
+        "acetic acid",
+        "methane",
+    ]
+    assert [c.n_atoms for c in configurations] == [9, 12, 8, 5]
+    assert configurations[1].coordinates[0] != configurations[1].coordinates[1]
+
+
+def test_configurations(sdf_file, system_db):
+    n_systems = system_db.n_systems
+    names = []
+    for configuration in iter_structures(
+        str(sdf_file),
+        indices="1:3",
+        system_db=system_db,
+        system_name="from file",
+        configuration_name="sequential",
+    ):
+        names.append((configuration.system.name, configuration.name))
+        assert configuration.n_atoms == 10
+    assert names == [(f"{i}TR - Model conformer", str(i)) for i in range(1, 4)]
+    assert system_db.n_systems == n_systems + 3
+
+
+def test_no_streaming_reader():
+    path = build_filenames.build_data_filename("3TR_model.xyz")
+    with pytest.raises(KeyError):
+        next(iter_structures(path))
+
+
+def test_smi_without_coordinates(tmp_path):
+    path = tmp_path / "molecules.smi"
+    path.write_text(smiles)
+
+    records = list(iter_structures(str(path), add_hydrogens=True, coordinates="none"))
+    assert [len(record["atnos"]) for record in records] == [9, 12, 8, 5]
+    assert all(xyz == (0.0, 0.0, 0.0) for xyz in records[1]["coordinates"])
+    assert records[1]["data"]["SEAMM|coordinate generation|str|"] == "none"
+
+
+@pytest.mark.parametrize("coordinates", ["later", "lazy"])
+def test_smi_bad_coordinates(tmp_path, coordinates):
+    path = tmp_path / "molecules.smi"
+    path.write_text(smiles)
+    with pytest.raises(ValueError):
+        list(iter_structures(str(path), coordinates=coordinates))
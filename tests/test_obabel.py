@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for multiple structures in the Open Babel fallback reader and writer."""
+
+import gzip
+import time
+from pathlib import Path
+
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+from read_structure_step.formats.openbabel_io.obabel import count_molecules
+from read_structure_step.formats.openbabel_io.obabel import write_file
+from . import build_filenames
+
+from molsystem.system_db import SystemDB
+
+
+@pytest.fixture()
+def xyz_text():
+    """The text of an XYZ file with three frames, with different titles."""
+    text = Path(build_filenames.build_data_filename("3TR_model.xyz")).read_text()
+    lines = text.splitlines()
+    frames = []
+    for i in range(1, 4):
+        lines[1] = f"frame {i}"
+        frames.append("\n".join(lines) + "\n")
+    return "".join(frames)
+
+
+@pytest.fixture()
+def xyz_file(tmp_path, xyz_text):
+    path = tmp_path / "frames.xyz"
+    path.write_text(xyz_text)
+    return path
+
+
+@pytest.fixture()
+def system_db():
+    """Create a system db, system and configuration."""
+    db = SystemDB(filename="file:seamm_db?mode=memory&cache=shared")
+    db.create_system(name="default").create_configuration(name="default")
+
+    yield db
+
+    db.close()
+    try:
+        del db
+    except:  # noqa: E722
+        print("Caught error deleting the database")
+
+
+def read(path, system_db, **kwargs):
+    system = system_db.create_system()
+    return read_structure_step.read(
+        str(path),
+        system.create_configuration(),
+        system_db=system_db,
+        system=system,
+        **kwargs,
+    )
+
+
+def test_count(xyz_file):
+    assert count_molecules(xyz_file, ".xyz") == 3
+
+
+def test_all(xyz_file, system_db):
+    n_systems = system_db.n_systems
+    configurations = read(
+        xyz_file, system_db, system_name="from file", configuration_name="sequential"
+    )
+
+    assert len(configurations) == 3
+    assert system_db.n_systems == n_systems + 3
+    assert [c.system.name for c in configurations] == ["frame 1", "frame 2", "frame 3"]
+    assert [c.name for c in configurations] == ["1", "2", "3"]
+    assert all(c.n_atoms == 10 for c in configurations)
+
+
+@pytest.mark.parametrize("indices, names", [("2:3", ["2", "3"]), ("-1", ["3"])])
+def test_indices(xyz_file, system_db, indices, names):
+    configurations = read(
+        xyz_file, system_db, indices=indices, configuration_name="sequential"
+    )
+    assert [c.name for c in configurations] == names
+
+
+def test_as_configurations(xyz_file, system_db):
+    n_systems = system_db.n_systems
+    configurations = read(xyz_file, system_db, subsequent_as_configurations=True)
+
+    assert len(configurations) == 3
+    assert system_db.n_systems == n_systems + 1
+    assert len({c.system.id for c in configurations}) == 1
+
+
+def test_no_database(xyz_file, system_db):
+    configuration = system_db.create_system().create_configuration()
+    configurations = read_structure_step.read(str(xyz_file), configuration)
+    assert configurations == [configuration]
+    assert configuration.n_atoms == 10
+
+
+def test_compressed(tmp_path, xyz_text, system_db):
+    path = tmp_path / "frames.xyz.gz"
+    with gzip.open(path, "wt") as fd:
+        fd.write(xyz_text)
+
+    assert len(read(path, system_db)) == 3
+
+
+@pytest.mark.parametrize("file_name", ["out.xyz", "out.pdb", "out.cml", "out.xyz.xz"])
+def test_write(tmp_path, xyz_file, system_db, file_name):
+    configurations = read(xyz_file, system_db)
+    path = tmp_path / file_name
+    extension = "." + file_name.split(".")[1]
+    lines = []
+    read_structure_step.write(
+        str(path), configurations, extension=extension, printer=lines.append
+    )
+
+    assert lines[-1].startswith("Wrote 3 structures in")
+    assert len(read(path, system_db)) == 3
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_write_generator(tmp_path, xyz_file, system_db):
+    configurations = read(xyz_file, system_db)
+    path = tmp_path / "out.cml"
+    read_structure_step.write(str(path), (c for c in configurations), extension=".cml")
+
+    text = path.read_text()
+    assert text.count("<molecule") == 3
+    assert text.rstrip().endswith("</cml>")
+
+
+@pytest.mark.parametrize("file_name", ["out.mol2", "out.mol2.gz"])
+def test_write_file(tmp_path, xyz_file, system_db, file_name):
+    configurations = read(xyz_file, system_db)
+    path = tmp_path / file_name
+    written = write_file(path, (c for c in configurations), extension=".mol2")
+    assert [c.id for c in written] == [c.id for c in configurations]
+
+    # Nothing is written if there is nothing to write
+    path.unlink()
+    assert write_file(path, [], extension=".mol2") == []
+    assert list(tmp_path.iterdir()) == [xyz_file]
+
+
+def test_write_throughput(tmp_path, xyz_file, system_db):
+    """The fallback writer should be about as fast as write_sdf."""
+    configurations = 50 * read(xyz_file, system_db)
+
+    t0 = time.perf_counter()
+    read_structure_step.write(
+        str(tmp_path / "out.sdf"), configurations, extension=".sdf"
+    )
+    t_sdf = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    read_structure_step.write(
+        str(tmp_path / "out.mol2"), configurations, extension=".mol2"
+    )
+    t_obabel = time.perf_counter() - t0
+
+    print(f"write_sdf: {t_sdf:.2f} s, Open Babel fallback: {t_obabel:.2f} s")
+    assert t_obabel < 3 * t_sdf
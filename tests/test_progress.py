@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the progress reports while reading files."""
+
+import gzip
+
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+from read_structure_step.formats.progress import open_tracked
+from read_structure_step.formats.progress import Progress
+
+from molsystem.system_db import SystemDB
+
+smiles = """\
+CCO ethanol
+c1ccccc1 benzene
+# A comment
+CC(=O)O acetic acid
+C methane
+"""
+
+
+@pytest.fixture()
+def system_db():
+    """Create a system db, system and configuration."""
+    db = SystemDB(filename="file:seamm_db?mode=memory&cache=shared")
+    db.create_system(name="default").create_configuration(name="default")
+
+    yield db
+
+    db.close()
+    try:
+        del db
+    except:  # noqa: E722
+        print("Caught error deleting the database")
+
+
+def test_bytes(tmp_path):
+    path = tmp_path / "molecules.smi"
+    path.write_text(1000 * smiles)
+    lines = []
+
+    fd, raw = open_tracked(path, "r")
+    with fd, raw:
+        progress = Progress(
+            lines.append, tell=raw.tell, size=path.stat().st_size, interval=0
+        )
+        fd.readline()
+        progress.update(1)
+        for line in fd:
+            pass
+        progress.update(5000)
+
+    assert "% of the file)" in lines[0]
+    assert lines[-1].startswith("\t  5000 (100% of the file)")
+
+
+def test_count():
+    lines = []
+    progress = Progress(lines.append, n_structures=4, interval=0)
+    progress.update(1)
+    assert lines[0].startswith("\t     1 (25%) structures read in 0 seconds.")
+
+
+def test_unknown():
+    lines = []
+    progress = Progress(lines.append, interval=0)
+    progress.update(3)
+    assert lines == ["\t     3 structures read in 0 seconds."]
+
+
+def test_compressed(tmp_path):
+    path = tmp_path / "molecules.smi.gz"
+    with gzip.open(path, "wt") as fd:
+        fd.write(smiles)
+
+    fd, raw = open_tracked(path, "r")
+    with fd, raw:
+        assert fd.read() == smiles
+        assert raw.tell() == path.stat().st_size
+
+
+def test_smi_printer(tmp_path, system_db):
+    path = tmp_path / "molecules.smi"
+    path.write_text(smiles)
+    lines = []
+
+    system = system_db.create_system(name="smi")
+    configurations = read_structure_step.read(
+        str(path),
+        system.create_configuration(),
+        system_db=system_db,
+        system=system,
+        printer=lines.append,
+    )
+    assert len(configurations) == 4
+    assert lines[0] == "Reading the SMILES file molecules.smi."
+    assert lines[-1].startswith("Read 4 structures in")
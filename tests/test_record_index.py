@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the `record_index` module."""
+
+import gzip
+import io
+from pathlib import Path
+
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+from read_structure_step.formats import record_index
+from read_structure_step.formats.indices import parse_indices
+from read_structure_step.formats.record_index import BlockIndex
+from read_structure_step.formats.record_index import BlockScanner
+from read_structure_step.formats.record_index import split_blocks
+from read_structure_step.formats.record_index import RecordIndex, sidecar_path
+from . import build_filenames
+
+from molsystem.system_db import SystemDB
+
+
+@pytest.fixture()
+def sdf_file(tmp_path):
+    """An SDF file with three copies of the test structure."""
+    text = Path(build_filenames.build_data_filename("3TR_model.sdf")).read_text()
+    text = text.rstrip() + "\n"
+    path = tmp_path / "three.sdf"
+    path.write_text(text + text.replace("3TR", "4TR") + text.replace("3TR", "5TR"))
+    return path
+
+
+@pytest.fixture()
+def system_db():
+    """Create a system db, system and configuration."""
+    db = SystemDB(filename="file:seamm_db?mode=memory&cache=shared")
+    db.create_system(name="default").create_configuration(name="default")
+
+    yield db
+
+    db.close()
+    try:
+        del db
+    except:  # noqa: E722
+        print("Caught error deleting the database")
+
+
+def test_build(sdf_file):
+    index = RecordIndex.build(sdf_file)
+    assert len(index) == 3
+
+    with open(sdf_file, "rb") as fd:
+        record = index.read(fd, 1)
+    assert record.startswith(b"4TR")
+    assert record.rstrip().endswith(b"$$$$")
+
+
+def test_save_and_load(sdf_file):
+    index = RecordIndex.build(sdf_file)
+    assert index.save(sdf_file)
+    assert sidecar_path(sdf_file).exists()
+
+    loaded = RecordIndex.load(sdf_file)
+    assert loaded is not None
+    assert list(loaded.offsets) == list(index.offsets)
+
+
+def test_stale_index(sdf_file):
+    RecordIndex.build(sdf_file).save(sdf_file)
+    with open(sdf_file, "a") as fd:
+        fd.write("\n")
+
+    assert RecordIndex.load(sdf_file) is None
+
+
+def test_gzipped(sdf_file):
+    gz_file = sdf_file.with_name(sdf_file.name + ".gz")
+    gz_file.write_bytes(gzip.compress(sdf_file.read_bytes()))
+
+    index = RecordIndex.build(gz_file, opener=gzip.open)
+    with gzip.open(gz_file, "rb") as fd:
+        names = [record[0:3] for _, record in index.records(fd, [2, 0])]
+    assert names == [b"5TR", b"3TR"]
+
+
+def test_load_sdf_uses_index(sdf_file, system_db, monkeypatch):
+    monkeypatch.setattr(record_index, "min_saved_size", 0)
+    configuration = system_db.system.configuration
+    read_structure_step.read(
+        str(sdf_file),
+        configuration,
+        system_db=system_db,
+        system=system_db.system,
+        system_name="from file",
+    )
+    assert sidecar_path(sdf_file).exists()
+    first = [system.name for system in system_db.systems]
+
+    system = system_db.create_system(name="second")
+    configuration = system.create_configuration(name="default")
+    read_structure_step.read(
+        str(sdf_file),
+        configuration,
+        system_db=system_db,
+        system=system,
+        system_name="from file",
+    )
+    second = [system.name for system in system_db.systems][len(first) :]
+
+    assert second == [
+        "3TR - Model conformer",
+        "4TR - Model conformer",
+        "5TR - Model conformer",
+    ]
+    assert first[-3:] == second
+
+
+def test_small_file_not_indexed(sdf_file, system_db):
+    """The indices of small files are not saved beside them."""
+    read_structure_step.read(
+        str(sdf_file),
+        system_db.system.configuration,
+        system_db=system_db,
+        system=system_db.system,
+    )
+    assert not sidecar_path(sdf_file).exists()
+    assert not RecordIndex.get(sdf_file).is_worth_saving()
+    assert not sidecar_path(sdf_file).exists()
+
+
+def test_block_index(tmp_path):
+    path = tmp_path / "blocks.cif"
+    path.write_text("# comment\ndata_A\n_x 1\ndata_Bb\n_x 2\n_y 3\ndata_C\n_x 4\n")
+    index = BlockIndex.build(path)
+    assert index.names == ["A", "Bb", "C"]
+    assert index.find("bB") == 1
+    assert index.find("D") is None
+    with open(path, "rb") as fd:
+        assert index.read(fd, 1) == b"data_Bb\n_x 2\n_y 3\n"
+
+    assert index.save(path)
+    loaded = BlockIndex.load(path)
+    assert loaded.names == index.names
+    assert list(loaded.offsets) == list(index.offsets)
+
+    # The kinds of index are not mixed up
+    assert RecordIndex.load(path, terminator="data_") is None
+
+    path.write_text("data_A\n_x 1\n")
+    assert BlockIndex.load(path) is None
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        b"data_A\n_x 1\n",
+        b"# comment\ndata_A\n_x 1\ndata_Bb\n_x 2\n_y data_3\ndata_C\n_x 4",
+        b"data_A\r\n_x 1\r\ndata_B\r\n",
+        b"no blocks\n",
+        b"",
+    ],
+    ids=["one", "three", "crlf", "none", "empty"],
+)
+@pytest.mark.parametrize("indices", ["1:end", "2", "1,3"])
+@pytest.mark.parametrize("chunk_size", [1, 4, 1 << 20])
+def test_block_scanner(text, indices, chunk_size):
+    """Memory-mapped files and streams are split like split_blocks does."""
+    expected = list(split_blocks(io.BytesIO(text), b"data_", parse_indices(indices)))
+    for source in (text, io.BytesIO(text)):
+        offsets = []
+        names = []
+        scanner = BlockScanner(
+            source,
+            b"data_",
+            parse_indices(indices),
+            offsets=offsets,
+            names=names,
+            chunk_size=chunk_size,
+        )
+        assert [(n, bytes(view)) for n, view in scanner] == expected
+
+        if len(offsets) == len(names) + 1:
+            # The offsets are complete, so give the blocks
+            assert scanner.tell() == offsets[-1]
+            blocks = [
+                text[offsets[i] : offsets[i + 1]] for i in range(len(offsets) - 1)
+            ]
+            everything = list(split_blocks(io.BytesIO(text), b"data_"))
+            assert blocks == [block for _, block in everything]
+            assert names == [b[5 : b.find(b"\n")].strip().decode() for b in blocks]
+        else:
+            assert indices != "1:end"
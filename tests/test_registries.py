@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the lazy registries of file formats and the import time."""
+
+import importlib.metadata
+import os
+import subprocess
+import sys
+
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+from read_structure_step.formats import registries
+
+# The maximum time to import read_structure_step, in milliseconds
+import_time_budget = float(os.environ.get("IMPORT_TIME_BUDGET", 250))
+
+foo_module = """\
+from read_structure_step.formats.registries import register_format_checker
+from read_structure_step.formats.registries import register_reader
+
+
+@register_reader(".foo -- Foo file")
+def load_foo(path, configuration, **kwargs):
+    return ["foo", path]
+
+
+@register_reader(".bar")
+def load_bar(path, configuration, **kwargs):
+    return ["bar", path]
+
+
+@register_format_checker(".bar")
+def check_bar(sample):
+    return 0.5
+"""
+
+
+@pytest.fixture()
+def registry(tmp_path, monkeypatch):
+    """Restore the registries after the test, with a format module on the path."""
+    (tmp_path / "foo_format.py").write_text(foo_module)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    saved = [
+        (registry, {**registry})
+        for registry in (
+            registries.REGISTERED_READERS,
+            registries.REGISTERED_FORMAT_CHECKERS,
+            registries.FORMAT_CHECKER_PRIORITIES,
+            registries._format_modules,
+        )
+    ]
+    yield registries
+
+    for registry, contents in saved:
+        registry.clear()
+        registry.update(contents)
+    sys.modules.pop("foo_format", None)
+
+
+def test_import_time():
+    """Importing the package must not pull in Open Babel, SEAMM or Tk."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "import sys, read_structure_step; print(sorted(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = eval(result.stdout)
+    for module in ("openbabel", "seamm", "molsystem", "tkinter", "numpy"):
+        assert module not in modules
+
+    t = None
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == "read_structure_step":
+            t = int(fields[1]) / 1000
+            break
+    assert t is not None
+    print(f"Importing read_structure_step took {t:.1f} ms")
+    assert t < import_time_budget
+
+
+def test_lazy(registry):
+    registry.declare_format(".foo", "foo_format", reader="load_foo")
+    assert "foo_format" not in sys.modules
+
+    entry = registry.get_reader(".foo")
+    assert entry["function"]("x.foo", None) == ["foo", "x.foo"]
+    assert "foo_format" in sys.modules
+    # The decorator replaced the lazy function
+    entry = registry.get_reader(".foo")
+    assert not isinstance(entry["function"], registries.LazyFunction)
+    assert entry["description"] == "Foo file"
+
+
+def test_declared_once(registry):
+    """The description and priority are only given in the declaration."""
+    registry.declare_format(
+        ".bar",
+        "foo_format",
+        reader="load_bar",
+        checker="check_bar",
+        priority=75,
+        description="Bar file",
+    )
+    assert registry.REGISTERED_FORMAT_CHECKERS[".bar"]("sample") == 0.5
+    assert "foo_format" in sys.modules
+
+    # The decorators replaced the lazy functions, keeping the declared values
+    checker = registry.REGISTERED_FORMAT_CHECKERS[".bar"]
+    assert not isinstance(checker, registries.LazyFunction)
+    assert checker("sample") == 0.5
+    assert registry.FORMAT_CHECKER_PRIORITIES[".bar"] == 75
+    assert registry.get_reader(".bar")["description"] == "Bar file"
+
+
+def test_entry_points(registry, monkeypatch):
+    class EntryPoint:
+        value = "foo_format:descriptor"
+
+        def load(self):
+            return {
+                "extensions": [".foo"],
+                "module": "foo_format",
+                "reader": "load_foo",
+                "description": "Foo file",
+            }
+
+    def entry_points(group=None):
+        assert group == registries.ENTRY_POINT_GROUP
+        return [EntryPoint()]
+
+    monkeypatch.setattr(importlib.metadata, "entry_points", entry_points)
+    monkeypatch.setattr(registries, "_deferred", [registries._load_entry_points])
+
+    assert registry.get_reader(".foo")["description"] == "Foo file"
+    assert registries._deferred == []
+    assert "foo_format" not in sys.modules
+
+
+def test_metadata():
+    metadata = registries.get_format_metadata(".cif")
+    assert metadata["dimensionality"] == 3
+
+
+def test_openbabel_fallback():
+    assert registries.get_reader(".xyz") is not None
+    assert registries.get_writer(".pdb") is not None
+    assert registries.get_reader(".not_a_format") is None
+
+
+def test_subpackages():
+    assert read_structure_step.formats.mop.find_mopac is not None
+    assert read_structure_step.ReadStructureStep is not None
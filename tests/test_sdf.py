@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the SDF reader."""
+
+import os
+from pathlib import Path
+import time
+
+from openbabel import openbabel
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+from read_structure_step.formats.record_index import split_records
+from read_structure_step.formats.sdf.sdf import load_sdf
+from read_structure_step.formats.sdf.v2000 import parse_v2000
+from read_structure_step.formats.structure_record import record_from_OBMol
+from . import build_filenames
+
+from molsystem.system_db import SystemDB
+
+# The number of records for the benchmark of the native parser, which is only run if
+# SDF_BENCHMARK_RECORDS is set, e.g. to 100000.
+n_benchmark = int(os.environ.get("SDF_BENCHMARK_RECORDS", 0))
+
+ammonium = b"""\
+ammonium
+  test
+
+  5  4  0  0  0  0  0  0  0  0999 V2000
+    0.0000    0.0000    0.0000 N   0  0  0  0  0  0  0  0  0  0  0  0
+    1.0000    0.0000    0.0000 H   0  0  0  0  0  0  0  0  0  0  0  0
+   -1.0000    0.0000    0.0000 H   0  0  0  0  0  0  0  0  0  0  0  0
+    0.0000    1.0000    0.0000 H   0  0  0  0  0  0  0  0  0  0  0  0
+    0.0000   -1.0000    0.0000 H   0  0  0  0  0  0  0  0  0  0  0  0
+  1  2  1  0
+  1  3  1  0
+  1  4  1  0
+  1  5  1  0
+M  CHG  1   1   1
+M  END
+> <name>
+ammonium
+cation
+
+$$$$
+"""
+
+
+@pytest.fixture()
+def sdf_file(tmp_path):
+    """An SDF file with several copies of the test structure, with properties."""
+    text = Path(build_filenames.build_data_filename("3TR_model.sdf")).read_text()
+    text = text.rstrip()[:-4]
+    records = []
+    for i in range(1, 11):
+        records.append(
+            text.replace("3TR", f"{i}TR") + f"> <energy>\n{-1.5 * i}\n\n$$$$\n"
+        )
+    path = tmp_path / "many.sdf"
+    path.write_text("".join(records))
+    return path
+
+
+@pytest.fixture()
+def system_db():
+    """Create a system db, system and configuration."""
+    db = SystemDB(filename="file:seamm_db?mode=memory&cache=shared")
+    db.create_system(name="default").create_configuration(name="default")
+
+    yield db
+
+    db.close()
+    try:
+        del db
+    except:  # noqa: E722
+        print("Caught error deleting the database")
+
+
+def summarize(configurations):
+    """The essential information about the structures read."""
+    result = []
+    for configuration in configurations:
+        index = {atom_id: i for i, atom_id in enumerate(configuration.atoms.ids)}
+        bonds = configuration.bonds.get_as_dict()
+        result.append(
+            (
+                configuration.system.name,
+                configuration.name,
+                configuration.atoms.symbols,
+                [round(x, 4) for xyz in configuration.atoms.coordinates for x in xyz],
+                [
+                    (index[i], index[j], order)
+                    for i, j, order in zip(bonds["i"], bonds["j"], bonds["bondorder"])
+                ],
+                configuration.properties.get("energy")["energy"]["value"],
+                configuration.charge,
+                configuration.spin_multiplicity,
+            )
+        )
+    return result
+
+
+def read(path, system_db, **kwargs):
+    system = system_db.create_system()
+    return read_structure_step.read(
+        str(path),
+        system.create_configuration(),
+        system_db=system_db,
+        system=system,
+        system_name="from file",
+        configuration_name="sequential",
+        **kwargs,
+    )
+
+
+def test_parallel(sdf_file, system_db):
+    serial = summarize(read(sdf_file, system_db))
+    parallel = summarize(read(sdf_file, system_db, n_workers=2))
+
+    assert len(serial) == 10
+    assert parallel == serial
+
+
+def test_parallel_indices(sdf_file, system_db):
+    configurations = read(sdf_file, system_db, indices="3:9:3", n_workers=2)
+    assert [c.system.name for c in configurations] == [
+        "3TR - Model conformer",
+        "6TR - Model conformer",
+        "9TR - Model conformer",
+    ]
+
+
+def openbabel_record(text):
+    """Parse a record with Open Babel, without the results of its perception."""
+    obConversion = openbabel.OBConversion()
+    obConversion.SetInFormat("sdf")
+    obMol = openbabel.OBMol()
+    obConversion.ReadString(obMol, text.decode())
+    obMol.AddHydrogens()
+    record = record_from_OBMol(obMol)
+    for key in ("SSSR", "LSSR", "OpenBabel Symmetry Classes"):
+        record["data"].pop(key, None)
+    return record
+
+
+def test_native(sdf_file, system_db):
+    kwargs = {
+        "system_name": "from file",
+        "configuration_name": "sequential",
+        "subsequent_as_configurations": True,
+    }
+    system = system_db.create_system()
+    native = load_sdf(sdf_file, system.create_configuration(), system=system, **kwargs)
+    system = system_db.create_system()
+    obabel = load_sdf(
+        sdf_file, system.create_configuration(), system=system, native=False, **kwargs
+    )
+
+    assert summarize(native) == summarize(obabel)
+
+
+def test_bad_record(sdf_file, system_db):
+    """A record that cannot be read is skipped, without a printer."""
+    text = sdf_file.read_text()
+    sdf_file.write_text(text.replace("2TR - Model", "2TR - Model\n  junk", 1))
+    configurations = read(sdf_file, system_db, native=False)
+    assert len(configurations) == 9
+    assert "2TR - Model conformer" not in [c.system.name for c in configurations]
+
+
+def test_v2000_charges():
+    record = parse_v2000(ammonium)
+    record["coordinates"] = [tuple(xyz) for xyz in record["coordinates"]]
+
+    assert record == openbabel_record(ammonium)
+    assert record["charge"] == 1
+    assert record["data"]["name"] == "ammonium\ncation"
+
+
+@pytest.mark.parametrize(
+    "old, new",
+    [
+        (b"V2000", b"V3000"),
+        (b"  1  5  1  0", b"  1  5  4  0"),
+        (b"  1  5  1  0\n", b""),
+        (b"N   0  0", b"N   0  4"),
+        (b"N   0  0", b"Q   0  0"),
+        (b"M  CHG", b"M  RAD"),
+    ],
+    ids=["V3000", "aromatic", "missing H", "radical", "query atom", "M RAD"],
+)
+def test_v2000_fallback(old, new):
+    text = ammonium.replace(old, new)
+    if old == b"  1  5  1  0\n":
+        text = text.replace(b"  5  4  0", b"  5  3  0")
+    assert parse_v2000(text) is None
+
+
+@pytest.mark.skipif(n_benchmark == 0, reason="SDF_BENCHMARK_RECORDS is not set")
+def test_v2000_benchmark(tmp_path):
+    """Compare the native parser with Open Babel on a large SDF file."""
+    text = Path(build_filenames.build_data_filename("3TR_model.sdf")).read_bytes()
+    text = text.rstrip() + b"\n"
+    path = tmp_path / "large.sdf"
+    with open(path, "wb") as fd:
+        for i in range(n_benchmark):
+            fd.write(text)
+
+    t0 = time.perf_counter()
+    n_records = 0
+    with open(path, "rb") as fd:
+        for record in split_records(fd, b"$$$$"):
+            assert parse_v2000(record) is not None
+            n_records += 1
+    t_native = time.perf_counter() - t0
+    assert n_records == n_benchmark
+
+    # Open Babel is much slower, so time it on a sample of the records.
+    n_sample = min(n_benchmark, 5000)
+    t0 = time.perf_counter()
+    with open(path, "rb") as fd:
+        for i, record in enumerate(split_records(fd, b"$$$$")):
+            if i == n_sample:
+                break
+            openbabel_record(record)
+    t_obabel = time.perf_counter() - t0
+
+    native_rate = n_benchmark / t_native
+    obabel_rate = n_sample / t_obabel
+    print(
+        f"\nNative: {native_rate:.0f} records/s, Open Babel: {obabel_rate:.0f} "
+        f"records/s, speedup {native_rate / obabel_rate:.1f}"
+    )
+    assert native_rate > obabel_rate
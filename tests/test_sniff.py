@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for working out the format of files from their contents."""
+
+import gzip
+from pathlib import Path
+import shutil
+
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+from read_structure_step.formats.sniff import read_sample
+from read_structure_step.formats.sniff import Sample
+from read_structure_step.formats.sniff import score_formats
+from read_structure_step.formats.sniff import sniff_format
+from . import build_filenames
+
+
+@pytest.mark.parametrize(
+    "structure, extension",
+    [
+        ("3TR_model.mol2", ".mol2"),
+        ("3TR_model.pdb", ".pdb"),
+        ("3TR_model.sdf", ".sdf"),
+        ("3TR_model.xyz", ".xyz"),
+        ("acetonitrile.mop", ".mop"),
+        ("Cr_ACETCR.mop", ".mop"),
+    ],
+)
+def test_sniff(tmp_path, structure, extension):
+    path = tmp_path / "unknown"
+    shutil.copy(build_filenames.build_data_filename(structure), path)
+    assert sniff_format(path) == extension
+
+
+def test_smiles():
+    sample = Sample("# Some molecules\nCCO ethanol\nc1ccccc1 benzene\n")
+    assert sniff_format(sample) == ".smi"
+
+
+def test_not_smiles():
+    assert sniff_format(Sample("Just some text\nin a file.\n")) is None
+
+
+def test_cif():
+    sample = Sample("data_test\n_cell_length_a 5.0\n")
+    assert sniff_format(sample) == ".cif"
+    sample = Sample("data_test\n\n_cell.length_a 5.0\n")
+    assert sniff_format(sample) == ".mmcif"
+
+
+def test_priority():
+    """Checkers are run in priority order, stopping at the first certain one."""
+    path = build_filenames.build_data_filename("3TR_model.mol2")
+    assert score_formats(read_sample(path)) == [(".mol2", 1.0)]
+
+
+def test_bounded(tmp_path):
+    """Only the beginning and end of a large file are read."""
+    text = Path(build_filenames.build_data_filename("3TR_model.sdf")).read_text()
+    text = text.rstrip() + "\n"
+    path = tmp_path / "unknown"
+    path.write_text(2000 * text)
+
+    sample = read_sample(path, head_size=4096, tail_size=1024)
+    assert not sample.complete
+    assert len(sample.head) <= 4096
+    assert sample.head.endswith("\n")
+    assert len(sample.tail) <= 1024
+    assert sample.tail_lines[-1] == "$$$$"
+    assert sniff_format(sample) == ".sdf"
+
+
+def test_compressed(tmp_path):
+    data = Path(build_filenames.build_data_filename("3TR_model.pdb")).read_bytes()
+    path = tmp_path / "unknown"
+    with gzip.open(path, "wb") as fd:
+        fd.write(data)
+
+    sample = read_sample(path)
+    assert sample.complete
+    assert sample.head == data.decode()
+    assert sniff_format(path) == ".pdb"
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for reading structures from data in memory and open streams."""
+
+import gzip
+import io
+from pathlib import Path
+import tarfile
+
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+from read_structure_step.formats.sources import Stream
+from . import build_filenames
+
+from molsystem.system_db import SystemDB
+
+
+@pytest.fixture()
+def sdf_text():
+    """The text of an SDF file with three structures, with different titles."""
+    text = Path(build_filenames.build_data_filename("3TR_model.sdf")).read_text()
+    text = text.rstrip() + "\n"
+    return "".join(text.replace("3TR", f"{i}TR") for i in range(1, 4))
+
+
+@pytest.fixture()
+def system_db():
+    """Create a system db, system and configuration."""
+    db = SystemDB(filename="file:seamm_db?mode=memory&cache=shared")
+    db.create_system(name="default").create_configuration(name="default")
+
+    yield db
+
+    db.close()
+    try:
+        del db
+    except:  # noqa: E722
+        print("Caught error deleting the database")
+
+
+class Pipe(io.RawIOBase):
+    """A binary stream that cannot seek, like a pipe."""
+
+    def __init__(self, data):
+        self._fd = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self._fd.readinto(buffer)
+
+
+def read(source, system_db, **kwargs):
+    system = system_db.create_system()
+    return read_structure_step.read(
+        source,
+        system.create_configuration(),
+        system_db=system_db,
+        system=system,
+        system_name="from file",
+        **kwargs,
+    )
+
+
+def names(configurations):
+    return [c.system.name.split()[0] for c in configurations]
+
+
+@pytest.mark.parametrize(
+    "wrap",
+    [
+        lambda text: text.encode(),
+        lambda text: gzip.compress(text.encode()),
+        lambda text: io.BytesIO(text.encode()),
+        lambda text: io.StringIO(text),
+        lambda text: Stream(text, name="three.sdf"),
+    ],
+    ids=["bytes", "gzip", "BytesIO", "StringIO", "text"],
+)
+def test_sources(sdf_text, system_db, wrap):
+    configurations = read(wrap(sdf_text), system_db, extension=".sdf")
+    assert names(configurations) == ["1TR", "2TR", "3TR"]
+
+
+def test_sniffed(sdf_text, system_db):
+    configurations = read(sdf_text.encode(), system_db)
+    assert len(configurations) == 3
+
+
+def test_position(sdf_text, system_db):
+    """Streams are read from where they are, even when opened several times."""
+    fd = io.BytesIO(b"header\n" + sdf_text.encode())
+    fd.readline()
+    configurations = read(fd, system_db, extension=".sdf", indices="-1")
+    assert names(configurations) == ["3TR"]
+
+
+def test_pipe(sdf_text, system_db):
+    stream = Stream(Pipe(gzip.compress(sdf_text.encode())), name="three.sdf.gz")
+    assert len(read(stream, system_db)) == 3
+
+    with pytest.raises(ValueError):
+        read(stream, system_db)
+
+
+def test_tar_members(tmp_path, sdf_text, system_db):
+    path = tmp_path / "structures.tar"
+    with tarfile.open(path, "w") as tar:
+        for i in range(1, 4):
+            data = sdf_text.encode()
+            info = tarfile.TarInfo(f"dir/{i}.sdf")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+    n = 0
+    with tarfile.open(path, "r") as tar:
+        for member in tar:
+            with tar.extractfile(member) as fd:
+                configurations = read(
+                    Stream(fd, name=member.name), system_db, indices="2:3"
+                )
+            assert names(configurations) == ["2TR", "3TR"]
+            n += 1
+    assert n == 3
+    assert list(tmp_path.iterdir()) == [path]
+
+
+@pytest.mark.parametrize("file_name", ["3TR_model.mol2", "3TR_model.pdb", "spc.xyz"])
+def test_formats(file_name, system_db):
+    path = Path(build_filenames.build_data_filename(file_name))
+    from_file = read(str(path), system_db)
+    with open(path, "rb") as fd:
+        from_stream = read(fd, system_db)
+    assert [c.n_atoms for c in from_stream] == [c.n_atoms for c in from_file]
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for committing imported structures to the database in batches."""
+
+from pathlib import Path
+import sqlite3
+
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+from read_structure_step import iter_structures
+from read_structure_step.formats.transactions import BulkImport
+from . import build_filenames
+
+from molsystem.system_db import SystemDB
+
+
+@pytest.fixture()
+def sdf_file(tmp_path):
+    """An SDF file with 25 copies of the test structure."""
+    text = Path(build_filenames.build_data_filename("3TR_model.sdf")).read_text()
+    text = text.rstrip() + "\n"
+    path = tmp_path / "many.sdf"
+    path.write_text("".join(text.replace("3TR", f"{i}TR") for i in range(1, 26)))
+    return path
+
+
+@pytest.fixture()
+def system_db(tmp_path):
+    """A system db in a file, so that what is committed can be checked."""
+    db = SystemDB(filename=str(tmp_path / "seamm.db"))
+    db.create_system(name="default").create_configuration(name="default")
+
+    yield db
+
+    db.close()
+    try:
+        del db
+    except:  # noqa: E722
+        print("Caught error deleting the database")
+
+
+def n_committed(system_db):
+    """The number of systems another connection can see."""
+    with sqlite3.connect(system_db.filename) as db:
+        return db.execute("SELECT COUNT(*) FROM system").fetchone()[0]
+
+
+def read(path, system_db, **kwargs):
+    system = system_db.system
+    return read_structure_step.read(
+        str(path),
+        system.configuration,
+        system_db=system_db,
+        system=system,
+        system_name="from file",
+        **kwargs,
+    )
+
+
+def test_batches(sdf_file, system_db):
+    with BulkImport(system_db, batch_size=10) as bulk:
+        assert bulk.active
+        assert system_db.deferred_commit
+        configurations = read(sdf_file, system_db, bulk=bulk)
+        assert n_committed(system_db) == 20
+
+    assert len(configurations) == 25
+    assert bulk.n_structures == 25
+    assert bulk.n_commits == 3
+    assert not system_db.deferred_commit
+    assert n_committed(system_db) == 25
+
+
+def test_read(sdf_file, system_db):
+    configurations = read(sdf_file, system_db, batch_size=7)
+    assert [c.system.name.split()[0] for c in configurations[:2]] == ["1TR", "2TR"]
+    assert not system_db.deferred_commit
+    assert n_committed(system_db) == 25
+
+
+def test_no_batches(system_db):
+    with BulkImport(system_db, batch_size=0) as bulk:
+        assert not bulk.active
+        system_db.create_system()
+        bulk.added()
+        assert n_committed(system_db) == 2
+
+
+def test_already_deferred(system_db):
+    """The transaction of the caller is left alone."""
+    system_db.deferred_commit = True
+    with BulkImport(system_db, batch_size=1) as bulk:
+        assert not bulk.active
+        system_db.create_system()
+        bulk.added()
+    assert system_db.deferred_commit
+    assert n_committed(system_db) == 1
+
+    system_db.commit_transaction()
+    system_db.deferred_commit = False
+    assert n_committed(system_db) == 2
+
+
+def test_relaxed(system_db):
+    synchronous = system_db.db.execute("PRAGMA synchronous").fetchone()[0]
+    with BulkImport(system_db, relaxed=True):
+        assert system_db.db.execute("PRAGMA synchronous").fetchone()[0] == 0
+    assert system_db.db.execute("PRAGMA synchronous").fetchone()[0] == synchronous
+
+
+def test_error(system_db):
+    """The structures imported before an error are kept."""
+    with pytest.raises(RuntimeError):
+        with BulkImport(system_db, batch_size=10) as bulk:
+            system_db.create_system()
+            bulk.added()
+            raise RuntimeError("bad structure")
+    assert n_committed(system_db) == 2
+
+
+def test_iter_structures(sdf_file, system_db):
+    configurations = iter_structures(
+        str(sdf_file), system_db=system_db, system_name="from file", batch_size=10
+    )
+    for i, configuration in enumerate(configurations):
+        if i == 14:
+            break
+    assert n_committed(system_db) == 11
+    configurations.close()
+    assert n_committed(system_db) == 16
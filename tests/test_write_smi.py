@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for writing SMILES files."""
+
+import gzip
+
+import pytest  # noqa: F401
+import read_structure_step  # noqa: F401
+
+from molsystem.system_db import SystemDB
+
+smiles = """\
+CCO ethanol
+c1ccccc1 benzene
+CC(=O)O acetic acid
+C methane
+"""
+
+
+@pytest.fixture()
+def system_db():
+    """Create a system db, system and configuration."""
+    db = SystemDB(filename="file:seamm_db?mode=memory&cache=shared")
+    db.create_system(name="default").create_configuration(name="default")
+
+    yield db
+
+    db.close()
+    try:
+        del db
+    except:  # noqa: E722
+        print("Caught error deleting the database")
+
+
+@pytest.fixture()
+def configurations(tmp_path, system_db):
+    path = tmp_path / "molecules.smi"
+    path.write_text(smiles)
+    system = system_db.create_system()
+    return read_structure_step.read(
+        str(path),
+        system.create_configuration(),
+        system_db=system_db,
+        system=system,
+        add_hydrogens=True,
+        system_name="from file",
+        configuration_name="sequential",
+    )
+
+
+def read_lines(path):
+    if path.suffix == ".gz":
+        with gzip.open(path, "rt") as fd:
+            return fd.read().splitlines()
+    return path.read_text().splitlines()
+
+
+def test_write(tmp_path, configurations):
+    path = tmp_path / "out.smi"
+    lines = []
+    read_structure_step.write(
+        str(path), configurations, extension=".smi", printer=lines.append
+    )
+    assert lines[-1].startswith("Wrote 4 structures in")
+
+    rows = [line.split("\t") for line in read_lines(path)]
+    assert [row[0] for row in rows] == ["CCO", "c1ccccc1", "CC(=O)O", "C"]
+    assert [row[1] for row in rows] == [
+        "ethanol/1",
+        "benzene/2",
+        "acetic acid/3",
+        "methane/4",
+    ]
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_compressed_generator(tmp_path, configurations, n_workers):
+    path = tmp_path / "out.smi.gz"
+    read_structure_step.write(
+        str(path),
+        (c for c in configurations),
+        extension=".smi",
+        n_workers=n_workers,
+        batch_size=3,
+    )
+    assert [line.split("\t")[0] for line in read_lines(path)] == [
+        "CCO",
+        "c1ccccc1",
+        "CC(=O)O",
+        "C",
+    ]
+
+
+def test_properties(tmp_path, configurations, system_db):
+    properties = configurations[0].properties
+    properties.add("score", "float")
+    for i, configuration in enumerate(configurations[0:2]):
+        configuration.properties.put("score", 1.5 * i)
+
+    path = tmp_path / "out.smi"
+    read_structure_step.write(
+        str(path), configurations, extension=".smi", properties=["score"]
+    )
+    lines = read_lines(path)
+    assert lines[0] == "#SMILES\tname\tscore"
+    assert [line.split("\t")[2] for line in lines[1:]] == ["0.0", "1.5", "", ""]
+
+    # The header is a comment, so the file can be read again.
+    system = system_db.create_system()
+    again = read_structure_step.read(
+        str(path), system.create_configuration(), system_db=system_db, system=system
+    )
+    assert len(again) == 4